@@ -11,6 +11,7 @@ Can be used as:
   3. CLI interactive mode:    python agent_query_qdrant.py --interactive
 
 Requires: pip install qdrant-client sentence-transformers
+          (or onnxruntime tokenizers with QDRANT_EMBED_BACKEND=onnx / onnx-int8)
 """
 
 import os
@@ -20,34 +21,75 @@ import hashlib
 import argparse
 from typing import Optional
 
+from qdrant_connection import connect, QDRANT_HOST, QDRANT_PORT
+from search_tuning import tuned_search_params
+
 # ── Configuration ──────────────────────────────────────────────────────────────
-LXC_IP       = "192.168.2.227"
-QDRANT_PORT  = 6333
+LXC_IP       = QDRANT_HOST   # env QDRANT_HOST / config file, see qdrant_connection.py
 COLLECTION   = "mac_repo_index"
 MODEL_NAME   = "all-MiniLM-L6-v2"
 MAX_TEXT_LEN = 8000
+QUERY_CACHE_PERSIST = True   # reuse query vectors across CLI runs (see embedding_cache)
+LOCAL_FALLBACK = True        # search the offline local index when Qdrant is unreachable
 # ───────────────────────────────────────────────────────────────────────────────
 
 _client = None
 _model  = None
+_query_cache = None
+_health = None
 
 
 def _get_client():
     global _client
     if _client is None:
-        from qdrant_client import QdrantClient
-        _client = QdrantClient(host=LXC_IP, port=QDRANT_PORT, timeout=10)
+        _client = connect("search", host=LXC_IP, port=QDRANT_PORT)
     return _client
 
 
 def _get_model():
     global _model
     if _model is None:
-        from sentence_transformers import SentenceTransformer
-        _model = SentenceTransformer(MODEL_NAME)
+        # The resident embedding daemon if it is running, else an in-process
+        # model on the QDRANT_EMBED_BACKEND backend (torch / onnx / onnx-int8)
+        from embed_daemon import load_model_or_daemon
+        _model = load_model_or_daemon(MODEL_NAME)
     return _model
 
 
+def _get_query_cache():
+    global _query_cache
+    if _query_cache is None:
+        from embedding_cache import load_query_cache
+        _query_cache = load_query_cache(MODEL_NAME, persist=QUERY_CACHE_PERSIST)
+    return _query_cache
+
+
+def _encode_query(query: str):
+    """Query vector via the LRU cache — a repeated query never loads the model."""
+    return _get_query_cache().get_or_encode(query[:MAX_TEXT_LEN], lambda q: _get_model().encode(q))
+
+
+def _get_health():
+    global _health
+    if _health is None:
+        from local_index import QdrantHealth
+        _health = QdrantHealth(LXC_IP, QDRANT_PORT)
+    return _health
+
+
+def _local_search(vector, limit: int, collection: str) -> list[dict]:
+    """Offline search over the local index (see local_index.py)."""
+    from local_index import load_local_index
+    index = load_local_index(collection)
+    if index is None:
+        raise ConnectionError(f"Qdrant unreachable at {LXC_IP}:{QDRANT_PORT} and no local index for {collection} "
+                              f"(build one with: python 5_Symbols/local_index.py)")
+    results = index.search(vector, limit)
+    for r in results:
+        r["text"] = r["text"][:500]
+    return results
+
+
 # ═══════════════════════════════════════════════════════════════════════════════
 #  QUERY FUNCTIONS — for AI agents to call
 # ═══════════════════════════════════════════════════════════════════════════════
@@ -56,34 +98,50 @@ def search(query: str, limit: int = 10, collection: str = COLLECTION) -> list[di
     """
     Semantic search across the second brain.
 
+    Chunk hits are grouped by note path, so each file appears at most once
+    (scored by its best-matching chunk). When Qdrant is unreachable the
+    offline local index answers instead.
+
     Args:
         query:      Natural language search query
         limit:      Max results to return (default 10)
         collection: Qdrant collection name
 
     Returns:
-        List of dicts with keys: id, score, filename, path, text
+        List of dicts with keys: id, score, filename, path, heading, start, end, text
+        (start/end are byte offsets of the matching chunk within the file)
     """
-    model  = _get_model()
-    client = _get_client()
+    vector = _encode_query(query)
+    if LOCAL_FALLBACK and not _get_health().ok():
+        return _local_search(vector, limit, collection)
 
-    vector = model.encode(query[:MAX_TEXT_LEN]).tolist()
-
-    hits = client.search(
-        collection_name=collection,
-        query_vector=vector,
-        limit=limit,
-        with_payload=True,
-    )
+    try:
+        groups = _get_client().query_points_groups(
+            collection_name=collection,
+            query=vector.tolist(),
+            group_by="path",
+            limit=limit,
+            group_size=1,
+            with_payload=True,
+            search_params=tuned_search_params(collection),   # see search_tuning.py
+        ).groups
+    except Exception:
+        if not LOCAL_FALLBACK or _get_health().check():
+            raise
+        return _local_search(vector, limit, collection)
 
     results = []
-    for hit in hits:
+    for group in groups:
+        hit = group.hits[0]
         p = hit.payload or {}
         results.append({
             "id":       hit.id,
             "score":    round(hit.score, 4),
             "filename": p.get("filename", ""),
             "path":     p.get("path", ""),
+            "heading":  p.get("heading", ""),
+            "start":    p.get("start"),
+            "end":      p.get("end"),
             "text":     (p.get("text", "") or p.get("content", ""))[:500],
         })
     return results
@@ -126,6 +184,11 @@ def get_stats(collection: str = COLLECTION) -> dict:
     }
 
 
+def query_cache_stats() -> dict:
+    """Hit / miss counters of the query-vector cache."""
+    return _get_query_cache().stats()
+
+
 def list_collections() -> list[str]:
     """List all Qdrant collections."""
     client = _get_client()
@@ -134,7 +197,10 @@ def list_collections() -> list[str]:
 
 
 def count_points(collection: str = COLLECTION) -> int:
-    """Return the total number of indexed points (files) in the collection."""
+    """
+    Return the total number of indexed points in the collection. Each note
+    is stored as one point per chunk, so this counts chunks, not files.
+    """
     client = _get_client()
     return client.count(collection_name=collection).count
 
@@ -169,22 +235,27 @@ def get_point_by_path(file_path: str, collection: str = COLLECTION) -> Optional[
 
 def search_by_filename(filename: str, limit: int = 20, collection: str = COLLECTION) -> list[dict]:
     """
-    Filter search — find entries by filename (exact or partial match).
+    Filter search — find notes by filename (exact or partial match).
+
+    Only each note's first chunk is read (chunk 0, or the single point of
+    a note ingested before chunking), so a note is listed once.
 
     Args:
         filename: Full or partial filename to filter by (e.g. "docker" or "setup.md")
         limit:    Max results
 
     Returns:
-        List of matching point payloads
+        List of matching notes: id, filename, path
     """
-    from qdrant_client.models import Filter, FieldCondition, MatchText
+    from qdrant_client.models import Filter, FieldCondition, MatchText, MatchValue, IsEmptyCondition, PayloadField
 
     client = _get_client()
     results = client.scroll(
         collection_name=collection,
         scroll_filter=Filter(
-            must=[FieldCondition(key="filename", match=MatchText(text=filename))]
+            must=[FieldCondition(key="filename", match=MatchText(text=filename))],
+            should=[FieldCondition(key="chunk_index", match=MatchValue(value=0)),
+                    IsEmptyCondition(is_empty=PayloadField(key="chunk_index"))],
         ),
         limit=limit,
         with_payload=True,
@@ -203,6 +274,7 @@ def health_check() -> dict:
 
     Returns:
         Dict with: connected, url, collections, total_points
+        (plus local_index — the offline copy's meta — when disconnected)
     """
     try:
         client = _get_client()
@@ -215,16 +287,18 @@ def health_check() -> dict:
             "total_points": points,
         }
     except Exception as e:
+        from local_index import index_info
         return {
-            "connected": False,
-            "url":       f"http://{LXC_IP}:{QDRANT_PORT}",
-            "error":     str(e),
+            "connected":   False,
+            "url":         f"http://{LXC_IP}:{QDRANT_PORT}",
+            "error":       str(e),
+            "local_index": index_info(COLLECTION),
         }
 
 
 def delete_by_path(file_path: str, collection: str = COLLECTION) -> bool:
     """
-    Delete a file's entry from Qdrant by its path.
+    Delete a file's entries (all of its chunks) from Qdrant by its path.
 
     Args:
         file_path: Absolute path of the file to remove
@@ -232,9 +306,18 @@ def delete_by_path(file_path: str, collection: str = COLLECTION) -> bool:
     Returns:
         True if deletion was attempted
     """
+    from qdrant_client.models import Filter, FieldCondition, MatchValue, FilterSelector
+
     client = _get_client()
-    pid = int(hashlib.md5(file_path.encode()).hexdigest(), 16) % (10**12)
-    client.delete(collection_name=collection, points_selector=[pid])
+    client.delete(
+        collection_name=collection,
+        points_selector=FilterSelector(filter=Filter(
+            must=[FieldCondition(key="path", match=MatchValue(value=file_path))]
+        )),
+    )
+
+    from result_cache import bump_generation
+    bump_generation(client, collection)   # invalidate the search server's cached results
     return True
 
 
@@ -255,6 +338,8 @@ def _format_results(results: list[dict]) -> str:
         lines.append(f"  Path: {r['path']}")
         if r.get("text"):
             snippet = r["text"][:200].replace("\n", " ")
+            if r.get("heading"):
+                lines.append(f"  § {r['heading']}")
             lines.append(f"  {snippet}...")
     lines.append(f"\n{'─' * 60}")
     lines.append(f"  {len(results)} results")
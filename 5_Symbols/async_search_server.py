@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""
+Asyncio serving mode for the Qdrant search server.
+
+Same routes as qdrant_search_server.py (POST /search, POST /search/batch,
+GET /health, GET / and static files from the project root), but:
+
+  • Many clients are served concurrently — a slow Qdrant call no longer
+    blocks every other Obsidian pane or agent.
+  • Connections are HTTP/1.1 keep-alive, so keystroke-driven searches from
+    the plugin reuse one TCP connection instead of opening one per request.
+  • Qdrant is called through AsyncQdrantClient; when it is unreachable the
+    offline local index answers instead (see local_index.py).
+  • Cache-miss query encodes
+    go to the shared MicroBatcher thread, so concurrent requests share one
+    forward pass and the event loop never runs the model itself.
+
+Start:
+  python 5_Symbols/qdrant_search_server.py --async
+  python 5_Symbols/async_search_server.py
+"""
+
+import os
+import json
+import asyncio
+import mimetypes
+from urllib.parse import urlparse, unquote
+
+import qdrant_search_server as base
+
+# ── Configuration ──────────────────────────────────────────────────────────────
+KEEPALIVE_TIMEOUT = 30          # seconds an idle connection is kept open
+MAX_BODY_BYTES    = 1 * 2**20   # reject request bodies larger than this
+# ───────────────────────────────────────────────────────────────────────────────
+
+_REASONS = {200: "OK", 204: "No Content", 302: "Found", 400: "Bad Request",
+            404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large",
+            500: "Internal Server Error"}
+
+_aclient  = None
+
+
+def get_async_client():
+    global _aclient
+    if _aclient is None:
+        from qdrant_connection import connect_async
+        _aclient = connect_async("search", host=base.LXC_IP, port=base.QDRANT_PORT)
+    return _aclient
+
+
+async def embed_query_async(query: str):
+    """Cached query vector; misses are awaited on the micro-batcher without blocking the loop."""
+    query = query[:base.MAX_TEXT_LEN]
+    cache = base.get_query_cache()
+    vector = cache.get(query)
+    if vector is None:
+        vector = cache.put(query, await asyncio.wrap_future(base.get_batcher().submit(query)))
+    return vector
+
+
+async def local_fallback(error: Exception, fn, *args):
+    """Run an offline local-index search off the event loop, or re-raise error if Qdrant is actually up."""
+    if not base.LOCAL_FALLBACK or await asyncio.to_thread(base.get_health().check):
+        raise error
+    return await asyncio.to_thread(fn, *args)
+
+
+async def do_search_async(query: str, limit: int = 10, collection: str = base.COLLECTION):
+    """Async twin of qdrant_search_server.do_search()."""
+    vector = await embed_query_async(query)
+    if base.LOCAL_FALLBACK and not base.get_health().ok():
+        return await asyncio.to_thread(base.local_search, vector, limit, collection)
+
+    cache = base.get_result_cache()
+    key   = cache.key(vector, limit, collection)
+    token = base.result_token(collection)
+    results = cache.get(key, token)
+    if results is None:
+        try:
+            resp = await get_async_client().query_points_groups(**base.group_query(vector.tolist(), limit, collection))
+        except Exception as e:
+            return await local_fallback(e, base.local_search, vector, limit, collection)
+        results = base.format_groups(resp.groups)
+        cache.put(key, token, results)
+    return results
+
+
+async def do_search_batch_async(body: dict):
+    """Async twin of qdrant_search_server.do_search_batch()."""
+    queries, limits, filters, collection = base.parse_batch(body)
+    texts, vectors, pending = base.submit_queries(queries)
+    encoded = await asyncio.gather(*(asyncio.wrap_future(f) for f in pending.values()))
+    vectors = base.fill_vectors(texts, vectors, dict(zip(pending, encoded)))
+    if base.LOCAL_FALLBACK and not base.get_health().ok():
+        return await asyncio.to_thread(base.local_batch, queries, vectors, limits, filters, collection)
+    try:
+        responses = await get_async_client().query_batch_points(
+            collection_name=collection,
+            requests=base.batch_requests(vectors, limits, filters, collection),
+        )
+    except Exception as e:
+        return await local_fallback(e, base.local_batch, queries, vectors, limits, filters, collection)
+    out = base.batch_results(queries, limits, responses)
+    short = base.short_results(limits, responses, out)
+    regrouped = await asyncio.gather(*(
+        get_async_client().query_points_groups(
+            **base.group_query(vectors[i].tolist(), limits[i], collection, base.build_filter(filters[i])))
+        for i in short))
+    for i, resp in zip(short, regrouped):
+        out[i]["results"] = base.format_groups(resp.groups)
+    return out
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+#  HTTP/1.1 PROTOCOL
+# ═══════════════════════════════════════════════════════════════════════════════
+
+class Request:
+    def __init__(self, method: str, target: str, version: str, headers: dict, body: bytes):
+        self.method  = method
+        self.path    = urlparse(target).path
+        self.version = version
+        self.headers = headers
+        self.body    = body
+
+    @property
+    def keep_alive(self) -> bool:
+        conn = self.headers.get("connection", "").lower()
+        if self.version == "HTTP/1.0":
+            return conn == "keep-alive"
+        return conn != "close"
+
+
+async def read_request(reader: asyncio.StreamReader):
+    """Parse one request from the stream. Returns None on a cleanly closed connection."""
+    line = await reader.readline()
+    if not line:
+        return None
+    try:
+        method, target, version = line.decode("latin-1").strip().split(" ", 2)
+    except ValueError:
+        raise ValueError("malformed request line")
+
+    headers = {}
+    while True:
+        h = await reader.readline()
+        if h in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = h.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    length = int(headers.get("content-length", 0) or 0)
+    if length > MAX_BODY_BYTES:
+        raise OverflowError(length)
+    body = await reader.readexactly(length) if length else b""
+    return Request(method.upper(), target, version, headers, body)
+
+
+def _cors_headers() -> list[tuple[str, str]]:
+    return [
+        ("Access-Control-Allow-Origin", "*"),
+        ("Access-Control-Allow-Methods", "GET, POST, OPTIONS"),
+        ("Access-Control-Allow-Headers", "Content-Type"),
+    ]
+
+
+def build_response(status: int, body: bytes = b"", headers=None, keep_alive: bool = True) -> bytes:
+    lines = [f"HTTP/1.1 {status} {_REASONS.get(status, '')}"]
+    for name, value in (headers or []):
+        lines.append(f"{name}: {value}")
+    lines.append(f"Content-Length: {len(body)}")
+    lines.append("Connection: keep-alive" if keep_alive else "Connection: close")
+    if keep_alive:
+        lines.append(f"Keep-Alive: timeout={KEEPALIVE_TIMEOUT}")
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body
+
+
+def json_response(data, status: int = 200, keep_alive: bool = True) -> bytes:
+    payload = json.dumps(data, ensure_ascii=False).encode()
+    return build_response(status, payload,
+                          [("Content-Type", "application/json")] + _cors_headers(),
+                          keep_alive)
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+#  ROUTES
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def _static_file(path: str):
+    """Read a file under PROJECT_ROOT. Returns (bytes, content_type) or None."""
+    root = os.path.realpath(base.PROJECT_ROOT)
+    full = os.path.realpath(os.path.join(root, unquote(path).lstrip("/")))
+    if full != root and not full.startswith(root + os.sep):
+        return None   # path traversal
+    if os.path.isdir(full):
+        full = os.path.join(full, "index.html")
+    try:
+        with open(full, "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    ctype = mimetypes.guess_type(full)[0] or "application/octet-stream"
+    return data, ctype
+
+
+async def handle(req: Request) -> bytes:
+    keep = req.keep_alive
+
+    if req.method == "OPTIONS":
+        return build_response(204, headers=_cors_headers(), keep_alive=keep)
+
+    if req.method == "GET":
+        if req.path == "/health":
+            report = await asyncio.to_thread(base.health_report)
+            return json_response({**report, "mode": "async"}, keep_alive=keep)
+        if req.path == "/":
+            return build_response(302, headers=[("Location", "/5_Symbols/search.html")], keep_alive=keep)
+        loop = asyncio.get_running_loop()
+        found = await loop.run_in_executor(None, _static_file, req.path)
+        if found is None:
+            return build_response(404, keep_alive=keep)
+        data, ctype = found
+        return build_response(200, data, [("Content-Type", ctype)], keep_alive=keep)
+
+    if req.method == "POST":
+        if req.path == "/search/batch":
+            try:
+                body = json.loads(req.body) if req.body else {}
+                return json_response(await do_search_batch_async(body), keep_alive=keep)
+            except ValueError as e:
+                return json_response({"error": str(e)}, 400, keep)
+            except Exception as e:
+                return json_response({"error": str(e)}, 500, keep)
+        if req.path == "/search":
+            try:
+                body = json.loads(req.body) if req.body else {}
+                query, limit, collection = base.parse_search(body)
+                results = await do_search_async(query, limit, collection)
+                return json_response(results, keep_alive=keep)
+            except ValueError as e:
+                return json_response({"error": str(e)}, 400, keep)
+            except Exception as e:
+                return json_response({"error": str(e)}, 500, keep)
+        return build_response(404, keep_alive=keep)
+
+    return build_response(405, keep_alive=keep)
+
+
+async def serve_connection(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    """Serve requests on one connection until the client closes it or it idles out."""
+    try:
+        while True:
+            try:
+                req = await asyncio.wait_for(read_request(reader), KEEPALIVE_TIMEOUT)
+            except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+                break
+            except OverflowError:
+                writer.write(build_response(413, keep_alive=False))
+                break
+            except ValueError:
+                writer.write(build_response(400, keep_alive=False))
+                break
+            if req is None:
+                break
+
+            writer.write(await handle(req))
+            await writer.drain()
+            if req.path.startswith("/search"):
+                print(f"  {req.method} {req.path}")
+            if not req.keep_alive:
+                break
+    finally:
+        try:
+            await writer.drain()
+            writer.close()
+            await writer.wait_closed()
+        except ConnectionError:
+            pass
+
+
+async def serve(host: str = base.HOST, port: int = base.PORT):
+    # Pre-load model on startup so first search is fast
+    await asyncio.get_running_loop().run_in_executor(None, base.get_model)
+    await asyncio.to_thread(base.warm_result_cache)
+    base.start_local_index_refresher()
+    server = await asyncio.start_server(serve_connection, host, port)
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    print(f"╔══════════════════════════════════════════════╗")
+    print(f"║  Qdrant Search Server (async)               ║")
+    print(f"║  http://localhost:{base.PORT}                      ║")
+    print(f"║  Qdrant: {base.LXC_IP}:{base.QDRANT_PORT}               ║")
+    print(f"║  Collection: {base.COLLECTION:<28s}  ║")
+    print(f"╚══════════════════════════════════════════════╝")
+    print()
+    print("  Endpoints:")
+    print(f"    GET  /health              → connectivity check")
+    print(f"    POST /search              → semantic search")
+    print(f"    POST /search/batch        → many queries, one round trip")
+    print(f"    GET  /                    → search.html UI")
+    print()
+    print(f"  HTTP/1.1 keep-alive ({KEEPALIVE_TIMEOUT}s idle timeout)")
+    print("  Press Ctrl+C to stop")
+    print()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        print("\n  Server stopped.")
+
+
+if __name__ == "__main__":
+    main()
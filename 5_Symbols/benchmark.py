@@ -0,0 +1,423 @@
+#!/usr/bin/env python3
+"""
+End-to-end ingest + search benchmark — no network, no real vault needed.
+
+ingest_test.py needs the LXC and the real second brain; this runs the same
+pipeline (repo_scanner → IngestEngine → query_points_groups as in
+do_search) against a synthetic markdown corpus and an in-process Qdrant,
+so two commits can be compared on the same machine:
+
+  1. generate N deterministic notes (frontmatter, headings, lists, code,
+     wiki links) — cached under BENCH_DIR, reused on the next run
+  2. scan    — scan_markdown over the corpus (repeated --scan-repeat times)
+  3. ingest  — IngestEngine.ingest_paths into a fresh collection; read /
+     encode / upsert latencies come from the engine's own per-call samples
+  4. search  — --queries note titles, each encoded and searched like
+     do_search() does (grouped by path)
+
+Per stage: throughput, p50 / p95 / p99 latency and the process's peak RSS
+so far. --out writes the whole report as JSON (with the git revision);
+--compare prints the change against an earlier report.
+
+Embedders: "fake" (default) hashes words into a fixed random-ish 384-dim
+vector — deterministic, instant, so the numbers show the pipeline itself.
+"model" runs the real MiniLM on the configured backend (no embedding
+cache, so every run encodes).
+
+CLI:
+    python 5_Symbols/benchmark.py                          # 1k notes, fake embedder, :memory:
+    python 5_Symbols/benchmark.py --notes 20000 --out before.json
+    python 5_Symbols/benchmark.py --notes 20000 --compare before.json
+    python 5_Symbols/benchmark.py --embedder model --backend onnx-int8 --path /tmp/qdrant_bench
+
+Usage (as a module):
+    from benchmark import generate_corpus, HashEncoder, run_benchmark
+    report = run_benchmark(generate_corpus(5000), HashEncoder())
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import zlib
+import shutil
+import random
+import warnings
+import argparse
+import platform
+import subprocess
+import contextlib
+
+import numpy as np
+
+# ── Configuration ──────────────────────────────────────────────────────────────
+BENCH_DIR     = os.environ.get(
+    "QDRANT_BENCH_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "qdrant_secondbrain", "bench"),
+)
+COLLECTION    = "bench_notes"
+MODEL_NAME    = "all-MiniLM-L6-v2"
+VECTOR_DIM    = 384
+NOTES         = 1000
+SEED          = 42
+NOTES_PER_DIR = 200
+QUERIES       = 200
+SEARCH_LIMIT  = 10
+SCAN_REPEAT   = 5
+# ───────────────────────────────────────────────────────────────────────────────
+
+_WORDS = """
+docker kubernetes proxmox container network storage backup restore python script
+vector search embedding index cluster node volume snapshot deploy pipeline build
+release branch commit merge review refactor cache latency throughput memory disk
+journal meeting project roadmap goal habit reading book chapter summary insight
+idea question answer recipe travel budget invoice health workout sleep focus
+obsidian markdown template link tag folder archive inbox daily weekly monthly
+server client request response timeout retry queue worker thread process signal
+linux macos windows shell terminal editor plugin config secret token certificate
+database table query schema migration transaction replica shard partition log
+metric alert dashboard incident postmortem runbook oncall capacity forecast cost
+model training dataset label feature evaluation prompt agent tool context window
+garden kitchen family friend birthday gift music podcast movie note draft final
+""".split()
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+#  SYNTHETIC CORPUS
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def _sentence(rng: random.Random, words: int) -> str:
+    text = " ".join(rng.choice(_WORDS) for _ in range(words))
+    return text[0].upper() + text[1:] + "."
+
+
+def _note(rng: random.Random, notes: int) -> tuple[str, str]:
+    """(title, markdown) of one synthetic note — 1–8 sections, some lists, code and links."""
+    title = " ".join(rng.choice(_WORDS) for _ in range(rng.randint(2, 4))).title()
+    tags  = ", ".join(rng.sample(_WORDS, 3))
+    parts = [f"---\ntags: [{tags}]\ncreated: 2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}\n---\n",
+             f"# {title}\n"]
+    for _ in range(int(rng.lognormvariate(0.8, 0.6)) + 1):
+        parts.append(f"## {_sentence(rng, rng.randint(2, 5))[:-1]}\n")
+        for _ in range(rng.randint(1, 4)):
+            parts.append(" ".join(_sentence(rng, rng.randint(6, 18)) for _ in range(rng.randint(2, 6))) + "\n")
+        roll = rng.random()
+        if roll < 0.25:
+            parts.append("\n".join(f"- {_sentence(rng, rng.randint(3, 8))}" for _ in range(rng.randint(2, 6))) + "\n")
+        elif roll < 0.35:
+            parts.append(f"```bash\n{rng.choice(_WORDS)} --{rng.choice(_WORDS)} {rng.randint(1, 999)}\n```\n")
+        if rng.random() < 0.3:
+            parts.append(f"See [[note-{rng.randrange(notes):06d}]].\n")
+    return title, "\n".join(parts)
+
+
+def generate_corpus(notes: int = NOTES, seed: int = SEED, root: str = None, regenerate: bool = False) -> str:
+    """
+    Write `notes` deterministic markdown files (NOTES_PER_DIR per folder).
+
+    An existing corpus with the same size and seed is reused unless
+    regenerate is set.
+
+    Returns:
+        The corpus root directory
+    """
+    root = root or os.path.join(BENCH_DIR, f"corpus-{notes}-s{seed}")
+    manifest = os.path.join(root, "manifest.json")
+    if not regenerate and os.path.exists(manifest):
+        with open(manifest, "r") as f:
+            if json.load(f) == {"notes": notes, "seed": seed}:
+                return root
+    shutil.rmtree(root, ignore_errors=True)
+
+    rng = random.Random(seed)
+    t0 = time.perf_counter()
+    for n in range(notes):
+        folder = os.path.join(root, f"area-{n // (NOTES_PER_DIR * 10):02d}", f"topic-{n // NOTES_PER_DIR:04d}")
+        if n % NOTES_PER_DIR == 0:
+            os.makedirs(folder, exist_ok=True)
+        _, text = _note(rng, notes)
+        with open(os.path.join(folder, f"note-{n:06d}.md"), "w") as f:
+            f.write(text)
+    with open(manifest, "w") as f:
+        json.dump({"notes": notes, "seed": seed}, f)
+    print(f"  ✓ Generated {notes} notes in {time.perf_counter() - t0:.1f}s → {root}")
+    return root
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+#  EMBEDDERS
+# ═══════════════════════════════════════════════════════════════════════════════
+
+class HashEncoder:
+    """
+    Deterministic stand-in for SentenceTransformer: signed feature hashing
+    of lower-cased words into `dim` buckets, L2-normalised. Texts sharing
+    words get similar vectors, so search results are not random.
+    """
+
+    def __init__(self, dim: int = VECTOR_DIM):
+        self.dim     = dim
+        self._bucket = {}
+
+    def _slot(self, word: str) -> tuple[int, float]:
+        slot = self._bucket.get(word)
+        if slot is None:
+            h = zlib.crc32(word.encode())
+            slot = self._bucket[word] = (h % self.dim, 1.0 if h & 0x80000000 else -1.0)
+        return slot
+
+    def encode(self, texts, batch_size: int = 32, **kwargs):
+        single = isinstance(texts, str)
+        if single:
+            texts = [texts]
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in re.findall(r"\w+", text.lower()):
+                index, sign = self._slot(word)
+                out[row, index] += sign
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        out /= np.where(norms == 0, 1, norms)
+        return out[0] if single else out
+
+
+def load_embedder(name: str, backend: str = None):
+    """"fake" → HashEncoder; "model" → the real model, uncached (every run encodes)."""
+    if name == "fake":
+        return HashEncoder()
+    from embedding_cache import _load_sentence_transformer
+    return _load_sentence_transformer(MODEL_NAME, backend)
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+#  MEASUREMENT
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far (None where unsupported)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (2**20 if sys.platform == "darwin" else 2**10), 1)   # bytes on macOS, KiB on Linux
+
+
+def latency_summary(samples: list[float]) -> dict:
+    """p50 / p95 / p99 / max in ms of per-call durations in seconds."""
+    if not samples:
+        return {"p50_ms": None, "p95_ms": None, "p99_ms": None, "max_ms": None}
+    ms = np.asarray(samples) * 1000
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {"p50_ms": round(float(p50), 3), "p95_ms": round(float(p95), 3),
+            "p99_ms": round(float(p99), 3), "max_ms": round(float(ms.max()), 3)}
+
+
+def _stage(items: int, seconds: float, samples: list[float], unit: str = "files_per_sec") -> dict:
+    return {
+        "items":   items,
+        "seconds": round(seconds, 3),
+        unit:      round(items / seconds, 1) if seconds > 0 else None,
+        "calls":   len(samples),
+        **latency_summary(samples),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def git_revision() -> dict:
+    """Commit the benchmark ran on, and whether the tree had local changes."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    try:
+        head  = subprocess.run(["git", "-C", here, "rev-parse", "--short", "HEAD"],
+                               capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "-C", here, "status", "--porcelain", "--untracked-files=no"],
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+    return {"commit": head, "dirty": bool(dirty)}
+
+
+def sample_queries(files: list[str], count: int, seed: int = SEED) -> list[str]:
+    """Titles (first '# ' heading) of `count` random notes."""
+    queries = []
+    for path in random.Random(seed).sample(files, min(count, len(files))):
+        with open(path, "r", encoding="utf-8", errors="ignore") as f:
+            for line in f:
+                if line.startswith("# "):
+                    queries.append(line[2:].strip())
+                    break
+    return queries
+
+
+def run_benchmark(corpus: str, model, client=None, collection: str = COLLECTION,
+                  queries: int = QUERIES, limit: int = SEARCH_LIMIT, scan_repeat: int = SCAN_REPEAT,
+                  encode_batch: int = None, upsert_batch: int = None, readers: int = None) -> dict:
+    """
+    Scan, ingest and search one corpus; returns the per-stage report.
+
+    Args:
+        corpus:      Directory of .md notes (see generate_corpus)
+        model:       Encoder with SentenceTransformer's encode()
+        client:      QdrantClient to load into (default: in-process :memory:);
+                     the collection is dropped and recreated
+        queries:     Searches to time
+        scan_repeat: Scans to time
+
+    Returns:
+        {"stages": {"scan", "ingest", "read", "encode", "upsert", "query_encode", "search"}, ...}
+    """
+    from qdrant_client import QdrantClient
+    from repo_scanner import scan_markdown
+    from ingest_engine import IngestEngine, ensure_collection, ENCODE_BATCH, UPSERT_BATCH, READER_THREADS
+    from qdrant_search_server import group_query
+
+    stages = {}
+
+    # ── Scan ───────────────────────────────────────────────────────────────
+    scan_times, files = [], {}
+    for _ in range(max(1, scan_repeat)):
+        t0 = time.perf_counter()
+        files = scan_markdown(corpus)
+        scan_times.append(time.perf_counter() - t0)
+    stages["scan"] = _stage(len(files), min(scan_times), scan_times)
+    print(f"  ✓ scan:   {len(files)} files, best {min(scan_times) * 1000:.0f} ms of {len(scan_times)}")
+
+    # ── Ingest ─────────────────────────────────────────────────────────────
+    client = client or QdrantClient(":memory:")
+    if client.collection_exists(collection):
+        client.delete_collection(collection)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")   # embedded Qdrant: "payload indexes have no effect"
+        ensure_collection(client, collection, dim=VECTOR_DIM)
+    engine = IngestEngine(client, model, collection,
+                          encode_batch=encode_batch or ENCODE_BATCH,
+                          upsert_batch=upsert_batch or UPSERT_BATCH,
+                          readers=readers or READER_THREADS,
+                          prune_stale=False,   # fresh collection, as on a full ingest
+                          progress=lambda s: print(f"    {s.files} files ({s.files_per_sec:.0f} files/s)"))
+    ingest = engine.ingest_paths(sorted(files))
+    lat = ingest.latencies
+    stages["ingest"] = {**_stage(ingest.files, ingest.elapsed, []), "chunks": ingest.chunks,
+                        "errors": ingest.errors}
+    stages["read"]   = _stage(len(lat["read"]), ingest.read_secs, lat["read"])
+    stages["encode"] = {**_stage(ingest.files, ingest.encode_secs, lat["encode"]), "chunks": ingest.chunks}
+    stages["upsert"] = {**_stage(ingest.files, ingest.upsert_secs, lat["upsert"]), "points": ingest.chunks}
+    print(f"  ✓ ingest: {ingest.summary()}")
+
+    # ── Search ─────────────────────────────────────────────────────────────
+    texts = sample_queries(list(files), queries)
+    encode_times, search_times, hits = [], [], 0
+    for text in texts:
+        t0 = time.perf_counter()
+        vector = model.encode(text, convert_to_numpy=True, show_progress_bar=False)
+        t1 = time.perf_counter()
+        groups = client.query_points_groups(**group_query(np.asarray(vector).tolist(), limit, collection)).groups
+        t2 = time.perf_counter()
+        encode_times.append(t1 - t0)
+        search_times.append(t2 - t1)
+        hits += len(groups)
+    stages["query_encode"] = _stage(len(texts), sum(encode_times), encode_times, "queries_per_sec")
+    stages["search"]       = {**_stage(len(texts), sum(search_times), search_times, "queries_per_sec"),
+                              "mean_hits": round(hits / len(texts), 1) if texts else 0}
+    print(f"  ✓ search: {len(texts)} queries, p95 {stages['search']['p95_ms']} ms")
+
+    return {
+        "git":       git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "host":      {"python": platform.python_version(), "platform": platform.platform(),
+                      "cpus": os.cpu_count()},
+        "corpus":    {"path": corpus, "notes": len(files),
+                      "bytes": sum(size for _, size in files.values())},
+        "stages":    stages,
+    }
+
+
+def compare(old: dict, new: dict) -> list[str]:
+    """One line per stage: throughput and p95 of old → new with the % change."""
+    def delta(a, b):
+        return f"{(b - a) / a * 100:+.0f}%" if a and b is not None else "   n/a"
+
+    rev = lambda r: f"{r['git'].get('commit')}{'+' if r['git'].get('dirty') else ''}"
+    lines = [f"  {'stage':<13} {'throughput (old → new)':>32} {'':>6}  {'p95 ms (old → new)':>26}",
+             f"  {'':<13} {rev(old):>32}  vs {rev(new)}"]
+    for name, stage in new["stages"].items():
+        before = old.get("stages", {}).get(name)
+        if not before:
+            continue
+        key = "queries_per_sec" if "queries_per_sec" in stage else "files_per_sec"
+        a, b = before.get(key), stage.get(key)
+        pa, pb = before.get("p95_ms"), stage.get("p95_ms")
+        lines.append(f"  {name:<13} {str(a):>14} → {str(b):<14} {delta(a, b):>6}  "
+                     f"{str(pa):>11} → {str(pb):<11} {delta(pa, pb):>6}")
+    return lines
+
+
+def print_report(report: dict):
+    print(f"\n  {'stage':<13} {'items':>8} {'seconds':>9} {'per sec':>10} "
+          f"{'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'peak RSS':>9}")
+    for name, s in report["stages"].items():
+        rate = s.get("files_per_sec", s.get("queries_per_sec"))
+        cells = [s["p50_ms"], s["p95_ms"], s["p99_ms"]]
+        print(f"  {name:<13} {s['items']:>8} {s['seconds']:>9.2f} {rate if rate is not None else '-':>10} "
+              + " ".join(f"{c if c is not None else '-':>9}" for c in cells)
+              + f" {s['peak_rss_mb'] or '-':>7} MB")
+
+
+def main():
+    from embedding_backend import BACKENDS
+
+    parser = argparse.ArgumentParser(description="Offline ingest + search benchmark on a synthetic corpus")
+    parser.add_argument("--notes", type=int, default=NOTES, help=f"Synthetic notes to generate (default: {NOTES})")
+    parser.add_argument("--seed", type=int, default=SEED, help=f"Corpus seed (default: {SEED})")
+    parser.add_argument("--corpus", help="Benchmark this directory of .md files instead of a generated corpus")
+    parser.add_argument("--regenerate", action="store_true", help="Rewrite the cached synthetic corpus")
+    parser.add_argument("--embedder", choices=["fake", "model"], default="fake",
+                        help="Deterministic hash embedder (default) or the real model")
+    parser.add_argument("--backend", choices=BACKENDS, help="Backend for --embedder model")
+    parser.add_argument("--path", help="Embedded Qdrant directory (default: in-memory)")
+    parser.add_argument("--queries", type=int, default=QUERIES, help=f"Searches to time (default: {QUERIES})")
+    parser.add_argument("--limit", type=int, default=SEARCH_LIMIT, help=f"Results per search (default: {SEARCH_LIMIT})")
+    parser.add_argument("--scan-repeat", type=int, default=SCAN_REPEAT, help=f"Scans to time (default: {SCAN_REPEAT})")
+    parser.add_argument("--encode-batch", type=int, help="Texts per forward pass (default: ingest_engine's)")
+    parser.add_argument("--upsert-batch", type=int, help="Initial points per upsert (default: ingest_engine's)")
+    parser.add_argument("--readers", type=int, help="Reader threads (default: ingest_engine's)")
+    parser.add_argument("--out", metavar="FILE", help="Write the report as JSON")
+    parser.add_argument("--compare", metavar="FILE", help="Compare against an earlier --out report")
+    parser.add_argument("--json", action="store_true",
+                        help="Print the report as JSON instead of a table (progress goes to stderr)")
+    args = parser.parse_args()
+
+    # With --json, stdout carries only the report so it can be piped to jq
+    log = sys.stderr if args.json else sys.stdout
+    with contextlib.redirect_stdout(log):
+        corpus = args.corpus or generate_corpus(args.notes, args.seed, regenerate=args.regenerate)
+        client = None
+        if args.path:
+            from qdrant_client import QdrantClient
+            client = QdrantClient(path=args.path)
+
+        report = run_benchmark(corpus, load_embedder(args.embedder, args.backend), client,
+                               queries=args.queries, limit=args.limit, scan_repeat=args.scan_repeat,
+                               encode_batch=args.encode_batch, upsert_batch=args.upsert_batch,
+                               readers=args.readers)
+    report["config"] = {"embedder": args.embedder, "backend": args.backend,
+                        "qdrant": args.path or ":memory:", "seed": args.seed,
+                        "encode_batch": args.encode_batch, "upsert_batch": args.upsert_batch,
+                        "readers": args.readers}
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"  ✓ Report saved to {args.out}", file=log)
+    if args.compare:
+        with open(args.compare, "r") as f:
+            print(file=log)
+            print("\n".join(compare(json.load(f), report)), file=log)
+
+
+if __name__ == "__main__":
+    main()
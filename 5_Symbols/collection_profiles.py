@@ -0,0 +1,515 @@
+#!/usr/bin/env python3
+"""
+Declarative collection profiles: quantization, on-disk vectors and HNSW.
+
+Every writer used to create mac_repo_index with a bare
+VectorParams(size=384, distance=COSINE) — fp32 vectors and the default
+HNSW graph, all in RAM. A profile describes how a collection should be
+stored instead, and provision() creates the collection that way or updates
+an existing one in place, so the small LXC can hold several vaults.
+
+Profile keys (anything left out falls back to DEFAULTS):
+    datatype       "float32" | "float16" — storage type of the original vectors
+    on_disk        keep the original vectors on disk (memory-mapped)
+    quantization   None | "scalar" (int8, ~4x smaller) | "binary" (1 bit, ~32x)
+    quantile       scalar quantization: clip outliers beyond this quantile
+    always_ram     keep the quantized vectors in RAM even when originals are on disk
+    rescore        re-rank quantized candidates against the original vectors
+    oversampling   fetch limit × oversampling quantized candidates before rescoring
+    m              HNSW links per node (graph RAM grows linearly with m)
+    ef_construct   HNSW build-time beam width (index quality vs. build time)
+    hnsw_ef        search-time beam width (None: Qdrant's default)
+
+Built-in profiles are in PROFILES; a JSON file with the same keys works
+anywhere a profile name does. The profile used when a writer has to create
+a missing collection is QDRANT_COLLECTION_PROFILE (default "default", the
+old bare layout).
+
+The search-time keys (rescore, oversampling, hnsw_ef) are written to the
+search params file the search servers and agent_query_qdrant read (see
+search_tuning.py) whenever a profile creates or changes a collection;
+search_tuning.py --save can refine them afterwards.
+
+The datatype of an existing collection can't be changed in place — the
+report says so; export + import it with qdrant_snapshot.py after creating
+the new collection from the profile.
+
+bulk_load() wraps a full ingest or snapshot restore: indexing is switched
+off (indexing_threshold 0) while points stream in, then switched back on
+and the optimizer builds the HNSW index once, instead of re-indexing
+segments while upserts are still arriving.
+
+CLI:
+    python 5_Symbols/collection_profiles.py list
+    python 5_Symbols/collection_profiles.py show mac_repo_index
+    python 5_Symbols/collection_profiles.py provision mac_repo_index --profile compact
+    python 5_Symbols/collection_profiles.py provision mac_repo_index --profile my_vault.json --dry-run
+
+Usage (as a module):
+    from collection_profiles import provision, prepare_collection, bulk_load, footprint
+    changes = provision(client, "mac_repo_index", "compact")
+    created = prepare_collection(client, "mac_repo_index", args.profile)   # in a writer
+    with bulk_load(client, "mac_repo_index"):
+        engine.ingest_paths(paths)
+    print(footprint(client, "mac_repo_index")["ram_mb"])
+"""
+
+import os
+import json
+import time
+import argparse
+from contextlib import contextmanager
+
+from qdrant_connection import connect, QDRANT_HOST, QDRANT_PORT
+
+# ── Configuration ──────────────────────────────────────────────────────────────
+LXC_IP          = QDRANT_HOST   # env QDRANT_HOST / config file, see qdrant_connection.py
+COLLECTION      = "mac_repo_index"
+DEFAULT_PROFILE = os.environ.get("QDRANT_COLLECTION_PROFILE", "default")
+LATENCY_QUERIES = 50     # stored vectors replayed as queries by measure_latency()
+READY_TIMEOUT   = 600    # seconds to wait for the optimizer after an update
+INDEXING_THRESHOLD = 20000   # KB — Qdrant's default, restored when nothing better is known
+# ───────────────────────────────────────────────────────────────────────────────
+
+DEFAULTS = {
+    "datatype":     "float32",
+    "on_disk":      False,
+    "quantization": None,
+    "quantile":     0.99,
+    "always_ram":   True,
+    "rescore":      True,
+    "oversampling": 1.0,
+    "m":            16,
+    "ef_construct": 100,
+    "hnsw_ef":      None,
+}
+
+PROFILES = {
+    # fp32 vectors and the HNSW graph in RAM — what the scripts always created
+    "default": {},
+    # Half the vector RAM, no quantization error
+    "float16": {"datatype": "float16"},
+    # int8 copies in RAM, originals on disk for rescoring — ~4x less RAM
+    "compact": {"quantization": "scalar", "on_disk": True, "oversampling": 2.0},
+    # 1-bit codes in RAM, float16 originals on disk, a leaner graph — the
+    # smallest footprint; oversampling makes up for binary's coarse ranking
+    "tiny": {"quantization": "binary", "datatype": "float16", "on_disk": True,
+             "oversampling": 3.0, "m": 12},
+}
+
+_BYTES = {"float32": 4, "float16": 2, "uint8": 1}
+
+
+def load_profile(profile=None) -> dict:
+    """
+    Resolve a profile name, JSON file path or dict to a complete profile.
+
+    Args:
+        profile: Name from PROFILES, path to a .json file, a dict, or None
+                 for DEFAULT_PROFILE
+    """
+    if profile is None:
+        profile = DEFAULT_PROFILE
+    if isinstance(profile, str):
+        if profile in PROFILES:
+            profile = PROFILES[profile]
+        elif os.path.exists(profile):
+            with open(profile, "r") as f:
+                profile = json.load(f)
+        else:
+            raise ValueError(f"Unknown collection profile {profile!r} "
+                             f"(built-in: {', '.join(PROFILES)}; or a JSON file)")
+    unknown = set(profile) - set(DEFAULTS)
+    if unknown:
+        raise ValueError(f"Unknown profile key(s): {', '.join(sorted(unknown))}")
+    if profile.get("quantization") not in (None, "scalar", "binary"):
+        raise ValueError(f"quantization must be null, 'scalar' or 'binary', not {profile['quantization']!r}")
+    return {**DEFAULTS, **profile}
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+#  QDRANT CONFIG OBJECTS
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def quantization_config(profile: dict):
+    """ScalarQuantization / BinaryQuantization for a profile, or None."""
+    from qdrant_client.models import (ScalarQuantization, ScalarQuantizationConfig, ScalarType,
+                                      BinaryQuantization, BinaryQuantizationConfig)
+    if profile["quantization"] == "scalar":
+        return ScalarQuantization(scalar=ScalarQuantizationConfig(
+            type=ScalarType.INT8, quantile=profile["quantile"], always_ram=profile["always_ram"]))
+    if profile["quantization"] == "binary":
+        return BinaryQuantization(binary=BinaryQuantizationConfig(always_ram=profile["always_ram"]))
+    return None
+
+
+def search_setting(profile: dict) -> dict:
+    """A profile's search-time keys (hnsw_ef, rescore, oversampling) as a search_tuning setting dict."""
+    setting = {}
+    if profile["hnsw_ef"] is not None:
+        setting["hnsw_ef"] = profile["hnsw_ef"]
+    if profile["quantization"]:
+        setting["quantization"] = {"rescore": profile["rescore"], "oversampling": profile["oversampling"]}
+    return setting
+
+
+def seed_search_params(client, collection: str, profile: dict):
+    """
+    Store the profile's search-time params where the search paths read them
+    (search_tuning.PARAMS_FILE), replacing any earlier tuning — it was
+    measured against the old storage layout. Re-run search_tuning.py to
+    refine them. Skipped for embedded clients, which ignore search params.
+    """
+    from search_tuning import load_tuned, save_tuned
+    if _is_embedded(client):
+        return
+    setting = search_setting(profile)
+    if not setting and collection not in load_tuned():
+        return   # defaults, and nothing to reset
+    save_tuned(collection, {"params": setting, "setting": "profile",
+                            "tuned_at": time.strftime("%Y-%m-%dT%H:%M:%S")})
+
+
+def create_collection(client, collection: str, profile=None, dim: int = 384):
+    """Create a collection laid out as the profile says (payload indexes: see ensure_collection)."""
+    from qdrant_client.models import Distance, VectorParams, Datatype, HnswConfigDiff
+    profile = load_profile(profile)
+    client.create_collection(
+        collection_name=collection,
+        vectors_config=VectorParams(size=dim, distance=Distance.COSINE, on_disk=profile["on_disk"],
+                                    datatype=Datatype(profile["datatype"])),
+        hnsw_config=HnswConfigDiff(m=profile["m"], ef_construct=profile["ef_construct"]),
+        quantization_config=quantization_config(profile),
+    )
+    seed_search_params(client, collection, profile)
+
+
+def current_profile(client, collection: str) -> dict:
+    """Read an existing collection's storage settings back as a profile dict."""
+    params = client.get_collection(collection).config
+    vectors = params.params.vectors
+    quant = params.quantization_config
+    kind, quantile, always_ram = None, DEFAULTS["quantile"], DEFAULTS["always_ram"]
+    if quant is not None and getattr(quant, "scalar", None) is not None:
+        kind, quantile = "scalar", quant.scalar.quantile or quantile
+        always_ram = bool(quant.scalar.always_ram)
+    elif quant is not None and getattr(quant, "binary", None) is not None:
+        kind, always_ram = "binary", bool(quant.binary.always_ram)
+    datatype = getattr(vectors, "datatype", None)
+    return {
+        **DEFAULTS,
+        "datatype":     datatype.value if datatype is not None else "float32",
+        "on_disk":      bool(vectors.on_disk),
+        "quantization": kind,
+        "quantile":     quantile,
+        "always_ram":   always_ram,
+        "m":            params.hnsw_config.m,
+        "ef_construct": params.hnsw_config.ef_construct,
+    }
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+#  PROVISIONING
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def plan_changes(current: dict, profile: dict) -> tuple[dict, list[str], list[str]]:
+    """
+    Diff a collection's current settings against a profile.
+
+    Returns:
+        (update_collection kwargs, descriptions of what they change,
+        descriptions of changes that need a rebuild)
+    """
+    from qdrant_client.models import VectorParamsDiff, HnswConfigDiff, Disabled
+    kwargs, changes, rebuild = {}, [], []
+
+    if current["datatype"] != profile["datatype"]:
+        rebuild.append(f"datatype {current['datatype']} → {profile['datatype']}")
+    if current["on_disk"] != profile["on_disk"]:
+        kwargs["vectors_config"] = {"": VectorParamsDiff(on_disk=profile["on_disk"])}
+        changes.append(f"on_disk {current['on_disk']} → {profile['on_disk']}")
+    if (current["m"], current["ef_construct"]) != (profile["m"], profile["ef_construct"]):
+        kwargs["hnsw_config"] = HnswConfigDiff(m=profile["m"], ef_construct=profile["ef_construct"])
+        changes.append(f"hnsw m={current['m']} ef_construct={current['ef_construct']} → "
+                       f"m={profile['m']} ef_construct={profile['ef_construct']}")
+    quant_keys = ("quantization", "quantile", "always_ram") if profile["quantization"] == "scalar" \
+        else ("quantization", "always_ram") if profile["quantization"] else ("quantization",)
+    if any(current[k] != profile[k] for k in quant_keys):
+        kwargs["quantization_config"] = quantization_config(profile) or Disabled.DISABLED
+        changes.append(f"quantization {current['quantization'] or 'none'} → {profile['quantization'] or 'none'}")
+    return kwargs, changes, rebuild
+
+
+def provision(client, collection: str, profile=None, dim: int = 384, dry_run: bool = False) -> dict:
+    """
+    Create the collection from a profile, or bring an existing one in line.
+
+    Args:
+        client:     QdrantClient
+        collection: Collection name
+        profile:    Profile name / JSON path / dict (see load_profile)
+        dim:        Vector size, used only when creating
+        dry_run:    Only report what would change
+
+    Returns:
+        {"created": bool, "changes": [...], "rebuild": [...]} — rebuild
+        lists differences an in-place update can't apply
+    """
+    from ingest_engine import ensure_collection
+
+    profile = load_profile(profile)
+    if not client.collection_exists(collection):
+        if not dry_run:
+            ensure_collection(client, collection, dim=dim, profile=profile)
+        return {"created": True, "changes": [], "rebuild": []}
+
+    kwargs, changes, rebuild = plan_changes(current_profile(client, collection), profile)
+    if kwargs and not dry_run:
+        client.update_collection(collection_name=collection, **kwargs)
+        seed_search_params(client, collection, profile)
+    return {"created": False, "changes": changes, "rebuild": rebuild}
+
+
+def prepare_collection(client, collection: str, profile=None, dim: int = 384, progress=print) -> bool:
+    """
+    What writers call before ingesting. Without a profile the collection is
+    only created if missing (with QDRANT_COLLECTION_PROFILE); with one, an
+    existing collection is also updated to match it.
+
+    Returns:
+        True if the collection was created
+    """
+    from ingest_engine import ensure_collection
+
+    if profile is None:
+        return ensure_collection(client, collection, dim=dim)
+    result = provision(client, collection, profile, dim=dim)
+    if progress:
+        for change in result["changes"]:
+            progress(f"  ✓ {collection}: {change}")
+        for change in result["rebuild"]:
+            progress(f"  ⚠️  {collection}: {change} needs a rebuild (collection_profiles.py provision)")
+    ensure_collection(client, collection, dim=dim)   # payload indexes on an existing collection
+    return result["created"]
+
+
+def wait_ready(client, collection: str, timeout: float = READY_TIMEOUT) -> bool:
+    """Wait until the optimizer has rebuilt segments / quantized vectors (status green)."""
+    from qdrant_client.models import CollectionStatus
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if client.get_collection(collection).status == CollectionStatus.GREEN:
+            return True
+        time.sleep(1.0)
+    return False
+
+
+def _is_embedded(client) -> bool:
+    """Embedded (:memory: / path=) clients have no optimizer to suspend."""
+    opts = getattr(client, "init_options", {}) or {}
+    return opts.get("location") == ":memory:" or bool(opts.get("path"))
+
+
+@contextmanager
+def bulk_load(client, collection: str, progress=print, timeout: float = READY_TIMEOUT):
+    """
+    Suspend HNSW indexing while a full ingest / restore streams points in.
+
+    Sets the collection's indexing_threshold to 0, so incoming points stay in
+    plain (unindexed) segments instead of being re-indexed batch after
+    batch; on exit — also after an error — restores the previous threshold
+    and waits for the optimizer to build the index once and report green.
+    A threshold already at 0 (a bulk load that was killed) is restored to
+    Qdrant's default.
+
+    Yields:
+        dict that receives "upload_s", "index_s" and "ready" on exit
+    """
+    from qdrant_client.models import OptimizersConfigDiff
+
+    timings = {}
+    if _is_embedded(client):
+        yield timings   # nothing to defer — local mode searches by brute force
+        return
+
+    threshold = client.get_collection(collection).config.optimizer_config.indexing_threshold
+    client.update_collection(collection_name=collection,
+                             optimizers_config=OptimizersConfigDiff(indexing_threshold=0))
+    if progress:
+        progress(f"  Bulk load: indexing of {collection} suspended")
+    t0 = time.perf_counter()
+    try:
+        yield timings
+    finally:
+        timings["upload_s"] = round(time.perf_counter() - t0, 1)
+        t1 = time.perf_counter()
+        client.update_collection(collection_name=collection, optimizers_config=OptimizersConfigDiff(
+            indexing_threshold=threshold or INDEXING_THRESHOLD))
+        if progress:
+            progress(f"  Bulk load: upload {timings['upload_s']}s — indexing re-enabled, waiting for the optimizer...")
+        timings["ready"] = wait_ready(client, collection, timeout)
+        timings["index_s"] = round(time.perf_counter() - t1, 1)
+        if progress:
+            state = "index built" if timings["ready"] else f"still optimizing after {timeout:.0f}s"
+            progress(f"  Bulk load: {state} — upload {timings['upload_s']}s, index build {timings['index_s']}s")
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+#  FOOTPRINT & LATENCY
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def estimate_memory(points: int, dim: int, profile: dict) -> dict:
+    """
+    Approximate RAM / disk for vectors and the HNSW graph, in MB.
+
+    Originals cost dim × 2 or 4 bytes per point, scalar codes dim bytes,
+    binary codes dim / 8 bytes; the HNSW graph ~2·m 4-byte links per point
+    on level 0 plus ~10% for the upper levels. Payload and its indexes are
+    not included.
+    """
+    mb = 1024 * 1024
+    originals = points * dim * _BYTES.get(profile["datatype"], 4)
+    quantized = {"scalar": points * dim, "binary": points * ((dim + 7) // 8)}.get(profile["quantization"], 0)
+    graph = int(points * profile["m"] * 2 * 4 * 1.1)
+    ram = graph + (0 if profile["on_disk"] else originals) + (quantized if profile["always_ram"] else 0)
+    return {
+        "points":       points,
+        "vectors_mb":   round(originals / mb, 1),
+        "quantized_mb": round(quantized / mb, 1),
+        "hnsw_mb":      round(graph / mb, 1),
+        "ram_mb":       round(ram / mb, 1),
+        "disk_mb":      round((originals + quantized + graph) / mb, 1),
+    }
+
+
+def footprint(client, collection: str) -> dict:
+    """estimate_memory() for an existing collection's point count and settings."""
+    info = client.get_collection(collection)
+    return estimate_memory(info.points_count or 0, info.config.params.vectors.size,
+                           current_profile(client, collection))
+
+
+def measure_latency(client, collection: str, queries: int = LATENCY_QUERIES, limit: int = 10) -> dict:
+    """
+    Search latency as the search servers see it (grouped by path, with the
+    search params they load — see search_tuning.tuned_search_params).
+
+    Stored vectors are replayed as queries, so no embedding model is
+    needed. Returns {"queries", "p50_ms", "p95_ms", "mean_ms"}.
+    """
+    import numpy as np
+    from search_tuning import tuned_search_params
+
+    params = tuned_search_params(collection)
+    points, _ = client.scroll(collection_name=collection, limit=queries,
+                              with_payload=False, with_vectors=True)
+    vectors = [p.vector for p in points if p.vector is not None]
+    if not vectors:
+        return {"queries": 0, "p50_ms": None, "p95_ms": None, "mean_ms": None}
+
+    def run(vector):
+        client.query_points_groups(collection_name=collection, query=vector, group_by="path",
+                                   limit=limit, group_size=1, with_payload=False, search_params=params)
+
+    for vector in vectors[:3]:
+        run(vector)   # warm caches / page in memory-mapped segments
+    timings = []
+    for vector in vectors:
+        t0 = time.perf_counter()
+        run(vector)
+        timings.append((time.perf_counter() - t0) * 1000)
+    timings = np.array(timings)
+    return {
+        "queries": len(timings),
+        "p50_ms":  round(float(np.percentile(timings, 50)), 2),
+        "p95_ms":  round(float(np.percentile(timings, 95)), 2),
+        "mean_ms": round(float(timings.mean()), 2),
+    }
+
+
+def _print_report(label: str, mem: dict, lat: dict):
+    print(f"  {label:<7} RAM ≈ {mem['ram_mb']:>8.1f} MB  (vectors {mem['vectors_mb']} MB, "
+          f"quantized {mem['quantized_mb']} MB, hnsw {mem['hnsw_mb']} MB) | disk ≈ {mem['disk_mb']} MB")
+    if lat and lat["queries"]:
+        print(f"  {'':<7} search p50 {lat['p50_ms']} ms, p95 {lat['p95_ms']} ms over {lat['queries']} queries")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Create / update Qdrant collections from storage profiles")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("list", help="Show the built-in profiles")
+    show = sub.add_parser("show", help="Current settings, footprint and latency of a collection")
+    show.add_argument("collection", nargs="?", default=COLLECTION)
+    prov = sub.add_parser("provision", help="Create or update a collection from a profile")
+    prov.add_argument("collection", nargs="?", default=COLLECTION)
+    prov.add_argument("--profile", default=DEFAULT_PROFILE, help=f"Profile name or JSON file (default: {DEFAULT_PROFILE})")
+    prov.add_argument("--dim", type=int, default=384, help="Vector size when creating (default: 384)")
+    prov.add_argument("--dry-run", action="store_true", help="Only show what would change")
+    for p in (show, prov):
+        p.add_argument("--host", default=LXC_IP, help=f"Qdrant host (default: {LXC_IP})")
+        p.add_argument("--port", type=int, default=QDRANT_PORT, help=f"Qdrant port (default: {QDRANT_PORT})")
+        p.add_argument("--queries", type=int, default=LATENCY_QUERIES, help="Latency probe queries (0 to skip)")
+        p.add_argument("--json", action="store_true", help="Output the report as JSON")
+    args = parser.parse_args()
+
+    if args.command == "list":
+        for name, overrides in PROFILES.items():
+            mem = estimate_memory(100_000, 384, load_profile(name))
+            print(f"  {name:<8} {json.dumps(overrides) if overrides else '(defaults)'}")
+            print(f"  {'':<8} ≈ {mem['ram_mb']} MB RAM per 100k chunks of 384 dims")
+        return
+
+    client = connect("bulk", host=args.host, port=args.port)
+
+    if args.command == "show":
+        current = current_profile(client, args.collection)
+        mem = footprint(client, args.collection)
+        lat = measure_latency(client, args.collection, args.queries) if args.queries else None
+        if args.json:
+            print(json.dumps({"profile": current, "footprint": mem, "latency": lat}))
+            return
+        print(f"  {args.collection}: {json.dumps({k: current[k] for k in DEFAULTS if k in current})}")
+        _print_report("now", mem, lat)
+        return
+
+    profile = load_profile(args.profile)
+    existed = client.collection_exists(args.collection)
+    before = after = lat_before = lat_after = None
+    if existed:
+        before = footprint(client, args.collection)
+        lat_before = measure_latency(client, args.collection, args.queries) if args.queries else None
+
+    result = provision(client, args.collection, profile, dim=args.dim, dry_run=args.dry_run)
+    if result["created"]:
+        print(f"  {'Would create' if args.dry_run else '✓ Created'} {args.collection} with profile {args.profile}")
+    for change in result["changes"]:
+        print(f"  {'~' if args.dry_run else '✓'} {change}")
+    for change in result["rebuild"]:
+        print(f"  ⚠️  {change} can't be changed in place — create a new collection with this "
+              f"profile and move the points with qdrant_snapshot.py export / import")
+    if existed and not result["changes"] and not result["rebuild"]:
+        print(f"  ✓ {args.collection} already matches profile {args.profile}")
+
+    if args.dry_run and existed:
+        points = before["points"]
+        dim = client.get_collection(args.collection).config.params.vectors.size
+        after = estimate_memory(points, dim, profile)
+    elif not args.dry_run:
+        if result["changes"] and not wait_ready(client, args.collection):
+            print(f"  ⚠️  Optimizer still busy after {READY_TIMEOUT}s — numbers below are provisional")
+        after = footprint(client, args.collection)
+        if args.queries:
+            lat_after = measure_latency(client, args.collection, args.queries)
+
+    if args.json:
+        print(json.dumps({**result, "before": {"footprint": before, "latency": lat_before},
+                          "after": {"footprint": after, "latency": lat_after}}))
+        return
+    if before:
+        _print_report("before", before, lat_before)
+    if after:
+        _print_report("after" if not args.dry_run else "planned", after, lat_after)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,24 @@
+"""
+pytest setup for the scripts in 5_Symbols.
+
+Tests run against QdrantClient(":memory:") and benchmark.HashEncoder — no
+Qdrant server and no model download. Caches and state files are pointed
+at a throwaway directory before any script module reads its configuration.
+
+Run:
+    python -m pytest -q 5_Symbols
+"""
+
+import os
+import tempfile
+
+_SCRATCH = tempfile.mkdtemp(prefix="qdrant_secondbrain_tests_")
+os.environ.setdefault("QDRANT_EMBED_CACHE",    os.path.join(_SCRATCH, "embeddings"))
+os.environ.setdefault("QDRANT_SYNC_STATE",     os.path.join(_SCRATCH, "sync_state.sqlite"))
+os.environ.setdefault("QDRANT_OUTBOX",         os.path.join(_SCRATCH, "outbox.sqlite"))
+os.environ.setdefault("QDRANT_GENERATION_DIR", os.path.join(_SCRATCH, "generations"))
+os.environ.setdefault("QDRANT_SEARCH_PARAMS",  os.path.join(_SCRATCH, "search_params.json"))
+os.environ.setdefault("QDRANT_EMBED_SOCKET",   os.path.join(_SCRATCH, "no-daemon.sock"))
+
+# Manual smoke script against the real server, not a pytest module
+collect_ignore = ["ingest_test.py"]
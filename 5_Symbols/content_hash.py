@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Fast content digests for change detection.
+
+Uses xxHash (xxh3_128) when the `xxhash` package is installed and falls
+back to the stdlib's BLAKE2b otherwise. Digests carry an algorithm prefix
+("xxh3:" / "b2:") so a state file or payload written on a machine with
+xxhash is never mistaken for a match on a machine without it.
+
+Usage (as a module):
+    from content_hash import hash_bytes, hash_file
+    digest       = hash_bytes(data)
+    size, digest = hash_file("/path/to/note.md")
+"""
+
+import hashlib
+
+try:
+    import xxhash
+except ImportError:  # optional speed-up
+    xxhash = None
+
+READ_CHUNK = 1 << 20
+
+
+def hash_bytes(data: bytes) -> str:
+    """Return the prefixed content digest of a bytes object."""
+    if xxhash is not None:
+        return "xxh3:" + xxhash.xxh3_128_hexdigest(data)
+    return "b2:" + hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def hash_file(path: str) -> tuple[int, str]:
+    """
+    Hash a file's bytes without decoding them.
+
+    Returns:
+        (size in bytes, prefixed digest)
+    """
+    h = xxhash.xxh3_128() if xxhash is not None else hashlib.blake2b(digest_size=16)
+    size = 0
+    with open(path, "rb") as f:
+        while chunk := f.read(READ_CHUNK):
+            h.update(chunk)
+            size += len(chunk)
+    prefix = "xxh3:" if xxhash is not None else "b2:"
+    return size, prefix + h.hexdigest()
@@ -1,12 +1,15 @@
 import os
-import hashlib
 import time
-from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams, PointStruct
-from sentence_transformers import SentenceTransformer
+
+from qdrant_connection import connect, QDRANT_HOST
+from embedding_cache import load_encoder
+from ingest_engine import IngestEngine, ensure_collection
+from repo_scanner import iter_scan
+from result_cache import bump_generation
+from outbox import Outbox, replay_outbox
 
 # --- CONFIG ---
-LXC_IP     = "192.168.2.227"
+LXC_IP     = QDRANT_HOST   # env QDRANT_HOST / config file, see qdrant_connection.py
 REPO_PATH  = "/Users/rifaterdemsahin/projects/secondbrain/"
 COLLECTION = "mac_repo_index"
 LAST_RUN_FILE = os.path.join(os.path.dirname(__file__), "last_run_macos.txt")
@@ -21,60 +24,34 @@ else:
 current_time = time.time()
 
 # 1. Connect to Qdrant on Proxmox
-client = QdrantClient(host=LXC_IP, port=6333)
-model  = SentenceTransformer('all-MiniLM-L6-v2')
+client = connect("bulk", host=LXC_IP)
+model  = load_encoder('all-MiniLM-L6-v2')  # on-disk embedding cache, model loaded on first miss
 
-# 2. Create collection if missing (384-dim, cosine similarity)
-if not client.collection_exists(COLLECTION):
-    client.create_collection(
-        collection_name=COLLECTION,
-        vectors_config=VectorParams(size=384, distance=Distance.COSINE),
-    )
+# 2. Create collection if missing (384-dim, cosine similarity, path/chunk_index indexes)
+if ensure_collection(client, COLLECTION):
     print(f"Created collection: {COLLECTION}")
 else:
     print(f"Collection exists: {COLLECTION}")
+replay_outbox(client)   # writes parked by earlier offline / failed runs go first
 
 # 3. Walk and ingest markdown files modified since last run
 print(f"Starting sync to Proxmox at {LXC_IP}...")
-count   = 0
-errors  = 0
-
-for root, _, files in os.walk(REPO_PATH):
-    for file in files:
-        if not file.endswith(".md"):
-            continue
-
-        full_path = os.path.join(root, file)
-        if os.path.getmtime(full_path) <= last_run:
-            continue  # skip if not modified since last run
-
-        try:
-            with open(full_path, 'r', encoding='utf-8') as f:
-                text = f.read()
 
-            # Stable ID from file path so re-runs upsert correctly
-            file_id = int(hashlib.md5(full_path.encode()).hexdigest(), 16) % (10**12)
 
-            # Encode locally on Mac (no API key needed)
-            vector = model.encode(text[:8000]).tolist()
+def modified_since_last_run():
+    # mtimes come from the scan itself — no extra stat per file
+    for full_path, mtime, _ in iter_scan(REPO_PATH):
+        if mtime > last_run:
+            yield full_path
 
-            client.upsert(
-                collection_name=COLLECTION,
-                points=[PointStruct(
-                    id=file_id,
-                    vector=vector,
-                    payload={"filename": file, "path": full_path}
-                )]
-            )
-            count += 1
-            if count % 20 == 0:
-                print(f"Indexed {count} files...")
 
-        except Exception as e:
-            errors += 1
-            print(f"Error with {file}: {e}")
+# Chunk + encode locally on Mac in batches (no API key needed)
+engine = IngestEngine(client, model, COLLECTION, progress_every=20, outbox=Outbox())
+stats  = engine.ingest_paths(modified_since_last_run())
+if stats.files:
+    bump_generation(client, COLLECTION)   # invalidate cached search results
 
-print(f"Done! Indexed: {count} | Errors: {errors}")
+print(f"Done! {stats.summary()}")
 
 # Update last run time
 with open(LAST_RUN_FILE, 'w') as f:
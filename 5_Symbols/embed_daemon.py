@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+Resident embedding daemon on a Unix socket.
+
+The pre-commit hook and the agent CLI are short-lived: each run used to pay
+seconds of import and model-load time for one or two encodes. This daemon
+loads the model once and serves batched encode requests over a local Unix
+socket. Clients use it transparently — embedding_cache.load_encoder() and
+agent_query_qdrant try the daemon first and fall back to loading the model
+in-process when it isn't running (or dies mid-run).
+
+Wire format — every message, both directions:
+    !II header_len payload_len | JSON header | payload bytes
+Requests:
+    {"op": "ping"}                                → model info + counters
+    {"op": "encode", "texts": [...], "batch_size": n}
+                                                  → {"n", "dim"} + float32 rows
+    {"op": "stop"}                                → daemon exits
+
+Start (keep it running, e.g. from a login item / launchd / tmux):
+    python 5_Symbols/embed_daemon.py
+    python 5_Symbols/embed_daemon.py --backend onnx-int8
+    python 5_Symbols/embed_daemon.py --status
+    python 5_Symbols/embed_daemon.py --stop
+
+Usage (as a module):
+    from embed_daemon import connect_daemon
+    model = connect_daemon("all-MiniLM-L6-v2")   # None if no daemon is running
+"""
+
+import os
+import json
+import time
+import socket
+import struct
+import argparse
+import threading
+import socketserver
+
+import numpy as np
+
+# ── Configuration ──────────────────────────────────────────────────────────────
+MODEL_NAME      = "all-MiniLM-L6-v2"
+SOCKET_PATH     = os.environ.get(
+    "QDRANT_EMBED_SOCKET",
+    os.path.join(os.path.expanduser("~"), ".cache", "qdrant_secondbrain", "embed.sock"),
+)
+CONNECT_TIMEOUT = 0.2    # seconds — a missing daemon must cost next to nothing
+ENCODE_TIMEOUT  = 300    # seconds for one encode round trip (large sync batches)
+# ───────────────────────────────────────────────────────────────────────────────
+
+_FRAME = struct.Struct("!II")
+
+
+def _recv_exact(sock: socket.socket, n: int) -> bytes:
+    buf = bytearray()
+    while len(buf) < n:
+        chunk = sock.recv(min(n - len(buf), 1 << 20))
+        if not chunk:
+            raise ConnectionError("embedding daemon connection closed")
+        buf += chunk
+    return bytes(buf)
+
+
+def send_message(sock: socket.socket, header: dict, payload: bytes = b""):
+    head = json.dumps(header).encode()
+    sock.sendall(_FRAME.pack(len(head), len(payload)) + head + payload)
+
+
+def recv_message(sock: socket.socket):
+    head_len, payload_len = _FRAME.unpack(_recv_exact(sock, _FRAME.size))
+    header = json.loads(_recv_exact(sock, head_len))
+    return header, _recv_exact(sock, payload_len) if payload_len else b""
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+#  CLIENT
+# ═══════════════════════════════════════════════════════════════════════════════
+
+class DaemonEncoder:
+    """
+    SentenceTransformer-compatible .encode() that forwards to the daemon.
+
+    If the daemon goes away mid-run, the encoder loads the model in-process
+    through `fallback` and carries on.
+
+    Args:
+        sock:     Connected Unix socket
+        info:     The daemon's ping reply
+        fallback: Zero-arg callable returning an in-process model
+    """
+
+    def __init__(self, sock: socket.socket, info: dict, fallback=None):
+        self.sock     = sock
+        self.info     = info
+        self.fallback = fallback
+        self._local   = None
+        self._lock    = threading.Lock()
+
+    def encode(self, sentences, batch_size: int = 32, **kwargs):
+        single = isinstance(sentences, str)
+        texts  = [sentences] if single else list(sentences)
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        if self._local is None:
+            try:
+                with self._lock:
+                    send_message(self.sock, {"op": "encode", "texts": texts, "batch_size": batch_size})
+                    header, payload = recv_message(self.sock)
+                if "error" in header:
+                    raise RuntimeError(header["error"])
+                out = np.frombuffer(payload, dtype=np.float32).reshape(header["n"], header["dim"])
+                return out[0] if single else out
+            except (OSError, ValueError, RuntimeError) as e:
+                if self.fallback is None:
+                    raise
+                print(f"  ⚠️  Embedding daemon unavailable ({e}) — loading the model in-process")
+                self._local = self.fallback()
+        return self._local.encode(sentences, batch_size=batch_size, **kwargs)
+
+
+def connect_daemon(model_name: str = MODEL_NAME, backend: str = None,
+                   socket_path: str = SOCKET_PATH, fallback=None):
+    """
+    Connect to a running daemon serving model_name on a compatible backend.
+
+    Returns a DaemonEncoder, or None when there is no daemon (or it serves
+    a different model / backend tag) — callers then load the model themselves.
+    """
+    if not hasattr(socket, "AF_UNIX") or not os.path.exists(socket_path):
+        return None
+    from embedding_backend import model_tag
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.settimeout(CONNECT_TIMEOUT)
+        sock.connect(socket_path)
+        send_message(sock, {"op": "ping"})
+        info, _ = recv_message(sock)
+    except (OSError, ValueError):
+        sock.close()
+        return None
+    if info.get("tag") != model_tag(model_name, backend):
+        sock.close()
+        return None
+    sock.settimeout(ENCODE_TIMEOUT)
+    return DaemonEncoder(sock, info, fallback)
+
+
+def load_model_or_daemon(model_name: str = MODEL_NAME, backend: str = None):
+    """The daemon if one is serving model_name, else the model loaded in-process."""
+    from embedding_backend import load_model
+    fallback = lambda: load_model(model_name, backend)
+    return connect_daemon(model_name, backend, fallback=fallback) or fallback()
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+#  DAEMON
+# ═══════════════════════════════════════════════════════════════════════════════
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        server = self.server
+        while True:
+            try:
+                header, _ = recv_message(self.request)
+            except (OSError, ValueError, struct.error):
+                return
+            op = header.get("op")
+            if op == "ping":
+                send_message(self.request, server.info())
+            elif op == "encode":
+                try:
+                    texts = header.get("texts") or []
+                    with server.lock:   # one forward pass at a time; requests are already batched
+                        vecs = np.asarray(
+                            server.model.encode(texts, batch_size=int(header.get("batch_size", 32)),
+                                                show_progress_bar=False),
+                            dtype=np.float32,
+                        ).reshape(len(texts), -1)
+                        server.requests += 1
+                        server.texts    += len(texts)
+                    send_message(self.request, {"n": vecs.shape[0], "dim": vecs.shape[1]}, vecs.tobytes())
+                except Exception as e:
+                    send_message(self.request, {"error": str(e)})
+            elif op == "stop":
+                send_message(self.request, {"ok": True})
+                threading.Thread(target=server.shutdown, daemon=True).start()
+                return
+            else:
+                send_message(self.request, {"error": f"unknown op {op!r}"})
+
+
+class EmbedDaemon(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, model_name: str, backend: str):
+        from embedding_backend import load_model, model_tag
+        self.model_name = model_name
+        self.backend    = backend
+        self.tag        = model_tag(model_name, backend)
+        self.model      = load_model(model_name, backend)
+        self.lock       = threading.Lock()
+        self.started    = time.time()
+        self.requests   = 0
+        self.texts      = 0
+        super().__init__(socket_path, _Handler)
+        os.chmod(socket_path, 0o600)
+
+    def info(self) -> dict:
+        return {
+            "model":    self.model_name,
+            "backend":  self.backend,
+            "tag":      self.tag,
+            "pid":      os.getpid(),
+            "uptime":   round(time.time() - self.started),
+            "requests": self.requests,
+            "texts":    self.texts,
+        }
+
+
+def _claim_socket(path: str):
+    """Remove a stale socket file; refuse if a live daemon already owns it."""
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.settimeout(CONNECT_TIMEOUT)
+        probe.connect(path)
+    except OSError:
+        os.unlink(path)   # nobody listening — left over from a crash
+        return
+    finally:
+        probe.close()
+    raise SystemExit(f"  ❌ An embedding daemon is already running on {path}")
+
+
+def _request(socket_path: str, header: dict):
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(CONNECT_TIMEOUT * 10)
+    try:
+        sock.connect(socket_path)
+        send_message(sock, header)
+        return recv_message(sock)[0]
+    finally:
+        sock.close()
+
+
+def main():
+    import embedding_backend
+
+    parser = argparse.ArgumentParser(description="Resident embedding daemon on a Unix socket")
+    parser.add_argument("--socket", default=SOCKET_PATH, help=f"Socket path (default: {SOCKET_PATH})")
+    parser.add_argument("--model", default=MODEL_NAME, help=f"Model (default: {MODEL_NAME})")
+    parser.add_argument("--backend", choices=embedding_backend.BACKENDS,
+                        help="Embedding backend (default: QDRANT_EMBED_BACKEND or torch)")
+    parser.add_argument("--status", action="store_true", help="Show the running daemon's stats")
+    parser.add_argument("--stop", action="store_true", help="Stop the running daemon")
+    args = parser.parse_args()
+
+    if args.status or args.stop:
+        try:
+            reply = _request(args.socket, {"op": "stop" if args.stop else "ping"})
+        except OSError:
+            print(f"  ✗ No embedding daemon on {args.socket}")
+            return
+        print("  ✓ Daemon stopped" if args.stop else json.dumps(reply, indent=2))
+        return
+
+    backend = args.backend or embedding_backend.EMBED_BACKEND
+    _claim_socket(args.socket)
+    print(f"  Loading model {args.model} ({backend})...")
+    server = EmbedDaemon(args.socket, args.model, backend)
+    print(f"  ✓ Embedding daemon ready on {args.socket} (pid {os.getpid()})")
+    print("  Press Ctrl+C to stop")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        try:
+            os.unlink(args.socket)
+        except OSError:
+            pass
+        print("\n  Daemon stopped.")
+
+
+if __name__ == "__main__":
+    main()
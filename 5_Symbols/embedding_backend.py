@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""
+Pluggable embedding backends for the sentence-transformers models.
+
+PyTorch fp32 is the dominant cost of both ingest and query latency on our
+CPU-only hosts, and importing torch alone costs seconds and hundreds of MB
+of RSS. The same model runs through ONNX Runtime with only `onnxruntime`
+and `tokenizers` installed, and dynamically quantized int8 weights make it
+faster still.
+
+Backends (EMBED_BACKEND, or env QDRANT_EMBED_BACKEND, or --backend where a
+script offers it):
+    torch       SentenceTransformer on PyTorch fp32 — the reference
+    onnx        the same model through ONNX Runtime, fp32
+    onnx-int8   ONNX Runtime with int8 dynamically quantized weights
+
+Every entry point loads its model through load_model(), so one setting
+switches ingest, sync, the pre-commit hook, the search server and the
+agent library together. int8 vectors are cached under their own key
+(see model_tag) so they never mix with fp32 ones in the embedding cache.
+
+The ONNX files are prepared once per machine under ONNX_DIR — fetched from
+the model's Hugging Face repo (sentence-transformers publish onnx/model.onnx),
+or exported locally with torch + transformers if the download fails:
+    python 5_Symbols/embedding_backend.py prepare --backend onnx-int8
+    python 5_Symbols/embedding_backend.py parity  --backend onnx-int8 --repo ~/projects/secondbrain
+
+Usage (as a module):
+    from embedding_backend import load_model
+    model   = load_model("all-MiniLM-L6-v2", backend="onnx-int8")
+    vectors = model.encode(texts, batch_size=64)   # same call as SentenceTransformer
+"""
+
+import os
+import time
+import shutil
+import argparse
+import urllib.request
+
+import numpy as np
+
+# ── Configuration ──────────────────────────────────────────────────────────────
+EMBED_BACKEND  = os.environ.get("QDRANT_EMBED_BACKEND", "torch")
+ONNX_DIR       = os.environ.get(
+    "QDRANT_ONNX_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "qdrant_secondbrain", "onnx"),
+)
+ONNX_THREADS   = int(os.environ.get("QDRANT_ONNX_THREADS", "0"))   # 0 = onnxruntime default
+MAX_SEQ_LENGTH = 256    # all-MiniLM-L6-v2 truncates at 256 word pieces
+MODEL_NAME     = "all-MiniLM-L6-v2"
+# ───────────────────────────────────────────────────────────────────────────────
+
+BACKENDS = ("torch", "onnx", "onnx-int8")
+
+
+def select(backend: str):
+    """Set the process-wide default backend (for --backend flags). Returns it."""
+    global EMBED_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"unknown embedding backend {backend!r} (choose from {', '.join(BACKENDS)})")
+    EMBED_BACKEND = backend
+    return backend
+
+
+def model_tag(model_name: str, backend: str = None) -> str:
+    """
+    Cache key name for vectors from model_name on backend.
+
+    fp32 ONNX reproduces the torch vectors (cosine ≈ 1.0), so they share a
+    key; int8 vectors differ slightly and get their own.
+    """
+    backend = backend or EMBED_BACKEND
+    return f"{model_name}@int8" if backend == "onnx-int8" else model_name
+
+
+def _hub_repo(model_name: str) -> str:
+    return model_name if "/" in model_name else f"sentence-transformers/{model_name}"
+
+
+def onnx_dir(model_name: str) -> str:
+    return os.path.join(ONNX_DIR, model_name.replace("/", "__"))
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+#  PREPARING THE ONNX MODEL
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def _hub_download(repo: str, filename: str, dest: str):
+    tmp = dest + ".part"
+    try:
+        from huggingface_hub import hf_hub_download
+        shutil.copyfile(hf_hub_download(repo, filename), tmp)
+    except ImportError:
+        urllib.request.urlretrieve(f"https://huggingface.co/{repo}/resolve/main/{filename}", tmp)
+    os.replace(tmp, dest)
+
+
+def _export_with_torch(repo: str, out_dir: str):
+    """Fallback: export the transformer to ONNX locally (needs torch + transformers, once)."""
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    tokenizer = AutoTokenizer.from_pretrained(repo)
+    model     = AutoModel.from_pretrained(repo).eval()
+    tokenizer.backend_tokenizer.save(os.path.join(out_dir, "tokenizer.json"))
+
+    sample = tokenizer(["export sample"], return_tensors="pt")
+    names  = [n for n in ("input_ids", "attention_mask", "token_type_ids") if n in sample]
+    tmp    = os.path.join(out_dir, "model.onnx.part")
+    torch.onnx.export(
+        model, tuple(sample[n] for n in names), tmp,
+        input_names=names,
+        output_names=["last_hidden_state"],
+        dynamic_axes={n: {0: "batch", 1: "seq"} for n in names + ["last_hidden_state"]},
+        opset_version=14,
+    )
+    os.replace(tmp, os.path.join(out_dir, "model.onnx"))
+
+
+def prepare_onnx(model_name: str, quantized: bool = False) -> str:
+    """
+    Make sure the ONNX model (and its int8 variant if asked) exists locally.
+
+    Returns:
+        Path of the .onnx file to load
+    """
+    out_dir = onnx_dir(model_name)
+    fp32    = os.path.join(out_dir, "model.onnx")
+    int8    = os.path.join(out_dir, "model_int8.onnx")
+    os.makedirs(out_dir, exist_ok=True)
+
+    if not (os.path.exists(fp32) and os.path.exists(os.path.join(out_dir, "tokenizer.json"))):
+        repo = _hub_repo(model_name)
+        print(f"  Preparing ONNX model for {model_name} in {out_dir}...")
+        try:
+            _hub_download(repo, "tokenizer.json", os.path.join(out_dir, "tokenizer.json"))
+            _hub_download(repo, "onnx/model.onnx", fp32)
+        except Exception as e:
+            print(f"  ⚠️  Download from {repo} failed ({e}) — exporting locally with torch")
+            _export_with_torch(repo, out_dir)
+
+    if quantized and not os.path.exists(int8):
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        print("  Quantizing ONNX model to int8...")
+        quantize_dynamic(fp32, int8 + ".part", weight_type=QuantType.QInt8)
+        os.replace(int8 + ".part", int8)
+
+    return int8 if quantized else fp32
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+#  ONNX RUNTIME ENCODER
+# ═══════════════════════════════════════════════════════════════════════════════
+
+class OnnxEncoder:
+    """
+    SentenceTransformer-compatible .encode() on ONNX Runtime.
+
+    Reproduces the all-MiniLM-L6-v2 pipeline: WordPiece tokenisation
+    truncated at max_seq_length, transformer, attention-masked mean pooling,
+    L2 normalisation. Texts are sorted by length so each batch pads little.
+
+    Args:
+        model_path:     .onnx file (tokenizer.json must sit next to it)
+        max_seq_length: Truncation length in word pieces
+        threads:        intra-op threads (0 = onnxruntime default)
+    """
+
+    def __init__(self, model_path: str, max_seq_length: int = MAX_SEQ_LENGTH, threads: int = ONNX_THREADS):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        self.model_path = model_path
+        self.tokenizer  = Tokenizer.from_file(os.path.join(os.path.dirname(model_path), "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=max_seq_length)
+        pad_id = self.tokenizer.token_to_id("[PAD]") or 0
+        self.tokenizer.enable_padding(pad_id=pad_id, pad_token="[PAD]")
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self._inputs = {i.name for i in self.session.get_inputs()}
+        outputs      = [o.name for o in self.session.get_outputs()]
+        self._output = "last_hidden_state" if "last_hidden_state" in outputs else outputs[0]
+
+    def _encode_batch(self, texts: list[str]) -> np.ndarray:
+        enc  = self.tokenizer.encode_batch(texts)
+        mask = np.asarray([e.attention_mask for e in enc], dtype=np.int64)
+        feeds = {"input_ids": np.asarray([e.ids for e in enc], dtype=np.int64), "attention_mask": mask}
+        if "token_type_ids" in self._inputs:
+            feeds["token_type_ids"] = np.asarray([e.type_ids for e in enc], dtype=np.int64)
+        hidden = self.session.run([self._output], feeds)[0]
+
+        weights = mask[..., None].astype(np.float32)
+        pooled  = (hidden * weights).sum(axis=1) / np.clip(weights.sum(axis=1), 1e-9, None)
+        return pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+
+    def encode(self, sentences, batch_size: int = 32, **kwargs):
+        """Encode a string or list of strings. Extra SentenceTransformer kwargs are accepted and ignored."""
+        single = isinstance(sentences, str)
+        texts  = [sentences] if single else list(sentences)
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+
+        order = sorted(range(len(texts)), key=lambda i: -len(texts[i]))
+        out = None
+        for start in range(0, len(order), batch_size):
+            idx = order[start:start + batch_size]
+            vecs = self._encode_batch([texts[i] for i in idx])
+            if out is None:
+                out = np.empty((len(texts), vecs.shape[1]), dtype=np.float32)
+            out[idx] = vecs
+        return out[0] if single else out
+
+
+def load_model(model_name: str, backend: str = None):
+    """
+    Load model_name on the given backend (default EMBED_BACKEND).
+
+    Returns an object with a SentenceTransformer-compatible .encode().
+    """
+    backend = backend or EMBED_BACKEND
+    if backend == "torch":
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(model_name)
+    if backend in ("onnx", "onnx-int8"):
+        return OnnxEncoder(prepare_onnx(model_name, quantized=backend == "onnx-int8"))
+    raise ValueError(f"unknown embedding backend {backend!r} (choose from {', '.join(BACKENDS)})")
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+#  PARITY CHECK
+# ═══════════════════════════════════════════════════════════════════════════════
+
+_SAMPLE_TEXTS = [
+    "How to set up Docker on a Proxmox LXC container",
+    "Kubernetes deployment with a persistent volume claim",
+    "Weekly review: goals, habits and open loops",
+    "Qdrant collection with cosine distance and payload indexes",
+    "Git pre-commit hook that syncs staged markdown files",
+    "Obsidian QuickAdd macro calling a local REST server",
+    "Backup strategy for the second brain vault",
+    "Sentence embeddings for semantic search over notes",
+]
+
+
+def _sample_texts(repo: str, limit: int) -> list[str]:
+    """Chunk texts from up to `limit` notes in repo — the same text ingest embeds."""
+    from md_chunker import chunk_markdown
+    from ingest_engine import iter_markdown_files
+
+    texts = []
+    for path in iter_markdown_files(repo):
+        try:
+            with open(path, encoding="utf-8", errors="ignore") as f:
+                chunks = chunk_markdown(f.read(), title=os.path.basename(path))
+        except OSError:
+            continue
+        texts.extend(c["embed_text"] for c in chunks[:2])
+        if len(texts) >= limit:
+            break
+    return texts[:limit]
+
+
+def parity(model_name: str, backend: str, texts: list[str], batch_size: int = 32) -> dict:
+    """
+    Compare `backend` against the torch reference on the same texts.
+
+    Returns:
+        Dict with cosine agreement (mean / min / p1 / share ≥ 0.99),
+        nearest-neighbour agreement within the sample, and texts/s for both
+    """
+    timings, vectors = {}, {}
+    for name in ("torch", backend):
+        model = load_model(model_name, name)
+        model.encode(texts[:batch_size], batch_size=batch_size)   # warm-up
+        started = time.perf_counter()
+        vectors[name] = np.asarray(model.encode(texts, batch_size=batch_size), dtype=np.float32)
+        timings[name] = len(texts) / max(time.perf_counter() - started, 1e-9)
+
+    ref, alt = vectors["torch"], vectors[backend]
+    cos = (ref * alt).sum(axis=1) / (np.linalg.norm(ref, axis=1) * np.linalg.norm(alt, axis=1))
+
+    # Does each text have the same nearest neighbour under both backends?
+    nn = {}
+    for name, v in vectors.items():
+        sims = v @ v.T
+        np.fill_diagonal(sims, -np.inf)
+        nn[name] = sims.argmax(axis=1)
+
+    return {
+        "backend":        backend,
+        "texts":          len(texts),
+        "cosine_mean":    round(float(cos.mean()), 5),
+        "cosine_min":     round(float(cos.min()), 5),
+        "cosine_p1":      round(float(np.percentile(cos, 1)), 5),
+        "share_ge_0.99":  round(float((cos >= 0.99).mean()), 4),
+        "nn_agreement":   round(float((nn["torch"] == nn[backend]).mean()), 4) if len(texts) > 2 else None,
+        "torch_texts_per_sec":   round(timings["torch"], 1),
+        "backend_texts_per_sec": round(timings[backend], 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prepare or check the ONNX embedding backends")
+    parser.add_argument("command", choices=["prepare", "parity"])
+    parser.add_argument("--backend", choices=BACKENDS[1:], default="onnx-int8", help="Backend (default: onnx-int8)")
+    parser.add_argument("--model", default=MODEL_NAME, help=f"Model (default: {MODEL_NAME})")
+    parser.add_argument("--repo", help="Take parity sample texts from the notes in this repo")
+    parser.add_argument("--samples", type=int, default=256, help="Parity sample size (default: 256)")
+    args = parser.parse_args()
+
+    if args.command == "prepare":
+        path = prepare_onnx(args.model, quantized=args.backend == "onnx-int8")
+        print(f"  ✓ {args.backend} model ready: {path}")
+        return
+
+    texts = _sample_texts(args.repo, args.samples) if args.repo else _SAMPLE_TEXTS
+    report = parity(args.model, args.backend, texts)
+    print(f"\n  Parity: {args.backend} vs torch on {report['texts']} texts")
+    print(f"    cosine mean / min / p1:  {report['cosine_mean']} / {report['cosine_min']} / {report['cosine_p1']}")
+    print(f"    share with cosine ≥ 0.99: {report['share_ge_0.99'] * 100:.1f}%")
+    if report["nn_agreement"] is not None:
+        print(f"    nearest-neighbour agreement: {report['nn_agreement'] * 100:.1f}%")
+    print(f"    speed: torch {report['torch_texts_per_sec']} texts/s, "
+          f"{args.backend} {report['backend_texts_per_sec']} texts/s")
+
+
+if __name__ == "__main__":
+    main()
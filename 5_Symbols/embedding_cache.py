@@ -0,0 +1,480 @@
+#!/usr/bin/env python3
+"""
+Persistent on-disk embedding cache shared by every ingest / sync entry point.
+
+Vectors are keyed on (model name, hash of normalised text), so re-ingesting
+unchanged notes, rebuilding a collection, or embedding duplicate notes never
+runs the model twice for the same text. When every text in a run is a cache
+hit, the SentenceTransformer model is never even loaded.
+
+Layout (one directory per model under CACHE_DIR):
+    vectors.f32   append-only float32 rows, read through a memory map
+    index.npy     compact index: 16-byte key → row slot + last-used time
+    meta.json     model name, dimension and compaction epoch
+    .lock         advisory lock for appends / index writes (POSIX only)
+
+Size-bounded: when the index exceeds the configured size, the least
+recently used entries are dropped and the vector file is compacted.
+
+A second, much smaller cache (QueryVectorCache) serves the search side:
+an in-memory LRU from normalised query text to vector, with hit/miss
+counters and optional persistence across restarts.
+
+Usage (as a module):
+    from embedding_cache import load_encoder
+    model   = load_encoder("all-MiniLM-L6-v2")
+    vectors = model.encode(texts, batch_size=64)   # same call as SentenceTransformer
+
+    from embedding_cache import load_query_cache
+    queries = load_query_cache("all-MiniLM-L6-v2")
+    vector  = queries.get_or_encode("docker setup", model.encode)
+"""
+
+import os
+import json
+import time
+import atexit
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows — single-user daily script, no cross-process lock
+    fcntl = None
+
+# ── Configuration ──────────────────────────────────────────────────────────────
+CACHE_DIR        = os.environ.get(
+    "QDRANT_EMBED_CACHE",
+    os.path.join(os.path.expanduser("~"), ".cache", "qdrant_secondbrain", "embeddings"),
+)
+MAX_CACHE_MB     = int(os.environ.get("QDRANT_EMBED_CACHE_MB", "512"))
+KEEP_RATIO       = 0.9   # fraction of max entries kept after an LRU eviction
+QUERY_CACHE_SIZE = int(os.environ.get("QDRANT_QUERY_CACHE_SIZE", "4096"))
+# ───────────────────────────────────────────────────────────────────────────────
+
+_INDEX_DTYPE = np.dtype([("key", "S16"), ("slot", "<u4"), ("used", "<f8")])
+
+
+def normalize_text(text: str) -> str:
+    """Canonical form for cache keys: NFC, unix newlines, no trailing spaces."""
+    text = unicodedata.normalize("NFC", text).replace("\r\n", "\n").replace("\r", "\n")
+    return "\n".join(line.rstrip() for line in text.split("\n")).strip()
+
+
+def text_key(model_name: str, text: str) -> bytes:
+    """16-byte cache key for (model, normalised text)."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(model_name.encode())
+    h.update(b"\0")
+    h.update(normalize_text(text).encode("utf-8", errors="ignore"))
+    return h.digest()
+
+
+class EmbeddingCache:
+    """
+    Append-only memory-mapped vector store with a compact LRU index.
+
+    Args:
+        model_name: Model the vectors belong to (part of every key)
+        dim:        Vector dimension
+        cache_dir:  Root cache directory (a sub-directory per model is used)
+        max_mb:     Size bound for the vector file in megabytes
+    """
+
+    def __init__(self, model_name: str, dim: int = 384,
+                 cache_dir: str = CACHE_DIR, max_mb: int = MAX_CACHE_MB):
+        self.model_name  = model_name
+        self.dim         = dim
+        self.row_bytes   = dim * 4
+        self.max_entries = max(1, max_mb * 2**20 // self.row_bytes)
+        self.dir         = os.path.join(cache_dir, model_name.replace("/", "__"))
+        self.vec_path    = os.path.join(self.dir, "vectors.f32")
+        self.idx_path    = os.path.join(self.dir, "index.npy")
+        self.meta_path   = os.path.join(self.dir, "meta.json")
+        self.lock_path   = os.path.join(self.dir, ".lock")
+        self.hits        = 0
+        self.misses      = 0
+
+        os.makedirs(self.dir, exist_ok=True)
+        self._index: dict[bytes, list] = {}   # key → [slot, last_used]
+        self._dirty: set[bytes] = set()
+        self._mmap  = None
+        self._rows  = 0
+        self._epoch = 0
+        with self._locked():
+            self._load()
+
+    # ── Persistence ────────────────────────────────────────────────────────
+    @contextmanager
+    def _locked(self):
+        with open(self.lock_path, "a") as lf:
+            if fcntl is not None:
+                fcntl.flock(lf, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lf, fcntl.LOCK_UN)
+
+    def _read_epoch(self) -> int:
+        try:
+            with open(self.meta_path) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return 0
+        if meta.get("dim") != self.dim or meta.get("model") != self.model_name:
+            return -1   # incompatible cache on disk — start over
+        return meta.get("epoch", 0)
+
+    def _write_meta(self):
+        tmp = self.meta_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"model": self.model_name, "dim": self.dim, "epoch": self._epoch}, f)
+        os.replace(tmp, self.meta_path)
+
+    def _load(self):
+        """(Re)load index and memory map from disk. Caller holds the lock."""
+        epoch = self._read_epoch()
+        if epoch < 0:
+            for p in (self.vec_path, self.idx_path):
+                if os.path.exists(p):
+                    os.remove(p)
+            epoch = 0
+        self._epoch = epoch
+        if not os.path.exists(self.meta_path) or self._read_epoch() < 0:
+            self._write_meta()
+
+        self._index = {}
+        if os.path.exists(self.idx_path):
+            try:
+                arr = np.load(self.idx_path)
+                self._index = {bytes(r["key"]): [int(r["slot"]), float(r["used"])] for r in arr}
+            except (OSError, ValueError):
+                self._index = {}
+        self._dirty = set()
+        self._remap()
+
+    def _remap(self):
+        size = os.path.getsize(self.vec_path) if os.path.exists(self.vec_path) else 0
+        self._rows = size // self.row_bytes
+        self._mmap = (np.memmap(self.vec_path, dtype="<f4", mode="r", shape=(self._rows, self.dim))
+                      if self._rows else None)
+
+    def _write_index(self, index: dict):
+        arr = np.empty(len(index), dtype=_INDEX_DTYPE)
+        for i, (key, (slot, used)) in enumerate(index.items()):
+            arr[i] = (key, slot, used)
+        tmp = self.idx_path + ".tmp.npy"
+        np.save(tmp, arr)
+        os.replace(tmp, self.idx_path)
+
+    # ── Lookup / insert ────────────────────────────────────────────────────
+    def get_many(self, keys: list[bytes]) -> dict[bytes, np.ndarray]:
+        """Return {key: vector} for every key present in the cache."""
+        now = time.time()
+        found = {}
+        for key in keys:
+            entry = self._index.get(key)
+            if entry is None or entry[0] >= self._rows:
+                continue
+            found[key] = np.array(self._mmap[entry[0]])
+            entry[1] = now
+            self._dirty.add(key)
+        self.hits   += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, keys: list[bytes], vectors: np.ndarray):
+        """Append vectors for new keys to the vector file."""
+        fresh = [(k, v) for k, v in zip(keys, vectors) if k not in self._index]
+        if not fresh:
+            return
+        block = np.ascontiguousarray(np.stack([v for _, v in fresh]), dtype="<f4")
+        now = time.time()
+        with self._locked():
+            if self._read_epoch() != self._epoch:
+                self._load()   # another process compacted — slots changed
+            with open(self.vec_path, "ab") as f:
+                first = f.seek(0, os.SEEK_END) // self.row_bytes
+                f.write(block.tobytes())
+            for i, (key, _) in enumerate(fresh):
+                self._index[key] = [first + i, now]
+                self._dirty.add(key)
+            self._remap()
+
+    def flush(self):
+        """Merge this process's index changes into the on-disk index, evicting if over size."""
+        if not self._dirty:
+            return
+        with self._locked():
+            if self._read_epoch() != self._epoch:
+                # Compacted underneath us: our slots are meaningless now.
+                self._load()
+                return
+            disk = {}
+            if os.path.exists(self.idx_path):
+                try:
+                    arr = np.load(self.idx_path)
+                    disk = {bytes(r["key"]): [int(r["slot"]), float(r["used"])] for r in arr}
+                except (OSError, ValueError):
+                    disk = {}
+            for key in self._dirty:
+                mine = self._index.get(key)
+                if mine is None:
+                    continue
+                theirs = disk.get(key)
+                if theirs is None or theirs[1] < mine[1]:
+                    disk[key] = mine
+            self._index = disk
+            self._dirty = set()
+            self._remap()   # pick up rows other processes appended
+
+            if len(disk) > self.max_entries:
+                self._compact()
+            else:
+                self._write_index(disk)
+
+    def _compact(self):
+        """Keep the most recently used entries and rewrite the vector file. Caller holds the lock."""
+        keep = sorted(self._index.items(), key=lambda kv: kv[1][1], reverse=True)
+        keep = keep[:int(self.max_entries * KEEP_RATIO)]
+        tmp = self.vec_path + ".tmp"
+        new_index = {}
+        with open(tmp, "wb") as f:
+            for slot, (key, (old_slot, used)) in enumerate(keep):
+                f.write(np.asarray(self._mmap[old_slot], dtype="<f4").tobytes())
+                new_index[key] = [slot, used]
+        os.replace(tmp, self.vec_path)
+        self._epoch += 1
+        self._write_index(new_index)
+        self._write_meta()
+        self._index = new_index
+        self._remap()
+
+    def stats(self) -> dict:
+        return {
+            "model":   self.model_name,
+            "entries": len(self._index),
+            "hits":    self.hits,
+            "misses":  self.misses,
+            "path":    self.dir,
+        }
+
+
+class CachedEncoder:
+    """
+    Drop-in stand-in for SentenceTransformer.encode() backed by EmbeddingCache.
+
+    The real model is created through `loader` only on the first cache miss.
+
+    Args:
+        model_name: Name used in cache keys (and passed to the default loader)
+        loader:     Zero-argument callable returning an object with .encode()
+        cache:      EmbeddingCache to use (created for model_name by default)
+    """
+
+    def __init__(self, model_name: str, loader=None, cache: EmbeddingCache = None, dim: int = 384):
+        self.model_name = model_name
+        self.cache      = cache or EmbeddingCache(model_name, dim=dim)
+        self._loader    = loader or (lambda: _load_sentence_transformer(model_name))
+        self._model     = None
+
+    @property
+    def model(self):
+        if self._model is None:
+            self._model = self._loader()
+        return self._model
+
+    def encode(self, texts, batch_size: int = 32, **kwargs):
+        """Encode a string or list of strings, running the model only on cache misses."""
+        single = isinstance(texts, str)
+        if single:
+            texts = [texts]
+        if not texts:
+            return np.zeros((0, self.cache.dim), np.float32)
+
+        keys  = [text_key(self.model_name, t) for t in texts]
+        found = self.cache.get_many(keys)
+
+        missing = {}
+        for i, key in enumerate(keys):
+            if key not in found and key not in missing:
+                missing[key] = i
+        if missing:
+            kwargs.pop("convert_to_numpy", None)
+            kwargs.setdefault("show_progress_bar", False)
+            fresh = self.model.encode(
+                [texts[i] for i in missing.values()],
+                batch_size=batch_size,
+                convert_to_numpy=True,
+                **kwargs,
+            )
+            fresh = np.asarray(fresh, dtype=np.float32)
+            self.cache.put_many(list(missing), fresh)
+            found.update(zip(missing, fresh))
+
+        out = np.stack([found[k] for k in keys]).astype(np.float32, copy=False)
+        return out[0] if single else out
+
+    def flush(self):
+        self.cache.flush()
+
+
+def _load_sentence_transformer(model_name: str, backend: str = None):
+    """
+    The model on the configured embedding backend (torch, onnx, onnx-int8) —
+    served by the resident embedding daemon when one is running.
+    """
+    from embed_daemon import load_model_or_daemon
+    return load_model_or_daemon(model_name, backend)
+
+
+def load_encoder(model_name: str, dim: int = 384, loader=None, backend: str = None) -> CachedEncoder:
+    """
+    Return a CachedEncoder for model_name whose index is flushed at exit.
+
+    Vectors are cached under model_tag(model_name, backend), so int8 and
+    fp32 vectors never mix. Falls back to the plain in-process model if the
+    cache directory can't be created (read-only home, etc.).
+    """
+    from embedding_backend import model_tag
+    loader = loader or (lambda: _load_sentence_transformer(model_name, backend))
+    try:
+        encoder = CachedEncoder(model_tag(model_name, backend), loader=loader, dim=dim)
+    except OSError as e:
+        print(f"  ⚠️  Embedding cache unavailable ({e}) — encoding without cache")
+        return loader()
+    atexit.register(encoder.flush)
+    return encoder
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+#  QUERY VECTOR CACHE — for the search server and agent library
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def normalize_query(query: str) -> str:
+    """Canonical query form: collapsed whitespace, case-folded (MiniLM-L6 is uncased)."""
+    return " ".join(query.split()).casefold()
+
+
+class QueryVectorCache:
+    """
+    Bounded in-memory LRU from normalised query text to its vector.
+
+    Repeated searches (plugin keystrokes, agents re-asking) skip the
+    CPU-bound encode entirely. Optionally persisted to an .npz file so a
+    restarted server — or the next CLI invocation — starts warm.
+
+    Args:
+        model_name:   Model the vectors belong to (stored with the snapshot)
+        max_entries:  LRU capacity
+        persist_path: .npz file to load on start and save on flush (None = memory only)
+    """
+
+    def __init__(self, model_name: str, max_entries: int = QUERY_CACHE_SIZE,
+                 persist_path: str = None):
+        self.model_name   = model_name
+        self.max_entries  = max_entries
+        self.persist_path = persist_path
+        self.hits         = 0
+        self.misses       = 0
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock        = threading.Lock()
+        self._dirty       = False
+        if persist_path:
+            self._load()
+
+    def _load(self):
+        try:
+            with np.load(self.persist_path, allow_pickle=False) as data:
+                if str(data["model"]) != self.model_name:
+                    return
+                for q, v in zip(data["queries"], data["vectors"]):
+                    self._entries[str(q)] = v.astype(np.float32)
+        except (OSError, KeyError, ValueError):
+            return
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, query: str):
+        """Cached vector for query, or None (counts a hit or a miss)."""
+        key = normalize_query(query)
+        with self._lock:
+            vec = self._entries.get(key)
+            if vec is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+            return vec
+
+    def put(self, query: str, vector) -> np.ndarray:
+        """Store the vector for query, evicting the least recently used entry if full."""
+        key = normalize_query(query)
+        vec = np.asarray(vector, dtype=np.float32)
+        with self._lock:
+            self._entries[key] = vec
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._dirty = True
+        return vec
+
+    def get_or_encode(self, query: str, encode):
+        """
+        Return the cached vector for query, calling encode(query) on a miss.
+
+        Args:
+            query:  Raw query text
+            encode: Callable str → vector, used only on a miss
+        """
+        vec = self.get(query)
+        if vec is None:
+            vec = self.put(query, encode(query))
+        return vec
+
+    def flush(self):
+        """Write the cache to persist_path (atomic replace) if it changed."""
+        if not self.persist_path or not self._dirty:
+            return
+        with self._lock:
+            queries = list(self._entries)
+            vectors = (np.stack(list(self._entries.values())) if queries
+                       else np.empty((0, 0), dtype=np.float32))
+            self._dirty = False
+        os.makedirs(os.path.dirname(self.persist_path) or ".", exist_ok=True)
+        tmp = self.persist_path + ".tmp.npz"
+        np.savez(tmp, model=np.array(self.model_name), queries=np.array(queries, dtype=str), vectors=vectors)
+        os.replace(tmp, self.persist_path)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries":  len(self._entries),
+            "capacity": self.max_entries,
+            "hits":     self.hits,
+            "misses":   self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }
+
+
+def query_cache_path(model_name: str) -> str:
+    """Default on-disk location of the persisted query-vector cache for a model."""
+    return os.path.join(os.path.dirname(CACHE_DIR), f"queries_{model_name.replace('/', '__')}.npz")
+
+
+def load_query_cache(model_name: str, persist: bool = True,
+                     max_entries: int = QUERY_CACHE_SIZE) -> QueryVectorCache:
+    """Return a QueryVectorCache for model_name (on the configured backend), persisted at exit when `persist` is set."""
+    from embedding_backend import model_tag
+    model_name = model_tag(model_name)
+    cache = QueryVectorCache(model_name, max_entries=max_entries,
+                             persist_path=query_cache_path(model_name) if persist else None)
+    if persist:
+        atexit.register(cache.flush)
+    return cache
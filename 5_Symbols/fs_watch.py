@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+File-system watchers for the second brain repo, with a common poll() API.
+
+Backends, picked by open_watcher(backend="auto") in this order:
+    inotify   Linux kernel notifications through ctypes — no dependency,
+              the process sleeps in select() until something changes
+    watchdog  FSEvents (macOS) / ReadDirectoryChangesW (Windows) when the
+              optional `watchdog` package is installed
+    poll      rescans the repo (repo_scanner) every POLL_SECS and diffs
+              mtime / size — works everywhere, costs one scan per interval
+
+Every backend reports *candidate* paths: .md files that may have been
+created, modified, moved or deleted, plus directories that appeared or
+vanished (the caller expands those). Callers re-check each path on disk
+before acting on it, so a spurious report only costs a stat.
+
+Usage (as a module):
+    from fs_watch import open_watcher, Debouncer
+    watcher = open_watcher(REPO_PATH, exclude=["Archive/*"])
+    pending = Debouncer(quiet=2.0)
+    while True:
+        paths, rescan = watcher.poll(timeout=pending.wait(time.monotonic()))
+        pending.touch(paths, time.monotonic())
+        ready = pending.settled(time.monotonic())
+"""
+
+import os
+import sys
+import time
+import struct
+import select
+import threading
+
+from repo_scanner import PathFilter, scan_markdown
+
+# ── Configuration ──────────────────────────────────────────────────────────────
+POLL_SECS       = float(os.environ.get("QDRANT_WATCH_POLL_SECS", "10"))   # polling backend rescan interval
+BACKENDS        = ("auto", "inotify", "watchdog", "poll")
+# ───────────────────────────────────────────────────────────────────────────────
+
+# inotify(7) constants
+IN_MODIFY       = 0x00000002
+IN_CLOSE_WRITE  = 0x00000008
+IN_MOVED_FROM   = 0x00000040
+IN_MOVED_TO     = 0x00000080
+IN_CREATE       = 0x00000100
+IN_DELETE       = 0x00000200
+IN_DELETE_SELF  = 0x00000400
+IN_MOVE_SELF    = 0x00000800
+IN_Q_OVERFLOW   = 0x00004000
+IN_IGNORED      = 0x00008000
+IN_ISDIR        = 0x40000000
+_WATCH_MASK     = (IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO |
+                   IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF)
+_EVENT          = struct.Struct("iIII")   # wd, mask, cookie, len — then the name
+
+
+class PollingWatcher:
+    """Rescan every `interval` seconds and report what changed since the last scan."""
+
+    name = "poll"
+
+    def __init__(self, root: str, exclude=None, interval: float = POLL_SECS):
+        self.root      = root
+        self.exclude   = exclude
+        self.interval  = interval
+        self.snapshot  = scan_markdown(root, exclude)
+        self.next_scan = time.monotonic() + interval
+
+    def poll(self, timeout: float):
+        wait = self.next_scan - time.monotonic()
+        if wait > 0:
+            time.sleep(min(timeout, wait))
+            if time.monotonic() < self.next_scan:
+                return set(), False
+        current = scan_markdown(self.root, self.exclude)
+        changed = {p for p, sig in current.items() if self.snapshot.get(p) != sig}
+        changed |= self.snapshot.keys() - current.keys()
+        self.snapshot  = current
+        self.next_scan = time.monotonic() + self.interval
+        return changed, False
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    """
+    One inotify watch per included directory; new directories are watched
+    as they appear. Raises OSError if inotify is unavailable or the watch
+    limit (fs.inotify.max_user_watches) is too low for the repo.
+    """
+
+    name = "inotify"
+
+    def __init__(self, root: str, exclude=None):
+        import ctypes
+        import ctypes.util
+
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        if not hasattr(self.libc, "inotify_init1"):
+            raise OSError("inotify not available")
+        self.fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.ctypes  = ctypes
+        self.root    = os.path.abspath(root)
+        self.filter  = PathFilter(self.root, exclude)
+        self.dirs    = {}   # wd → directory path
+        try:
+            self._watch_tree(self.root)
+        except OSError:
+            os.close(self.fd)
+            raise
+
+    def _watch_tree(self, top: str) -> list[str]:
+        """Watch top and every included directory below it; return the .md files found."""
+        found = []
+        for dirpath, dirnames, filenames in os.walk(top):
+            dirnames[:] = [d for d in dirnames if self.filter.included(os.path.join(dirpath, d), is_dir=True)]
+            wd = self.libc.inotify_add_watch(self.fd, os.fsencode(dirpath), _WATCH_MASK)
+            if wd < 0:
+                err = self.ctypes.get_errno()
+                if dirpath == top or err == 28:   # ENOSPC — out of watches
+                    raise OSError(err, f"inotify_add_watch failed for {dirpath}: {os.strerror(err)}")
+                continue   # vanished meanwhile
+            self.dirs[wd] = dirpath
+            found.extend(os.path.join(dirpath, f) for f in filenames
+                         if self.filter.included(os.path.join(dirpath, f)))
+        return found
+
+    def _unwatch_tree(self, top: str):
+        """
+        Drop the watches on top and every directory below it. A moved
+        directory keeps its watches (they follow the inode) but its old
+        paths in self.dirs would go stale; the destination, if it is
+        inside the tree, is watched again under its new path.
+        """
+        prefix = top + os.sep
+        for wd, path in list(self.dirs.items()):
+            if path == top or path.startswith(prefix):
+                self.libc.inotify_rm_watch(self.fd, wd)
+                del self.dirs[wd]
+
+    def poll(self, timeout: float):
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set(), False
+        changed, rescan = set(), False
+        while True:
+            try:
+                buf = os.read(self.fd, 1 << 16)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(buf):
+                wd, mask, _, length = _EVENT.unpack_from(buf, offset)
+                name = buf[offset + _EVENT.size: offset + _EVENT.size + length].rstrip(b"\0")
+                offset += _EVENT.size + length
+                if mask & IN_Q_OVERFLOW:
+                    rescan = True
+                    continue
+                if mask & IN_IGNORED:
+                    self.dirs.pop(wd, None)
+                    continue
+                parent = self.dirs.get(wd)
+                if parent is None or not name:
+                    continue
+                path = os.path.join(parent, os.fsdecode(name))
+                if mask & IN_ISDIR:
+                    if mask & (IN_CREATE | IN_MOVED_TO) and self.filter.included(path, is_dir=True):
+                        changed.add(path)
+                        try:
+                            changed.update(self._watch_tree(path))
+                        except OSError:
+                            rescan = True   # out of watches — let the caller reconcile
+                    if mask & (IN_DELETE | IN_MOVED_FROM):
+                        changed.add(path)   # caller expands to the files it knew there
+                    if mask & IN_MOVED_FROM:
+                        self._unwatch_tree(path)
+                elif self.filter.included(path):
+                    changed.add(path)
+        return changed, rescan
+
+    def close(self):
+        os.close(self.fd)
+
+
+class WatchdogWatcher:
+    """Native notifications through the optional `watchdog` package (FSEvents on macOS)."""
+
+    name = "watchdog"
+
+    def __init__(self, root: str, exclude=None):
+        from watchdog.observers import Observer
+        from watchdog.events import FileSystemEventHandler
+
+        self.filter  = PathFilter(root, exclude)
+        self.changed = set()
+        self.lock    = threading.Lock()
+        self.event   = threading.Event()
+        watcher      = self
+
+        class Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                paths = [event.src_path, getattr(event, "dest_path", "") or ""]
+                with watcher.lock:
+                    for path in filter(None, paths):
+                        path = os.fsdecode(path)
+                        if watcher.filter.included(path, is_dir=event.is_directory):
+                            watcher.changed.add(path)
+                watcher.event.set()
+
+        self.observer = Observer()
+        self.observer.schedule(Handler(), root, recursive=True)
+        self.observer.start()
+
+    def poll(self, timeout: float):
+        self.event.wait(timeout)
+        with self.lock:
+            changed, self.changed = self.changed, set()
+            self.event.clear()
+        return changed, False
+
+    def close(self):
+        self.observer.stop()
+        self.observer.join()
+
+
+class Debouncer:
+    """
+    Coalesce bursts of saves: a path is released once it has been quiet
+    for `quiet` seconds, and every new report of it restarts its timer.
+    """
+
+    def __init__(self, quiet: float):
+        self.quiet = quiet
+        self.dirty = {}   # path → monotonic time of its last report
+
+    def __len__(self) -> int:
+        return len(self.dirty)
+
+    def touch(self, paths, now: float):
+        for path in paths:
+            self.dirty[path] = now
+
+    def wait(self, now: float, idle: float = 60.0) -> float:
+        """Seconds until the next path settles (idle if nothing is pending)."""
+        return min((t + self.quiet - now for t in self.dirty.values()), default=idle)
+
+    def settled(self, now: float) -> list[str]:
+        """Remove and return the paths that have been quiet long enough."""
+        ready = [p for p, t in self.dirty.items() if now - t >= self.quiet]
+        for path in ready:
+            del self.dirty[path]
+        return ready
+
+
+def open_watcher(root: str, exclude=None, backend: str = "auto", interval: float = POLL_SECS):
+    """
+    Start the best available watcher for root.
+
+    Args:
+        root:     Repo to watch
+        exclude:  Extra exclude globs (repo_scanner rules and .gitignore always apply)
+        backend:  "auto", "inotify", "watchdog" or "poll"
+        interval: Rescan interval of the polling backend, in seconds
+    """
+    if backend in ("auto", "inotify"):
+        try:
+            return InotifyWatcher(root, exclude)
+        except (OSError, AttributeError) as e:
+            if backend == "inotify":
+                raise
+            if sys.platform.startswith("linux"):
+                print(f"  ⚠️  inotify unavailable ({e}) — falling back")
+    if backend in ("auto", "watchdog"):
+        try:
+            return WatchdogWatcher(root, exclude)
+        except ImportError:
+            if backend == "watchdog":
+                raise
+    return PollingWatcher(root, exclude, interval)
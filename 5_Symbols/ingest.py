@@ -1,63 +1,62 @@
-import os
-import hashlib
-from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams, PointStruct
-from sentence_transformers import SentenceTransformer
+import argparse
+
+from qdrant_connection import connect, QDRANT_HOST
+from embedding_cache import load_encoder
+from embedding_backend import BACKENDS
+from ingest_engine import IngestEngine, iter_markdown_files, ENCODE_BATCH, UPSERT_BATCH
+from collection_profiles import prepare_collection, bulk_load
+from result_cache import bump_generation
+from outbox import Outbox, replay_outbox
 
 # --- CONFIG ---
-LXC_IP     = "192.168.2.227"
+LXC_IP     = QDRANT_HOST   # env QDRANT_HOST / config file, see qdrant_connection.py
 REPO_PATH  = "/Users/rifaterdemsahin/projects/secondbrain/"
 COLLECTION = "mac_repo_index"
 
+parser = argparse.ArgumentParser(description="Full ingest of the second brain into Qdrant")
+parser.add_argument("--repo", default=REPO_PATH, help=f"Path to second brain repo (default: {REPO_PATH})")
+parser.add_argument("--collection", default=COLLECTION, help=f"Qdrant collection (default: {COLLECTION})")
+parser.add_argument("--encode-batch", type=int, default=ENCODE_BATCH, help=f"Texts per forward pass (default: {ENCODE_BATCH})")
+parser.add_argument("--upsert-batch", type=int, default=UPSERT_BATCH, help=f"Points per upsert (default: {UPSERT_BATCH})")
+parser.add_argument("--skip-unchanged", action="store_true", help="Skip files whose content_hash already matches Qdrant")
+parser.add_argument("--exclude", action="append", default=[], metavar="GLOB", help="Extra path glob to skip (repeatable)")
+parser.add_argument("--bulk-load", action="store_true",
+                    help="Suspend HNSW indexing during the upload, build the index once at the end (always on for a new collection)")
+parser.add_argument("--profile", metavar="NAME|FILE", help="Create / update the collection with this storage profile (see collection_profiles.py)")
+parser.add_argument("--backend", choices=BACKENDS, help="Embedding backend (default: QDRANT_EMBED_BACKEND or torch)")
+args = parser.parse_args()
+
 # 1. Connect to Qdrant on Proxmox
-client = QdrantClient(host=LXC_IP, port=6333)
-model  = SentenceTransformer('all-MiniLM-L6-v2')
-
-# 2. Create collection if missing (384-dim, cosine similarity)
-if not client.collection_exists(COLLECTION):
-    client.create_collection(
-        collection_name=COLLECTION,
-        vectors_config=VectorParams(size=384, distance=Distance.COSINE),
-    )
-    print(f"Created collection: {COLLECTION}")
+client = connect("bulk", host=LXC_IP)
+model  = load_encoder('all-MiniLM-L6-v2', backend=args.backend)  # on-disk embedding cache, model loaded on first miss
+
+# 2. Create collection if missing (384-dim, cosine similarity, path/chunk_index indexes),
+#    laid out per --profile / QDRANT_COLLECTION_PROFILE (quantization, on-disk vectors, HNSW)
+created = prepare_collection(client, args.collection, args.profile)
+if created:
+    print(f"Created collection: {args.collection}")
 else:
-    print(f"Collection exists: {COLLECTION}")
+    print(f"Collection exists: {args.collection}")
+replay_outbox(client)   # writes parked by earlier offline / failed runs go first
 
-# 3. Walk and ingest all markdown files
+# 3. Walk and ingest all markdown files — chunked, batched, pipelined
 print(f"Starting sync to Proxmox at {LXC_IP}...")
-count   = 0
-errors  = 0
-
-for root, _, files in os.walk(REPO_PATH):
-    for file in files:
-        if not file.endswith(".md"):
-            continue
-
-        full_path = os.path.join(root, file)
-        try:
-            with open(full_path, 'r', encoding='utf-8') as f:
-                text = f.read()
-
-            # Stable ID from file path so re-runs upsert correctly
-            file_id = int(hashlib.md5(full_path.encode()).hexdigest(), 16) % (10**12)
-
-            # Encode locally on Mac (no API key needed)
-            vector = model.encode(text[:8000]).tolist()
-
-            client.upsert(
-                collection_name=COLLECTION,
-                points=[PointStruct(
-                    id=file_id,
-                    vector=vector,
-                    payload={"filename": file, "path": full_path}
-                )]
-            )
-            count += 1
-            if count % 20 == 0:
-                print(f"Indexed {count} files...")
-
-        except Exception as e:
-            errors += 1
-            print(f"Error with {file}: {e}")
-
-print(f"Done! Indexed: {count} | Errors: {errors}")
+print(f"Batches: encode={args.encode_batch} upsert={args.upsert_batch}")
+
+engine = IngestEngine(
+    client, model, args.collection,
+    encode_batch=args.encode_batch,
+    upsert_batch=args.upsert_batch,
+    skip_unchanged=args.skip_unchanged,
+    prune_stale=not created,   # an empty collection has no leftover chunks
+    outbox=Outbox(),           # failed upserts are queued, not dropped
+)
+if args.bulk_load or created:
+    with bulk_load(client, args.collection):   # prints upload / index-build timings
+        stats = engine.ingest_paths(iter_markdown_files(args.repo, exclude=args.exclude))
+else:
+    stats = engine.ingest_paths(iter_markdown_files(args.repo, exclude=args.exclude))
+if stats.files:
+    bump_generation(client, args.collection)   # invalidate cached search results
+
+print(f"Done! {stats.summary()}")
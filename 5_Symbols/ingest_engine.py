@@ -0,0 +1,586 @@
+#!/usr/bin/env python3
+"""
+Pipelined ingest engine for the Qdrant second brain.
+
+Shared by the ingest and sync entry points. Instead of one forward pass and
+one blocking upsert round trip per file, work flows through three stages
+connected by bounded queues:
+
+    reader pool ──▶ encoder ──▶ uploader
+    (N threads)     (batched     (background thread,
+     read+decode)    encode)      wait=False + final barrier)
+
+  • Readers open and decode files concurrently, so disk latency overlaps
+    with encoding.
+  • The encoder pulls up to `encode_batch` files at a time, splits each
+    into heading-aware chunks (md_chunker) and runs one
+    SentenceTransformer.encode(list, batch_size=...) over all the chunks.
+    Every chunk is its own point; chunk 0 keeps the file's legacy ID.
+  • The uploader accumulates points and sends upserts with wait=False. The
+    final upsert is sent with wait=True — Qdrant applies updates in order,
+    so once it returns every earlier write is applied too. The upload
+    batch size adapts to payload bytes and observed round-trip latency.
+    With an `outbox` (see outbox.py), a failed upsert is queued there with
+    its vectors instead of being dropped; with client=None every batch is
+    queued (offline mode).
+
+Usage (as a module):
+    from ingest_engine import IngestEngine, iter_markdown_files
+    engine = IngestEngine(client, model, COLLECTION)
+    stats  = engine.ingest_paths(iter_markdown_files(REPO_PATH))
+    print(stats.summary())
+
+    # Already-read bytes (e.g. staged git blobs) skip the reader stage
+    engine.ingest_documents([(full_path, data, {"blob_sha": sha})])
+"""
+
+import os
+import json
+import time
+import queue
+import hashlib
+import threading
+
+from content_hash import hash_bytes
+from md_chunker import chunk_markdown, MAX_CHUNKS
+from repo_scanner import iter_scan
+
+# ── Configuration ──────────────────────────────────────────────────────────────
+ENCODE_BATCH      = 64          # texts per forward pass
+UPSERT_BATCH      = 256         # initial points per upsert request
+MIN_UPSERT_BATCH  = 32
+MAX_UPSERT_BATCH  = 2048
+MAX_UPSERT_BYTES  = 8 * 2**20   # keep well under Qdrant's 32 MB request limit
+TARGET_LATENCY    = 0.5         # seconds per upsert round trip the batcher aims for
+READER_THREADS    = 8
+QUEUE_DEPTH       = 4           # batches buffered between stages
+BATCH_LINGER      = 0.05        # seconds to wait for stragglers before encoding a partial batch
+PROGRESS_EVERY    = 1000        # print progress every N files
+# ───────────────────────────────────────────────────────────────────────────────
+
+_DONE = object()  # end-of-stream sentinel passed between stages
+
+
+def file_id(full_path: str) -> int:
+    """Deterministic ID matching ingest.py — MD5 of full path mod 10^12."""
+    return int(hashlib.md5(full_path.encode()).hexdigest(), 16) % (10**12)
+
+
+def chunk_id(full_path: str, index: int) -> int:
+    """Point ID of chunk `index` of a file. Chunk 0 reuses file_id() so path lookups keep working."""
+    return file_id(full_path) if index == 0 else file_id(f"{full_path}#{index}")
+
+
+def ensure_collection(client, collection: str, dim: int = 384, profile=None) -> bool:
+    """
+    Create the collection if missing and make sure the payload indexes used
+    by chunk grouping / path deletes exist. Returns True if it was created.
+
+    A missing collection is created with the storage profile given, or
+    QDRANT_COLLECTION_PROFILE (see collection_profiles).
+    """
+    from qdrant_client.models import PayloadSchemaType
+
+    created = False
+    if not client.collection_exists(collection):
+        from collection_profiles import create_collection
+        create_collection(client, collection, profile, dim=dim)
+        created = True
+    for field, schema in (("path", PayloadSchemaType.KEYWORD),
+                          ("chunk_index", PayloadSchemaType.INTEGER)):
+        try:
+            client.create_payload_index(collection, field_name=field, field_schema=schema)
+        except Exception:
+            pass   # already exists / not supported by local mode
+    return created
+
+
+def path_filter(paths):
+    """Filter matching every chunk of the given file paths."""
+    from qdrant_client.models import Filter, FieldCondition, MatchAny
+    return Filter(must=[FieldCondition(key="path", match=MatchAny(any=list(paths)))])
+
+
+def delete_paths(client, collection: str, paths, wait: bool = True):
+    """Delete all chunks of the given files in a single request."""
+    from qdrant_client.models import FilterSelector
+    paths = list(paths)
+    if paths:
+        client.delete(collection_name=collection,
+                      points_selector=FilterSelector(filter=path_filter(paths)),
+                      wait=wait)
+
+
+def stale_chunk_filter(files: list[tuple[str, int]]):
+    """Filter for chunks left over from a longer previous version of each file."""
+    from qdrant_client.models import Filter, FieldCondition, MatchValue, Range
+    return Filter(should=[
+        Filter(must=[
+            FieldCondition(key="path", match=MatchValue(value=path)),
+            FieldCondition(key="chunk_index", range=Range(gte=n)),
+        ])
+        for path, n in files
+    ])
+
+
+def iter_markdown_files(repo_path: str, exclude=None):
+    """Yield the full path of every .md file under repo_path (parallel scan, see repo_scanner)."""
+    for full_path, _, _ in iter_scan(repo_path, exclude=exclude):
+        yield full_path
+
+
+def _point_bytes(point) -> int:
+    """Approximate JSON request size of one point (vector floats + payload)."""
+    return 12 * len(point.vector) + len(json.dumps(point.payload, ensure_ascii=False)) + 32
+
+
+class AdaptiveBatcher:
+    """
+    Pick the next upsert batch size from observed round-trip latency.
+
+    Additive-increase / multiplicative-decrease: grow while upserts finish
+    well inside TARGET_LATENCY, halve when they overshoot it. The byte cap
+    is applied separately per batch, so large payloads shrink batches even
+    when the network is fast.
+    """
+
+    def __init__(self, initial: int = UPSERT_BATCH,
+                 minimum: int = MIN_UPSERT_BATCH,
+                 maximum: int = MAX_UPSERT_BATCH,
+                 max_bytes: int = MAX_UPSERT_BYTES,
+                 target_latency: float = TARGET_LATENCY):
+        self.size           = initial
+        self.minimum        = minimum
+        self.maximum        = maximum
+        self.max_bytes      = max_bytes
+        self.target_latency = target_latency
+
+    def observe(self, latency: float):
+        if latency > self.target_latency:
+            self.size = max(self.minimum, self.size // 2)
+        elif latency < self.target_latency / 2:
+            self.size = min(self.maximum, self.size + max(self.minimum, self.size // 4))
+
+
+class IngestStats:
+    """Counters and stage timings for one ingest run."""
+
+    def __init__(self):
+        self.started      = time.perf_counter()
+        self.run_start    = time.time()   # wall clock, compared with outbox queue times
+        self.finished     = None
+        self.files        = 0
+        self.skipped      = 0
+        self.errors       = 0
+        self.chunks       = 0
+        self.upserts      = 0
+        self.read_secs    = 0.0
+        self.encode_secs  = 0.0
+        self.upsert_secs  = 0.0
+        self.unchanged    = 0
+        self.queued       = 0   # files written to the outbox instead of Qdrant
+        self.failed_paths: list[str] = []
+        self.queued_paths: set[str]  = set()
+        self.hashes:       dict[str, str] = {}   # path → content digest of what was read
+        self.chunk_counts: dict[str, int] = {}   # path → chunks (points) embedded
+        self.feed_error   = None                 # exception raised by the path / document source
+        # Seconds per file read / encode call / upsert request (for percentiles)
+        self.latencies:    dict[str, list[float]] = {"read": [], "encode": [], "upsert": []}
+        self._lock        = threading.Lock()
+
+    def add(self, **deltas):
+        """Thread-safe increment of one or more counters."""
+        with self._lock:
+            for name, value in deltas.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    @property
+    def elapsed(self) -> float:
+        end = self.finished if self.finished is not None else time.perf_counter()
+        return end - self.started
+
+    @property
+    def files_per_sec(self) -> float:
+        return self.files / self.elapsed if self.elapsed > 0 else 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "files":         self.files,
+            "skipped":       self.skipped,
+            "errors":        self.errors,
+            "unchanged":     self.unchanged,
+            "queued":        self.queued,
+            "chunks":        self.chunks,
+            "upserts":       self.upserts,
+            "elapsed_s":     round(self.elapsed, 2),
+            "files_per_sec": round(self.files_per_sec, 1),
+            "read_s":        round(self.read_secs, 2),
+            "encode_s":      round(self.encode_secs, 2),
+            "upsert_s":      round(self.upsert_secs, 2),
+        }
+
+    def summary(self) -> str:
+        return (f"Indexed: {self.files} ({self.chunks} chunks) | Errors: {self.errors} | Skipped: {self.skipped} | "
+                f"Unchanged: {self.unchanged} | Queued: {self.queued} | "
+                f"{self.elapsed:.1f}s ({self.files_per_sec:.1f} files/s) — "
+                f"read {self.read_secs:.1f}s, encode {self.encode_secs:.1f}s, "
+                f"upsert {self.upsert_secs:.1f}s in {self.upserts} requests")
+
+
+class IngestEngine:
+    """
+    Concurrent read → batch-encode → async batch-upsert pipeline.
+
+    Args:
+        client:         QdrantClient connected to the target instance (None =
+                        offline: every batch goes to the outbox)
+        model:          Anything with SentenceTransformer's encode(list, batch_size=...)
+        collection:     Target collection name
+        encode_batch:   Files chunked per encode call (also the forward-pass batch size)
+        upsert_batch:   Initial points per upsert request (adapts during the run)
+        readers:        Threads reading and decoding files
+        max_chunks:     Cap on chunks per file
+        progress_every: Print a progress line every N files (0 disables)
+        progress:       Callable(stats) used instead of the default progress line
+        skip_unchanged: Look up each batch's stored `content_hash` payloads and
+                        skip files whose bytes match what Qdrant already has
+        prune_stale:    Delete chunks left over from longer previous versions of
+                        each file (not needed when filling an empty collection)
+        outbox:         outbox.Outbox that keeps batches whose upsert failed
+    """
+
+    def __init__(self, client, model, collection: str,
+                 encode_batch: int = ENCODE_BATCH,
+                 upsert_batch: int = UPSERT_BATCH,
+                 readers: int = READER_THREADS,
+                 max_chunks: int = MAX_CHUNKS,
+                 progress_every: int = PROGRESS_EVERY,
+                 progress=None,
+                 skip_unchanged: bool = False,
+                 prune_stale: bool = True,
+                 outbox=None):
+        self.client         = client
+        self.model          = model
+        self.collection     = collection
+        self.encode_batch   = encode_batch
+        self.upsert_batch   = upsert_batch
+        self.readers        = max(1, readers)
+        self.max_chunks     = max_chunks
+        self.progress_every = progress_every
+        self.skip_unchanged = skip_unchanged
+        self.prune_stale    = prune_stale
+        self.outbox         = outbox
+        self.progress       = progress or (
+            lambda s: print(f"Indexed {s.files} files... ({s.files_per_sec:.1f} files/s)"))
+
+    # ── Stage 1: read + decode ─────────────────────────────────────────────
+    def _reader(self, paths: queue.Queue, texts: queue.Queue, stats: IngestStats):
+        while True:
+            full_path = paths.get()
+            if full_path is _DONE:
+                texts.put(_DONE)
+                return
+            t0 = time.perf_counter()
+            try:
+                with open(full_path, "rb") as f:
+                    data = f.read()
+            except OSError as e:
+                stats.add(errors=1, read_secs=time.perf_counter() - t0)
+                stats.failed_paths.append(full_path)
+                print(f"Error with {os.path.basename(full_path)}: {e}")
+                continue
+            item = self._decode(full_path, data, stats)
+            elapsed = time.perf_counter() - t0
+            stats.add(read_secs=elapsed)
+            stats.latencies["read"].append(elapsed)
+            if item is not None:
+                texts.put(item)
+
+    def _decode(self, full_path: str, data: bytes, stats: IngestStats, extra: dict = None):
+        """Hash + decode one file → (path, text, digest, extra), or None if it is blank."""
+        digest = hash_bytes(data)
+        text = data.decode("utf-8", errors="ignore")
+        stats.hashes[full_path] = digest
+        if not text.strip():
+            stats.add(skipped=1)
+            return None
+        return (full_path, text, digest, extra)
+
+    def _feed(self, source, paths: queue.Queue, stats: IngestStats):
+        # Always post the sentinels — a source that raises must not leave the
+        # readers (and so the encoder) waiting forever; _run re-raises it.
+        try:
+            for full_path in source:
+                paths.put(full_path)
+        except BaseException as e:
+            stats.feed_error = e
+        finally:
+            for _ in range(self.readers):
+                paths.put(_DONE)
+
+    def _feed_documents(self, docs, texts: queue.Queue, stats: IngestStats):
+        """Stand-in for the reader pool when the bytes are already in memory."""
+        try:
+            for full_path, data, extra in docs:
+                item = self._decode(full_path, data, stats, extra)
+                if item is not None:
+                    texts.put(item)
+        except BaseException as e:
+            stats.feed_error = e
+        finally:
+            for _ in range(self.readers):
+                texts.put(_DONE)
+
+    # ── Stage 2: batch encode ──────────────────────────────────────────────
+    def _encode(self, texts: list[str], stats: IngestStats):
+        t0 = time.perf_counter()
+        vectors = self.model.encode(
+            texts,
+            batch_size=self.encode_batch,
+            convert_to_numpy=True,
+            show_progress_bar=False,
+        )
+        elapsed = time.perf_counter() - t0
+        stats.add(encode_secs=elapsed)
+        stats.latencies["encode"].append(elapsed)
+        return vectors
+
+    def _chunk(self, batch: list[tuple]) -> list[tuple]:
+        """Split each (path, text, digest, extra) into chunks → [(path, digest, chunks, extra)]."""
+        out = []
+        for full_path, text, digest, extra in batch:
+            chunks = chunk_markdown(text, title=os.path.basename(full_path), max_chunks=self.max_chunks)
+            if chunks:
+                out.append((full_path, digest, chunks, extra))
+        return out
+
+    def _build_points(self, chunked: list[tuple], vectors) -> list:
+        from qdrant_client.models import PointStruct
+        points = []
+        vec_iter = iter(vectors)
+        for full_path, digest, chunks, extra in chunked:
+            for i, chunk in enumerate(chunks):
+                points.append(PointStruct(
+                    id=chunk_id(full_path, i),
+                    vector=next(vec_iter).tolist(),
+                    payload={
+                        **(extra or {}),
+                        "filename":     os.path.basename(full_path),
+                        "path":         full_path,
+                        "content_hash": digest,
+                        "chunk_index":  i,
+                        "chunk_count":  len(chunks),
+                        "heading":      chunk["heading"],
+                        "start":        chunk["start"],
+                        "end":          chunk["end"],
+                        "text":         chunk["text"],
+                    },
+                ))
+        return points
+
+    def _drop_unchanged(self, batch: list[tuple], stats: IngestStats) -> list[tuple]:
+        """Filter out files whose stored content_hash already matches (one retrieve per batch)."""
+        try:
+            stored = self.client.retrieve(
+                collection_name=self.collection,
+                ids=[file_id(item[0]) for item in batch],
+                with_payload=["content_hash"],
+                with_vectors=False,
+            )
+        except Exception:
+            return batch   # lookup is an optimisation only — fall through to a normal upsert
+        known = {pt.id: (pt.payload or {}).get("content_hash") for pt in stored}
+        fresh = [item for item in batch if known.get(file_id(item[0])) != item[2]]
+        stats.add(unchanged=len(batch) - len(fresh))
+        return fresh
+
+    def _encode_loop(self, texts: queue.Queue, uploads: queue.Queue, stats: IngestStats):
+        """Drain the read queue in encode_batch groups until every reader is done."""
+        try:
+            self._encode_batches(texts, uploads, stats)
+        finally:
+            uploads.put(_DONE)
+
+    def _encode_batches(self, texts: queue.Queue, uploads: queue.Queue, stats: IngestStats):
+        readers_left = self.readers
+        last_report  = 0
+        while readers_left:
+            batch = []
+            while len(batch) < self.encode_batch and readers_left:
+                try:
+                    # Block for the first item; afterwards only briefly, so a
+                    # partial batch isn't stalled waiting on slow reads.
+                    item = texts.get(timeout=BATCH_LINGER if batch else None)
+                except queue.Empty:
+                    break
+                if item is _DONE:
+                    readers_left -= 1
+                    continue
+                batch.append(item)
+            if batch and self.skip_unchanged and self.client is not None:
+                batch = self._drop_unchanged(batch, stats)
+            chunked = self._chunk(batch)
+            stats.add(skipped=len(batch) - len(chunked))
+            if not chunked:
+                continue
+
+            try:
+                vectors = self._encode([c["embed_text"] for _, _, cs, _ in chunked for c in cs], stats)
+            except Exception as e:
+                stats.add(errors=len(chunked))
+                stats.failed_paths.extend(p for p, _, _, _ in chunked)
+                print(f"Error encoding batch of {len(chunked)}: {e}")
+                continue
+            files = [(p, len(cs)) for p, _, cs, _ in chunked] if self.prune_stale else []
+            uploads.put((self._build_points(chunked, vectors), files))
+
+            stats.chunk_counts.update((p, len(cs)) for p, _, cs, _ in chunked)
+            stats.add(files=len(chunked), chunks=len(vectors))
+            if self.progress_every and stats.files - last_report >= self.progress_every:
+                last_report = stats.files
+                self.progress(stats)
+
+    # ── Stage 3: adaptive async upload ─────────────────────────────────────
+    def _send(self, job: tuple, wait: bool, batcher: AdaptiveBatcher, stats: IngestStats):
+        points, files = job
+        if self.client is None:
+            self._enqueue(points, "offline", stats)
+            return
+        t0 = time.perf_counter()
+        try:
+            if files:
+                # Drop chunks beyond each file's new chunk count (file got shorter)
+                from qdrant_client.models import FilterSelector
+                self.client.delete(collection_name=self.collection,
+                                   points_selector=FilterSelector(filter=stale_chunk_filter(files)),
+                                   wait=wait and not points)
+            if points:
+                self.client.upsert(collection_name=self.collection, points=points, wait=wait)
+        except Exception as e:
+            if self._enqueue(points, e, stats):
+                return
+            paths = {p.payload["path"] for p in points}
+            stats.add(files=-len(paths), errors=len(paths))
+            stats.failed_paths.extend(paths)
+            print(f"Error upserting batch of {len(points)} points ({len(paths)} files): {e}")
+            return
+        latency = time.perf_counter() - t0
+        stats.add(upserts=1, upsert_secs=latency)
+        stats.latencies["upsert"].append(latency)
+        batcher.observe(latency)
+        if self.outbox is not None and points:
+            # Older queued writes of these files must not overwrite them on replay;
+            # chunks this run queued after a failed batch still have to go out
+            self.outbox.supersede(self.collection, (p.payload["path"] for p in points),
+                                  before=stats.run_start)
+
+    def _enqueue(self, points: list, reason, stats: IngestStats) -> bool:
+        """Park a batch in the outbox. Returns False if there is none or it failed too."""
+        if self.outbox is None or not points:
+            return False
+        paths = {p.payload["path"] for p in points}
+        try:
+            self.outbox.add_points(self.collection, points)
+        except Exception as e:
+            print(f"Error queueing {len(points)} points in the outbox: {e}")
+            return False
+        with stats._lock:   # a file's chunks can span two upload batches — count it once
+            paths -= stats.queued_paths
+            stats.queued_paths |= paths
+        stats.add(files=-len(paths), queued=len(paths))
+        if reason != "offline":
+            print(f"Upsert of {len(points)} points failed ({reason}) — queued in the outbox for replay")
+        return True
+
+    def _uploader(self, uploads: queue.Queue, stats: IngestStats):
+        """
+        Accumulate points into adaptive batches and send them with wait=False.
+
+        The most recent full batch is held back one step so that the last
+        request of the run can be sent with wait=True as the barrier.
+        """
+        batcher = AdaptiveBatcher(initial=self.upsert_batch)
+        pending, pending_files, pending_bytes = [], [], 0
+        held = None
+
+        def ship():
+            nonlocal held, pending, pending_files, pending_bytes
+            if held is not None:
+                self._send(held, False, batcher, stats)
+            held = (pending, pending_files)
+            pending, pending_files, pending_bytes = [], [], 0
+
+        while True:
+            item = uploads.get()
+            if item is _DONE:
+                break
+            points, files = item
+            for point in points:
+                size = _point_bytes(point)
+                if pending and pending_bytes + size > batcher.max_bytes:
+                    ship()
+                pending.append(point)
+                pending_bytes += size
+                if len(pending) >= batcher.size:
+                    ship()
+            pending_files.extend(files)
+
+        if pending or pending_files:
+            ship()
+        if held is not None:
+            self._send(held, True, batcher, stats)   # consistency barrier
+
+    # ── Public API ─────────────────────────────────────────────────────────
+    def ingest_paths(self, paths) -> IngestStats:
+        """
+        Ingest every path from an iterable of file paths.
+
+        Returns:
+            IngestStats with counts, stage timings, throughput and the
+            list of paths that failed to read, encode or upsert
+        """
+        stats       = IngestStats()
+        path_q      = queue.Queue(maxsize=self.encode_batch * QUEUE_DEPTH)
+        text_q      = queue.Queue(maxsize=self.encode_batch * QUEUE_DEPTH)
+
+        threads = [threading.Thread(target=self._feed, args=(paths, path_q, stats), daemon=True)]
+        threads += [
+            threading.Thread(target=self._reader, args=(path_q, text_q, stats), daemon=True)
+            for _ in range(self.readers)
+        ]
+        return self._run(threads, text_q, stats)
+
+    def ingest_documents(self, docs) -> IngestStats:
+        """
+        Ingest in-memory documents instead of reading files from disk.
+
+        Args:
+            docs: Iterable of (full_path, data_bytes, extra_payload) — the
+                  extra dict (or None) is merged into every chunk's payload
+
+        Returns:
+            IngestStats, as for ingest_paths()
+        """
+        stats  = IngestStats()
+        text_q = queue.Queue(maxsize=self.encode_batch * QUEUE_DEPTH)
+        feeder = threading.Thread(target=self._feed_documents, args=(docs, text_q, stats), daemon=True)
+        return self._run([feeder], text_q, stats)
+
+    def _run(self, threads: list, text_q: queue.Queue, stats: IngestStats) -> IngestStats:
+        """Start the producer threads plus the uploader and drive the encode stage."""
+        upload_q = queue.Queue(maxsize=QUEUE_DEPTH)
+        uploader = threading.Thread(target=self._uploader, args=(upload_q, stats), daemon=True)
+        for t in threads + [uploader]:
+            t.start()
+
+        self._encode_loop(text_q, upload_q, stats)
+        uploader.join()
+        for t in threads:
+            t.join()
+        if hasattr(self.model, "flush"):
+            self.model.flush()   # persist embedding-cache index (see embedding_cache)
+
+        stats.finished = time.perf_counter()
+        if stats.feed_error is not None:
+            raise stats.feed_error   # what was read before the failure is already upserted
+        return stats
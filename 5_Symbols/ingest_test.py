@@ -1,58 +1,37 @@
 """Smoke test: ingest first 50 .md files, then run a search."""
 import os
-import hashlib
-from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams, PointStruct
-from sentence_transformers import SentenceTransformer
+from itertools import islice
 
-LXC_IP     = "192.168.2.227"
+from qdrant_connection import connect, QDRANT_HOST
+from embedding_cache import load_encoder
+from ingest_engine import IngestEngine, iter_markdown_files, ensure_collection
+
+LXC_IP     = QDRANT_HOST   # env QDRANT_HOST / config file, see qdrant_connection.py
 REPO_PATH  = "/Users/rifaterdemsahin/projects/secondbrain/"
 COLLECTION = "mac_repo_index"
 LIMIT      = 50
 
-client = QdrantClient(host=LXC_IP, port=6333)
-model  = SentenceTransformer('all-MiniLM-L6-v2')
+client = connect("bulk", host=LXC_IP)
+model  = load_encoder('all-MiniLM-L6-v2')  # on-disk embedding cache, model loaded on first miss
 
-if not client.collection_exists(COLLECTION):
-    client.create_collection(
-        collection_name=COLLECTION,
-        vectors_config=VectorParams(size=384, distance=Distance.COSINE),
-    )
+if ensure_collection(client, COLLECTION):
     print(f"Created collection: {COLLECTION}")
 else:
     print(f"Collection exists: {COLLECTION}")
 
 print(f"Ingesting first {LIMIT} files from {REPO_PATH}...")
-count = 0
-for root, _, files in os.walk(REPO_PATH):
-    for file in files:
-        if not file.endswith(".md"):
-            continue
-        full_path = os.path.join(root, file)
-        try:
-            text = open(full_path, 'r', encoding='utf-8').read()
-            file_id = int(hashlib.md5(full_path.encode()).hexdigest(), 16) % (10**12)
-            vector  = model.encode(text[:8000]).tolist()
-            client.upsert(
-                collection_name=COLLECTION,
-                points=[PointStruct(
-                    id=file_id,
-                    vector=vector,
-                    payload={"filename": file, "path": full_path}
-                )]
-            )
-            count += 1
-            print(f"  [{count:>3}] {file}")
-        except Exception as e:
-            print(f"  ERROR {file}: {e}")
-        if count >= LIMIT:
-            break
-    if count >= LIMIT:
-        break
+engine = IngestEngine(
+    client, model, COLLECTION,
+    progress_every=10,
+    progress=lambda s: print(f"  [{s.files:>3}] files ({s.chunks} chunks)"),
+)
+stats = engine.ingest_paths(islice(iter_markdown_files(REPO_PATH), LIMIT))
+for path in stats.failed_paths:
+    print(f"  ERROR {os.path.basename(path)}")
 
-print(f"\nIngested {count} files. Running search...\n")
+print(f"\nIngested {stats.files} files ({stats.chunks} chunks). Running search...\n")
 
-# --- Search ---
+# --- Search (grouped by note, so each file comes back once) ---
 queries = [
     "how to set up docker",
     "proxmox configuration",
@@ -61,8 +40,10 @@ queries = [
 
 for q in queries:
     vec     = model.encode(q).tolist()
-    resp    = client.query_points(collection_name=COLLECTION, query=vec, limit=3, with_payload=True)
+    resp    = client.query_points_groups(collection_name=COLLECTION, query=vec, group_by="path",
+                                         limit=3, group_size=1, with_payload=True)
     print(f"Query: '{q}'")
-    for r in resp.points:
-        print(f"  score={r.score:.4f}  {r.payload['filename']}")
+    for g in resp.groups:
+        r = g.hits[0]
+        print(f"  score={r.score:.4f}  {r.payload['filename']}  › {r.payload.get('heading', '')}")
     print()
@@ -0,0 +1,406 @@
+#!/usr/bin/env python3
+"""
+Offline local vector index — search keeps working when the Proxmox Qdrant
+is unreachable (LXC down, laptop off the LAN).
+
+A periodically refreshed copy of a collection is kept on disk: every
+point's vector in one memory-mapped float32 matrix plus a compact payload
+table. When Qdrant fails its health check, the search server and the agent
+library answer from this copy with an exact cosine top-k (one matrix-vector
+product + argpartition) — ~100k chunk vectors search in well under 50 ms.
+
+Layout (one directory per collection under INDEX_DIR):
+    CURRENT             name of the live version directory
+    v<ns>/vectors.f32     float32 [N, dim], L2-normalised, memory-mapped
+    v<ns>/path_codes.npy  int32 [N] — one code per note path, for per-note dedupe
+    v<ns>/offsets.npy     uint64 [N+1] — byte offsets of each row in payload.jsonl
+    v<ns>/payload.jsonl   one JSON object per point: id + the point's payload
+    v<ns>/meta.json       collection, count, dim, built_at
+
+A rebuild writes a new version directory and then os.replace()s CURRENT
+to name it — one atomic rename, so readers always find a complete index.
+The previous version is kept for readers that resolved it just before
+the switch; older ones are removed.
+
+CLI:
+    python 5_Symbols/local_index.py                   # refresh if older than REFRESH_HOURS
+    python 5_Symbols/local_index.py --force           # rebuild now
+    python 5_Symbols/local_index.py --query "docker"  # search the local copy only
+
+Usage (as a module):
+    from local_index import load_local_index
+    index   = load_local_index("mac_repo_index")
+    results = index.search(vector, limit=10)
+"""
+
+import os
+import json
+import time
+import mmap
+import shutil
+import argparse
+import threading
+import urllib.request
+
+import numpy as np
+
+from qdrant_connection import connect, CONFIG, QDRANT_HOST, QDRANT_PORT
+
+# ── Configuration ──────────────────────────────────────────────────────────────
+LXC_IP         = QDRANT_HOST   # env QDRANT_HOST / config file, see qdrant_connection.py
+COLLECTION     = "mac_repo_index"
+MODEL_NAME     = "all-MiniLM-L6-v2"
+INDEX_DIR      = os.environ.get(
+    "QDRANT_LOCAL_INDEX",
+    os.path.join(os.path.expanduser("~"), ".cache", "qdrant_secondbrain", "local_index"),
+)
+REFRESH_HOURS  = 6      # rebuild the local copy when it is older than this
+REFRESH_CHECK  = 600    # seconds between staleness checks in the server's refresher
+SCROLL_PAGE    = 1024   # points per scroll request while building
+OVERFETCH      = 4      # chunk rows considered per wanted note (dedupe by path)
+HEALTH_TTL     = 10     # seconds between background Qdrant health probes
+HEALTH_TIMEOUT = 0.5    # seconds before a probe counts as "unreachable"
+# ───────────────────────────────────────────────────────────────────────────────
+
+
+def index_path(collection: str, index_dir: str = None) -> str:
+    return os.path.join(index_dir or INDEX_DIR, collection)
+
+
+def current_path(collection: str, index_dir: str = None):
+    """Directory of the live version of collection's local copy, or None if none has been built."""
+    root = index_path(collection, index_dir)
+    try:
+        with open(os.path.join(root, "CURRENT")) as f:
+            version = f.read().strip()
+    except OSError:
+        return None
+    return os.path.join(root, version) if version else None
+
+
+def index_info(collection: str, index_dir: str = None):
+    """meta.json of the local copy plus its age in seconds, or None if there is none."""
+    path = current_path(collection, index_dir)
+    if path is None:
+        return None
+    try:
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    meta["age_secs"] = round(time.time() - meta.get("built_at", 0))
+    return meta
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+#  BUILD
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def build_local_index(client, collection: str, index_dir: str = None, page: int = SCROLL_PAGE) -> dict:
+    """
+    Scroll every point (vector + payload) out of Qdrant into a fresh local copy.
+
+    Args:
+        client:     QdrantClient
+        collection: Collection to copy
+        index_dir:  Parent directory (default INDEX_DIR)
+        page:       Points per scroll request
+
+    Returns:
+        The new meta dict
+    """
+    root     = index_path(collection, index_dir)
+    previous = current_path(collection, index_dir)
+    version  = f"v{time.time_ns()}"
+    tmp      = os.path.join(root, version)
+    os.makedirs(tmp)
+
+    codes, offsets, path_codes = [], [0], {}
+    dim, count = 0, 0
+    with open(os.path.join(tmp, "vectors.f32"), "wb") as vf, \
+         open(os.path.join(tmp, "payload.jsonl"), "wb") as pf:
+        offset = None
+        while True:
+            points, offset = client.scroll(
+                collection_name=collection,
+                limit=page,
+                offset=offset,
+                with_payload=True,
+                with_vectors=True,
+            )
+            if points:
+                vecs = np.asarray([p.vector for p in points], dtype=np.float32)
+                norms = np.linalg.norm(vecs, axis=1, keepdims=True)
+                vf.write((vecs / np.maximum(norms, 1e-12)).tobytes())
+                dim = vecs.shape[1]
+                for p in points:
+                    payload = p.payload or {}
+                    line = json.dumps({"id": p.id, **payload}, ensure_ascii=False).encode() + b"\n"
+                    pf.write(line)
+                    offsets.append(offsets[-1] + len(line))
+                    codes.append(path_codes.setdefault(payload.get("path", ""), len(path_codes)))
+                count += len(points)
+            if offset is None:
+                break
+
+    np.save(os.path.join(tmp, "path_codes.npy"), np.asarray(codes, dtype=np.int32))
+    np.save(os.path.join(tmp, "offsets.npy"), np.asarray(offsets, dtype=np.uint64))
+    meta = {"collection": collection, "count": count, "dim": dim, "built_at": time.time()}
+    with open(os.path.join(tmp, "meta.json"), "w") as f:
+        json.dump(meta, f)
+
+    # Switch atomically: readers see either the old CURRENT or the new one
+    pointer = os.path.join(root, "CURRENT")
+    with open(pointer + ".tmp", "w") as f:
+        f.write(version)
+    os.replace(pointer + ".tmp", pointer)
+
+    # Open readers keep their mapped files alive; keep the previous version
+    # for readers that resolved CURRENT just before the switch
+    keep = {"CURRENT", version, os.path.basename(previous or "")}
+    for name in os.listdir(root):
+        if name not in keep:
+            stale = os.path.join(root, name)
+            if os.path.isdir(stale):
+                shutil.rmtree(stale, ignore_errors=True)
+            else:
+                os.remove(stale)
+    return meta
+
+
+def refresh_if_stale(client, collection: str, max_age_hours: float = REFRESH_HOURS,
+                     index_dir: str = None) -> bool:
+    """Rebuild the local copy if it is missing or older than max_age_hours. Returns True if rebuilt."""
+    info = index_info(collection, index_dir)
+    if info is not None and info["age_secs"] < max_age_hours * 3600:
+        return False
+    build_local_index(client, collection, index_dir)
+    return True
+
+
+def start_refresher(get_client, collection: str, health, interval: float = REFRESH_CHECK):
+    """Daemon thread that keeps the local copy fresh while Qdrant is reachable."""
+    def loop():
+        while True:
+            if health.ok():
+                try:
+                    if refresh_if_stale(get_client(), collection):
+                        print(f"  Local index refreshed: {collection}")
+                except Exception as e:
+                    print(f"  ⚠️  Local index refresh failed: {e}")
+            time.sleep(interval)
+
+    thread = threading.Thread(target=loop, name="local-index-refresh", daemon=True)
+    thread.start()
+    return thread
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+#  SEARCH
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def _matches(payload: dict, where: dict) -> bool:
+    """Same semantics as the server's JSON filters: scalars match exactly, lists match any."""
+    for key, value in where.items():
+        if isinstance(value, list):
+            if payload.get(key) not in value:
+                return False
+        elif payload.get(key) != value:
+            return False
+    return True
+
+
+class LocalIndex:
+    """Read-only, memory-mapped view of one collection's local copy."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+        count, dim = self.meta["count"], self.meta["dim"]
+        if count:
+            self.vectors = np.memmap(os.path.join(path, "vectors.f32"), dtype=np.float32,
+                                     mode="r", shape=(count, dim))
+        else:
+            self.vectors = np.zeros((0, dim), dtype=np.float32)
+        self.path_codes = np.load(os.path.join(path, "path_codes.npy"), mmap_mode="r")
+        self.offsets    = np.load(os.path.join(path, "offsets.npy"), mmap_mode="r")
+        with open(os.path.join(path, "payload.jsonl"), "rb") as f:
+            self._payload = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if count else b""
+
+    def __len__(self) -> int:
+        return self.meta["count"]
+
+    def payload(self, row: int) -> dict:
+        return json.loads(self._payload[int(self.offsets[row]):int(self.offsets[row + 1])])
+
+    def search(self, vector, limit: int = 10, where: dict = None) -> list[dict]:
+        """
+        Exact cosine top-k, one result per note (its best chunk).
+
+        Args:
+            vector: Query vector (normalised here)
+            limit:  Max notes returned
+            where:  Optional {field: value | [values]} payload filter
+
+        Returns:
+            Result dicts shaped like the server's: id, score, filename, path,
+            heading, start, end, text
+        """
+        n = len(self)
+        if not n:
+            return []
+        q = np.asarray(vector, dtype=np.float32)
+        q = q / max(float(np.linalg.norm(q)), 1e-12)
+        scores = self.vectors @ q
+
+        k = min(n, limit * OVERFETCH)
+        while True:
+            top = np.argpartition(-scores, k - 1)[:k] if k < n else np.arange(n)
+            top = top[np.argsort(-scores[top], kind="stable")]
+            seen, results = set(), []
+            for row in top:
+                code = int(self.path_codes[row])
+                if code in seen:
+                    continue
+                p = self.payload(row)
+                if where and not _matches(p, where):
+                    continue
+                seen.add(code)
+                results.append({
+                    "id":       p.get("id"),
+                    "score":    round(float(scores[row]), 4),
+                    "filename": p.get("filename", ""),
+                    "path":     p.get("path", ""),
+                    "heading":  p.get("heading", ""),
+                    "start":    p.get("start"),
+                    "end":      p.get("end"),
+                    "text":     p.get("text", p.get("content", "")),
+                })
+                if len(results) >= limit:
+                    return results
+            if k >= n:
+                return results
+            k = min(n, k * 8)   # too many chunks of the same notes (or filtered out) — widen
+
+
+_open: dict[str, tuple] = {}
+_open_lock = threading.Lock()
+
+
+def load_local_index(collection: str, index_dir: str = None):
+    """
+    The local copy of collection, or None if none has been built.
+
+    Opened indexes are reused until a rebuild points CURRENT at a new version.
+    """
+    root = index_path(collection, index_dir)
+    path = current_path(collection, index_dir)
+    if path is None:
+        return None
+    with _open_lock:
+        cached = _open.get(root)
+        if cached is None or cached[0] != path:
+            cached = (path, LocalIndex(path))
+            _open[root] = cached
+        return cached[1]
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+#  HEALTH CHECK
+# ═══════════════════════════════════════════════════════════════════════════════
+
+class QdrantHealth:
+    """
+    Reachability flag for the Qdrant REST API, kept fresh off the request path.
+
+    A daemon thread GETs /readyz (short timeout) every `ttl` seconds; ok()
+    only reads the last result, so searches never wait on a probe — nor on
+    the client's 10 s connect timeout when the LXC is down. Scheme and API
+    key follow the shared connection config (qdrant_connection.CONFIG),
+    like the clients connect() builds.
+    """
+
+    def __init__(self, host: str = LXC_IP, port: int = QDRANT_PORT,
+                 ttl: float = HEALTH_TTL, timeout: float = HEALTH_TIMEOUT):
+        scheme       = "https" if CONFIG["https"] else "http"
+        self.url     = f"{scheme}://{host}:{port}/readyz"
+        self.headers = {"api-key": CONFIG["api_key"]} if CONFIG["api_key"] else {}
+        self.ttl     = ttl
+        self.timeout = timeout
+        self.up      = True
+        self._thread = None
+        self._lock   = threading.Lock()
+
+    def check(self) -> bool:
+        """Probe now (blocks up to timeout) — for callers that just saw a request fail."""
+        try:
+            request = urllib.request.Request(self.url, headers=self.headers)
+            with urllib.request.urlopen(request, timeout=self.timeout) as resp:
+                self.up = resp.status == 200
+        except Exception:
+            self.up = False
+        return self.up
+
+    def start(self):
+        """Start the background probe (idempotent)."""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="qdrant-health", daemon=True)
+                self._thread.start()
+        return self
+
+    def _loop(self):
+        while True:
+            self.check()
+            time.sleep(self.ttl)
+
+    def ok(self) -> bool:
+        """Last probe result; never blocks. The first call starts the background probe."""
+        if self._thread is None:
+            self.start()
+        return self.up
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+#  CLI
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or query the offline local copy of a Qdrant collection")
+    parser.add_argument("--collection", default=COLLECTION, help=f"Collection (default: {COLLECTION})")
+    parser.add_argument("--force", action="store_true", help="Rebuild even if the local copy is fresh")
+    parser.add_argument("--query", help="Search the local copy instead of building")
+    parser.add_argument("--limit", type=int, default=10, help="Max results for --query (default: 10)")
+    args = parser.parse_args()
+
+    if args.query:
+        index = load_local_index(args.collection)
+        if index is None:
+            print(f"  ❌ No local index for {args.collection} — run without --query first")
+            return
+        from embedding_cache import load_query_cache, load_encoder
+        vector = load_query_cache(MODEL_NAME).get_or_encode(args.query, load_encoder(MODEL_NAME).encode)
+        started = time.perf_counter()
+        results = index.search(vector, args.limit)
+        elapsed = (time.perf_counter() - started) * 1000
+        for r in results:
+            heading = f"  § {r['heading']}" if r["heading"] else ""
+            print(f"  {r['score']:.4f}  {r['filename']}{heading}")
+        print(f"\n  {len(results)} results from {len(index)} local vectors in {elapsed:.1f} ms")
+        return
+
+    client = connect("bulk", host=LXC_IP, port=QDRANT_PORT)
+    started = time.time()
+    if args.force:
+        build_local_index(client, args.collection)
+    elif not refresh_if_stale(client, args.collection):
+        print(f"  ✓ Local index is fresh ({index_info(args.collection)['age_secs']}s old) — use --force to rebuild")
+        return
+    meta = index_info(args.collection)
+    print(f"  ✓ Local index built: {meta['count']} vectors × {meta['dim']} in {time.time() - started:.1f}s")
+    print(f"    {current_path(args.collection)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Heading-aware markdown chunking.
+
+all-MiniLM-L6-v2 only sees the first 256 word pieces of its input, so
+embedding `text[:8000]` wastes most of the tokenizer work and leaves
+everything past the first paragraph of a long note unsearchable. This
+module splits a note on markdown headings, then packs its paragraphs into
+chunks that fit the model's token budget. Each chunk becomes its own
+point carrying the parent path and UTF-8 byte offsets into the file.
+
+The heading trail ("Title › Section › Subsection") is prepended to the
+text that gets embedded, so a chunk keeps the context of where it lives.
+
+Usage (as a module):
+    from md_chunker import chunk_markdown
+    for c in chunk_markdown(text, title="docker.md"):
+        c["text"], c["embed_text"], c["start"], c["end"], c["heading"]
+"""
+
+import re
+
+# ── Configuration ──────────────────────────────────────────────────────────────
+CHUNK_TOKENS    = 220   # estimated word pieces per chunk (model truncates at 256)
+MIN_CHUNK_CHARS = 40    # merge fragments shorter than this into their neighbour
+MAX_CHUNKS      = 64    # per file — bounds pathological files (logs, dumps)
+# ───────────────────────────────────────────────────────────────────────────────
+
+_HEADING = re.compile(r"^(#{1,6})[ \t]+(.+?)[ \t#]*$")
+_FENCE   = re.compile(r"^\s*(```|~~~)")
+_TOKEN   = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+|\n")
+_WORD    = re.compile(r"\S+")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap word-piece estimate without loading a tokenizer.
+
+    Counts words and punctuation, then adds a share for long words that
+    WordPiece splits into several pieces. Errs on the high side so chunks
+    stay under the model's limit.
+    """
+    count = 0
+    for tok in _TOKEN.findall(text):
+        count += 1 + len(tok) // 8
+    return count
+
+
+def _sections(text: str):
+    """
+    Split text into (heading_trail, start, end) spans on ATX headings.
+
+    Headings inside fenced code blocks are ignored. Offsets are str indices.
+    """
+    trail: list[tuple[int, str]] = []
+    sections = []
+    start = 0
+    current = ""
+    in_fence = False
+    pos = 0
+    for line in text.splitlines(keepends=True):
+        if _FENCE.match(line):
+            in_fence = not in_fence
+        m = None if in_fence else _HEADING.match(line.rstrip("\r\n"))
+        if m:
+            if pos > start:
+                sections.append((current, start, pos))
+            level = len(m.group(1))
+            trail = [(lv, t) for lv, t in trail if lv < level] + [(level, m.group(2).strip())]
+            current = " › ".join(t for _, t in trail)
+            start = pos
+        pos += len(line)
+    if pos > start:
+        sections.append((current, start, pos))
+    return sections
+
+
+def _paragraphs(text: str, start: int, end: int):
+    """Yield (start, end) spans of blank-line separated paragraphs within [start, end)."""
+    for m in re.finditer(r"\S(?:.*?)(?=\n[ \t]*\n|\Z)", text[start:end], re.DOTALL):
+        yield start + m.start(), start + m.end()
+
+
+def _hard_split(text: str, start: int, end: int, budget: int):
+    """Cut [start, end) on whitespace into spans of at most `budget` tokens — one pass over the words."""
+    s, acc = start, 0
+    for w in _WORD.finditer(text, start, end):
+        tokens = estimate_tokens(w.group())
+        if acc and acc + tokens > budget:
+            yield s, w.start()
+            s, acc = w.start(), 0
+        acc += tokens
+    yield s, end
+
+
+def _split_long(text: str, start: int, end: int, budget: int):
+    """
+    Split one oversized paragraph on sentence / line boundaries, then hard
+    on words. Lazy, and every character is tokenized once, so a huge
+    paragraph costs linear time and stops as soon as the caller has enough.
+    """
+    piece_start = last_cut = start
+    piece_tokens = 0
+    for m in _SENTENCE_END.finditer(text, start, end):
+        cut = m.end()
+        # Cuts sit on whitespace, so token counts of neighbouring segments add up
+        seg_tokens = estimate_tokens(text[last_cut:cut])
+        if piece_tokens + seg_tokens > budget and last_cut > piece_start:
+            yield from _emit_piece(text, piece_start, last_cut, piece_tokens, budget)
+            piece_start, piece_tokens = last_cut, 0
+        piece_tokens += seg_tokens
+        last_cut = cut
+    piece_tokens += estimate_tokens(text[last_cut:end])
+    yield from _emit_piece(text, piece_start, end, piece_tokens, budget)
+
+
+def _emit_piece(text: str, start: int, end: int, tokens: int, budget: int):
+    if tokens > budget:
+        # No sentence boundary small enough — cut on whitespace
+        yield from _hard_split(text, start, end, budget)
+    else:
+        yield start, end
+
+
+def _spans(text: str, title: str, max_tokens: int):
+    """Yield (heading, start, end) str-index spans packed to the token budget, in order."""
+    for heading, s_start, s_end in _sections(text):
+        trail = " › ".join(p for p in (title, heading) if p)
+        budget = max(32, max_tokens - estimate_tokens(trail))
+
+        cur_start = cur_end = None
+        cur_tokens = 0
+        for p_start, p_end in _paragraphs(text, s_start, s_end):
+            p_tokens = estimate_tokens(text[p_start:p_end])
+            if p_tokens > budget:
+                if cur_start is not None:
+                    yield heading, cur_start, cur_end
+                    cur_start = None
+                for a, b in _split_long(text, p_start, p_end, budget):
+                    yield heading, a, b
+                continue
+            if cur_start is not None and cur_tokens + p_tokens > budget:
+                yield heading, cur_start, cur_end
+                cur_start = None
+            if cur_start is None:
+                cur_start, cur_tokens = p_start, 0
+            cur_end = p_end
+            cur_tokens += p_tokens
+        if cur_start is not None:
+            yield heading, cur_start, cur_end
+
+
+def chunk_markdown(text: str, title: str = "",
+                   max_tokens: int = CHUNK_TOKENS,
+                   max_chunks: int = MAX_CHUNKS) -> list[dict]:
+    """
+    Split a markdown note into token-budgeted chunks.
+
+    Args:
+        text:       Full note text
+        title:      Prepended to every heading trail (usually the filename)
+        max_tokens: Estimated word-piece budget per chunk, heading trail included
+        max_chunks: Hard cap on chunks returned for one note
+
+    Returns:
+        List of dicts with keys:
+            text        the chunk's own text (slice of the note)
+            embed_text  heading trail + text — what gets embedded
+            heading     heading trail of the section the chunk starts in
+            start, end  UTF-8 byte offsets of the chunk within the note
+    """
+    # Fold tiny fragments (a lone heading line, a stray link) into a neighbour
+    # of the same section — backwards if possible, otherwise forwards.
+    # Once more than max_chunks are merged the first max_chunks are final
+    # (only the last one can still grow), so stop pulling spans there.
+    merged = []
+    carry = None
+    for span in _spans(text, title, max_tokens):
+        if len(merged) > max_chunks:
+            break
+        if carry is not None:
+            if carry[0] == span[0]:
+                span = (span[0], carry[1], span[2])
+            else:
+                merged.append(carry)
+            carry = None
+        if span[2] - span[1] < MIN_CHUNK_CHARS:
+            if merged and merged[-1][0] == span[0]:
+                merged[-1] = (span[0], merged[-1][1], span[2])
+            else:
+                carry = span
+            continue
+        merged.append(span)
+    if carry is not None:
+        merged.append(carry)
+    merged = merged[:max_chunks]
+
+    # Convert str offsets to byte offsets in one pass
+    byte_pos = {}
+    wanted = sorted({i for _, s, e in merged for i in (s, e)})
+    acc, prev = 0, 0
+    for i in wanted:
+        acc += len(text[prev:i].encode("utf-8", errors="ignore"))
+        byte_pos[i] = acc
+        prev = i
+
+    chunks = []
+    for heading, s, e in merged:
+        body  = text[s:e].strip()
+        if not body:
+            continue
+        trail = " › ".join(p for p in (title, heading) if p)
+        chunks.append({
+            "text":       body,
+            "embed_text": f"{trail}\n\n{body}" if trail else body,
+            "heading":    heading,
+            "start":      byte_pos[s],
+            "end":        byte_pos[e],
+        })
+    return chunks
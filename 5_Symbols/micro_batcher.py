@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Dynamic micro-batching of concurrent query encodes.
+
+Batch encodes are far cheaper per item on CPU than single-string forward
+passes. Under concurrent load the search server funnels every cache-miss
+query through one MicroBatcher: requests arriving within a small window
+(a few ms), or up to a maximum batch size, are encoded in one forward
+pass and the vectors are fanned back to the waiting requests.
+
+Works for both serving modes — submit() returns a concurrent.futures.Future,
+which threads can .result() on and asyncio code can await through
+asyncio.wrap_future().
+
+Usage (as a module):
+    from micro_batcher import MicroBatcher
+    batcher = MicroBatcher(lambda texts: model.encode(texts, batch_size=len(texts)))
+    vector  = batcher.encode("docker setup")            # blocking
+    future  = batcher.submit("proxmox lxc")              # non-blocking
+"""
+
+import time
+import queue
+import threading
+from collections import deque
+from concurrent.futures import Future
+
+# ── Configuration ──────────────────────────────────────────────────────────────
+BATCH_WINDOW_MS = 3     # how long the first request waits for company
+MAX_BATCH       = 32    # encode at most this many queries per forward pass
+STATS_WINDOW    = 1000  # recent batches kept for the percentile stats
+# ───────────────────────────────────────────────────────────────────────────────
+
+
+def _percentile(values, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+class MicroBatcher:
+    """
+    Collect single-text encode requests into small batches on a worker thread.
+
+    Args:
+        encode_batch: Callable list[str] → sequence of vectors (one forward pass)
+        window_ms:    Max time the oldest request waits for the batch to fill
+        max_batch:    Max texts per forward pass
+    """
+
+    def __init__(self, encode_batch, window_ms: float = BATCH_WINDOW_MS, max_batch: int = MAX_BATCH):
+        self.encode_batch = encode_batch
+        self.window       = window_ms / 1000.0
+        self.max_batch    = max(1, max_batch)
+        self._queue: queue.Queue = queue.Queue()
+        self._lock        = threading.Lock()
+        self._batches     = 0
+        self._items       = 0
+        self._sizes       = deque(maxlen=STATS_WINDOW)
+        self._waits_ms    = deque(maxlen=STATS_WINDOW)
+        self._encode_ms   = deque(maxlen=STATS_WINDOW)
+        self._worker      = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._worker.start()
+
+    def submit(self, text: str) -> Future:
+        """Queue one text for encoding. The future resolves to its vector."""
+        fut: Future = Future()
+        self._queue.put((text, fut, time.perf_counter()))
+        return fut
+
+    def encode(self, text: str):
+        """Blocking convenience wrapper around submit()."""
+        return self.submit(text).result()
+
+    def _collect(self) -> list:
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            # Drop requests cancelled while queued (e.g. a client that went away);
+            # the rest are marked running, so they can no longer be cancelled and
+            # set_result() below cannot raise InvalidStateError.
+            batch = [item for item in self._collect() if item[1].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            started = time.perf_counter()
+            try:
+                vectors = self.encode_batch([text for text, _, _ in batch])
+            except Exception as e:
+                for _, fut, _ in batch:
+                    fut.set_exception(e)
+                continue
+            done = time.perf_counter()
+
+            for (_, fut, _), vec in zip(batch, vectors):
+                fut.set_result(vec)
+
+            with self._lock:
+                self._batches += 1
+                self._items   += len(batch)
+                self._sizes.append(len(batch))
+                self._encode_ms.append((done - started) * 1000)
+                self._waits_ms.extend((started - enq) * 1000 for _, _, enq in batch)
+
+    def stats(self) -> dict:
+        """Batch-size and queue-wait statistics (recent window for the distributions)."""
+        with self._lock:
+            sizes, waits, enc = list(self._sizes), list(self._waits_ms), list(self._encode_ms)
+            batches, items = self._batches, self._items
+        return {
+            "batches":         batches,
+            "queries":         items,
+            "avg_batch_size":  round(items / batches, 2) if batches else 0.0,
+            "max_batch_size":  max(sizes) if sizes else 0,
+            "queue_wait_ms":   {"p50": round(_percentile(waits, 50), 2),
+                                "p95": round(_percentile(waits, 95), 2),
+                                "max": round(max(waits), 2) if waits else 0.0},
+            "encode_ms":       {"p50": round(_percentile(enc, 50), 2),
+                                "p95": round(_percentile(enc, 95), 2)},
+            "pending":         self._queue.qsize(),
+            "window_ms":       self.window * 1000,
+            "max_batch":       self.max_batch,
+        }
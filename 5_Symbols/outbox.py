@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""
+Durable write-ahead outbox for Qdrant writes that could not be delivered.
+
+When Qdrant is unreachable (or an upsert / delete request fails), writers
+record the write here instead of dropping it: upserts keep their already
+computed vectors, so nothing is re-embedded, and deletes keep the file path.
+Any writer that later connects successfully replays the outbox in bulk
+before doing its own work.
+
+Storage is a single SQLite file (WAL mode) so the pre-commit hook, cron sync
+and full ingest can share it safely. The queue compacts itself as it grows:
+    • a newer upsert of the same point replaces the queued one
+    • a queued delete of a path drops every queued upsert of that path
+    • a write that reaches Qdrant directly supersedes anything queued for
+      the same paths by an earlier run (see supersede()), so a late replay
+      never clobbers it
+
+Replay order per collection: deletes first, then upserts in queue order.
+After compaction no queued upsert can precede a queued delete of the same
+path, so this matches the original write order. Rows are removed only after
+their request succeeded — a replay interrupted halfway resumes next time.
+
+CLI:
+    python 5_Symbols/outbox.py              # show pending writes
+    python 5_Symbols/outbox.py --replay     # push them to Qdrant now
+    python 5_Symbols/outbox.py --clear      # drop everything (after a full rebuild)
+
+Usage (as a module):
+    from outbox import Outbox, replay_outbox, pending_writes
+    replay_outbox(client)                            # at the start of every writer
+    engine = IngestEngine(client, model, COLLECTION, outbox=Outbox())
+"""
+
+import os
+import json
+import time
+import sqlite3
+import argparse
+import threading
+
+import numpy as np
+
+from qdrant_connection import connect, QDRANT_HOST, QDRANT_PORT
+
+# ── Configuration ──────────────────────────────────────────────────────────────
+LXC_IP        = QDRANT_HOST   # env QDRANT_HOST / config file, see qdrant_connection.py
+OUTBOX_PATH   = os.environ.get(
+    "QDRANT_OUTBOX",
+    os.path.join(os.path.expanduser("~"), ".cache", "qdrant_secondbrain", "outbox.sqlite"),
+)
+REPLAY_BATCH  = 256    # points per upsert during replay
+DELETE_BATCH  = 1000   # paths per filtered delete during replay
+# ───────────────────────────────────────────────────────────────────────────────
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    seq        INTEGER PRIMARY KEY AUTOINCREMENT,
+    collection TEXT    NOT NULL,
+    op         TEXT    NOT NULL,      -- 'upsert' | 'delete'
+    path       TEXT    NOT NULL,
+    point_id   INTEGER,               -- upserts only
+    vector     BLOB,                  -- float32 bytes, upserts only
+    payload    TEXT,                  -- JSON, upserts only
+    queued     REAL    NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS outbox_point ON outbox (collection, op, point_id);
+CREATE INDEX IF NOT EXISTS outbox_path ON outbox (collection, path);
+"""
+
+
+class Outbox:
+    """
+    SQLite-backed queue of pending upserts and deletes.
+
+    Thread-safe: the ingest engine's uploader thread queues failed batches
+    while the main thread may be queueing deletes.
+
+    Args:
+        path: SQLite file (default: OUTBOX_PATH)
+    """
+
+    def __init__(self, path: str = OUTBOX_PATH):
+        self.path  = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+
+    def close(self):
+        self._db.close()
+
+    # ── Queueing ───────────────────────────────────────────────────────────
+    def add_points(self, collection: str, points):
+        """Queue PointStructs (vectors included) for a later upsert."""
+        now = time.time()
+        rows = [
+            (collection, p.payload["path"], p.id,
+             np.asarray(p.vector, dtype=np.float32).tobytes(),
+             json.dumps(p.payload, ensure_ascii=False), now)
+            for p in points
+        ]
+        with self._lock, self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO outbox (collection, op, path, point_id, vector, payload, queued) "
+                "VALUES (?, 'upsert', ?, ?, ?, ?, ?)", rows)
+
+    def add_deletes(self, collection: str, paths):
+        """Queue path deletes; queued upserts of those paths become moot and are dropped."""
+        paths = list(paths)
+        now = time.time()
+        with self._lock, self._db:
+            self._db.executemany(
+                "DELETE FROM outbox WHERE collection = ? AND path = ?",
+                [(collection, p) for p in paths])
+            self._db.executemany(
+                "INSERT INTO outbox (collection, op, path, queued) VALUES (?, 'delete', ?, ?)",
+                [(collection, p, now) for p in paths])
+
+    def supersede(self, collection: str, paths, before: float = None):
+        """
+        Forget queued writes for paths that were just written to Qdrant directly.
+
+        Args:
+            before: Only forget writes queued before this time.time() — the
+                    writer's own run start, so chunks of the same file that
+                    this run queued after a failed batch are kept
+        """
+        rows = [(collection, p, before if before is not None else float("inf")) for p in set(paths)]
+        with self._lock, self._db:
+            self._db.executemany(
+                "DELETE FROM outbox WHERE collection = ? AND path = ? AND queued < ?", rows)
+
+    def clear(self, collection: str = None):
+        with self._lock, self._db:
+            if collection:
+                self._db.execute("DELETE FROM outbox WHERE collection = ?", (collection,))
+            else:
+                self._db.execute("DELETE FROM outbox")
+
+    # ── Inspection ─────────────────────────────────────────────────────────
+    def pending(self) -> dict[str, dict]:
+        """{collection: {"upserts": n_points, "deletes": n_paths, "files": n_upserted_paths, "oldest": ts}}."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT collection, op, COUNT(*), COUNT(DISTINCT path), MIN(queued) "
+                "FROM outbox GROUP BY collection, op").fetchall()
+        out = {}
+        for collection, op, n, n_paths, oldest in rows:
+            entry = out.setdefault(collection, {"upserts": 0, "deletes": 0, "files": 0, "oldest": oldest})
+            entry["oldest"] = min(entry["oldest"], oldest)
+            if op == "upsert":
+                entry["upserts"], entry["files"] = n, n_paths
+            else:
+                entry["deletes"] = n
+        return out
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+
+    # ── Replay ─────────────────────────────────────────────────────────────
+    def _take(self, seqs: list[int]):
+        with self._lock, self._db:
+            self._db.executemany("DELETE FROM outbox WHERE seq = ?", [(s,) for s in seqs])
+
+    def _replay_deletes(self, client, collection: str) -> int:
+        from ingest_engine import delete_paths
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT seq, path FROM outbox WHERE collection = ? AND op = 'delete' ORDER BY seq",
+                (collection,)).fetchall()
+        if rows and not client.collection_exists(collection):
+            self._take([seq for seq, _ in rows])   # nothing to delete from
+            return 0
+        for i in range(0, len(rows), DELETE_BATCH):
+            chunk = rows[i:i + DELETE_BATCH]
+            delete_paths(client, collection, [path for _, path in chunk])
+            self._take([seq for seq, _ in chunk])
+        return len(rows)
+
+    def _replay_upserts(self, client, collection: str, batch: int) -> int:
+        from qdrant_client.models import PointStruct, FilterSelector
+        from ingest_engine import ensure_collection, stale_chunk_filter
+
+        sent, last_seq, ensured = 0, 0, False
+        while True:
+            with self._lock:
+                rows = self._db.execute(
+                    "SELECT seq, point_id, vector, payload FROM outbox "
+                    "WHERE collection = ? AND op = 'upsert' AND seq > ? ORDER BY seq LIMIT ?",
+                    (collection, last_seq, batch)).fetchall()
+            if not rows:
+                return sent
+            points = [
+                PointStruct(id=pid, vector=np.frombuffer(vec, dtype=np.float32).tolist(),
+                            payload=json.loads(payload))
+                for _, pid, vec, payload in rows
+            ]
+            if not ensured:
+                ensure_collection(client, collection, dim=len(points[0].vector))
+                ensured = True
+            client.upsert(collection_name=collection, points=points, wait=True)
+            # The failed write never got to prune chunks past each file's new chunk count
+            files = [(p.payload["path"], p.payload["chunk_count"]) for p in points
+                     if p.payload.get("chunk_index") == 0 and "chunk_count" in p.payload]
+            if files:
+                client.delete(collection_name=collection,
+                              points_selector=FilterSelector(filter=stale_chunk_filter(files)),
+                              wait=True)
+            self._take([seq for seq, *_ in rows])
+            last_seq = rows[-1][0]
+            sent += len(points)
+
+    def replay(self, client, batch: int = REPLAY_BATCH) -> dict[str, tuple[int, int]]:
+        """
+        Push every pending write to Qdrant.
+
+        Returns:
+            {collection: (points_upserted, paths_deleted)} for collections
+            that had pending writes. Raises on the first failed request;
+            whatever was sent before it is already removed from the queue.
+        """
+        done = {}
+        for collection in self.pending():
+            deleted  = self._replay_deletes(client, collection)
+            upserted = self._replay_upserts(client, collection, batch)
+            done[collection] = (upserted, deleted)
+        return done
+
+
+def pending_writes(path: str = OUTBOX_PATH) -> int:
+    """Number of queued writes (0 when there is no outbox yet) — cheap enough for every run."""
+    if not os.path.exists(path):
+        return 0
+    box = Outbox(path)
+    try:
+        return len(box)
+    finally:
+        box.close()
+
+
+def replay_outbox(client, path: str = OUTBOX_PATH, progress=print) -> dict[str, tuple[int, int]]:
+    """
+    Replay the default outbox if it has pending writes. Best-effort: a
+    failure is reported and left queued for the next writer, never raised.
+
+    Bumps the result-cache generation of every collection it touched.
+    """
+    if not os.path.exists(path):
+        return {}
+    try:
+        box = Outbox(path)
+    except sqlite3.Error as e:
+        if progress:
+            progress(f"  ⚠️  Could not open outbox {path} ({e})")
+        return {}
+    try:
+        if not len(box):
+            return {}
+        done = box.replay(client)
+    except Exception as e:
+        if progress:
+            progress(f"  ⚠️  Outbox replay failed, writes stay queued ({e})")
+        return {}
+    finally:
+        box.close()
+
+    from result_cache import bump_generation
+    for collection, (upserted, deleted) in done.items():
+        if upserted or deleted:
+            bump_generation(client, collection)
+        if progress:
+            progress(f"  ✓ Replayed outbox → {collection}: {upserted} points upserted, {deleted} paths deleted")
+    return done
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect / replay the offline write outbox")
+    parser.add_argument("--path", default=OUTBOX_PATH, help=f"Outbox file (default: {OUTBOX_PATH})")
+    parser.add_argument("--replay", action="store_true", help="Push pending writes to Qdrant now")
+    parser.add_argument("--clear", action="store_true", help="Drop every pending write")
+    parser.add_argument("--host", default=LXC_IP, help=f"Qdrant host (default: {LXC_IP})")
+    parser.add_argument("--port", type=int, default=QDRANT_PORT, help=f"Qdrant port (default: {QDRANT_PORT})")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.path):
+        print(f"  ✓ No outbox at {args.path} — nothing pending")
+        return
+
+    if args.clear:
+        box = Outbox(args.path)
+        n = len(box)
+        box.clear()
+        box.close()
+        print(f"  ✓ Dropped {n} pending write(s)")
+        return
+
+    if args.replay:
+        client = connect("bulk", host=args.host, port=args.port)
+        if not replay_outbox(client, args.path):
+            print("  Nothing replayed")
+        return
+
+    box = Outbox(args.path)
+    pending = box.pending()
+    box.close()
+    if not pending:
+        print("  ✓ Outbox is empty")
+    for collection, p in pending.items():
+        age_h = (time.time() - p["oldest"]) / 3600
+        print(f"  {collection}: {p['files']} file(s) / {p['upserts']} point(s) to upsert, "
+              f"{p['deletes']} path(s) to delete — oldest queued {age_h:.1f}h ago")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,9 +3,24 @@
 Pre-commit hook script: Sync staged .md files to Qdrant on Proxmox.
 
 Called from the git pre-commit hook in the second brain repo.
-Only processes files that are staged (new, modified, or deleted).
+Only processes files that are staged (new, modified, renamed or deleted).
 Non-blocking by default — if Qdrant is unreachable, the commit still proceeds.
 
+What gets embedded is the staged blob, not the working-tree file (they
+differ after a partial `git add -p`). The whole sync is batched, so commits
+touching hundreds of notes (bulk renames, template edits) stay fast:
+
+  1. one `git diff --cached --raw -z` lists every staged change with its blob SHA
+  2. one retrieve compares those SHAs with each file's stored `blob_sha`
+     payload — unchanged blobs (e.g. pure renames back and forth) are skipped
+  3. one `git cat-file --batch` process streams all remaining blobs into a
+     single IngestEngine run (batch encode + bulk upserts)
+  4. one bulk delete removes deleted and renamed-away paths
+
+If Qdrant is unreachable (or a write fails), the staged files are still
+embedded and the points / deletes are parked in the local outbox
+(outbox.py); the next writer that reaches Qdrant replays them.
+
 Usage:
     Invoked automatically by .git/hooks/pre-commit
     Or manually:  python pre_commit_qdrant_sync.py
@@ -13,57 +28,141 @@ Usage:
 
 import os
 import sys
-import hashlib
 import subprocess
+import threading
 
 # ── Configuration ──────────────────────────────────────────────────────────────
-LXC_IP          = "192.168.2.227"
-QDRANT_PORT     = 6333
+# Qdrant host / port / transport: env QDRANT_HOST, … or a config file, see qdrant_connection.py
+QDRANT_TIMEOUT  = 10      # seconds — keep the hook snappy when Qdrant is slow
 COLLECTION      = "mac_repo_index"
 MODEL_NAME      = "all-MiniLM-L6-v2"
 VECTOR_DIM      = 384
-MAX_TEXT_LEN    = 8000
 BLOCK_ON_FAILURE = False  # Set True to abort commit if Qdrant is unreachable
+QUEUE_OFFLINE   = True    # Embed anyway and queue the writes in the outbox when Qdrant is down
 # ───────────────────────────────────────────────────────────────────────────────
 
+
+def _symbols_dir() -> str:
+    """
+    Where the shared modules (embedding cache, …) live.
+
+    The hook is usually copied into .git/hooks, so it can't find them next
+    to itself: use env QDRANT_SYMBOLS_DIR, else 5_Symbols at the top of the
+    repository being committed to.
+    """
+    if os.environ.get("QDRANT_SYMBOLS_DIR"):
+        return os.environ["QDRANT_SYMBOLS_DIR"]
+    try:
+        top = subprocess.run(["git", "rev-parse", "--show-toplevel"],
+                             capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        top = os.getcwd()
+    return os.path.join(top, "5_Symbols")
+
+
+SYMBOLS_DIR = _symbols_dir()
+
+for _d in (os.path.dirname(os.path.abspath(__file__)), SYMBOLS_DIR):
+    if _d not in sys.path:
+        sys.path.append(_d)
+
 PREFIX = "[pre-commit-sync]"
 
 
 def get_staged_files():
-    """Return (added/modified, deleted) lists of staged .md file paths."""
+    """
+    Return (changed, deleted) for staged .md files.
+
+    changed is a list of (path, blob_sha) for added / modified / copied files
+    and rename targets; deleted lists removed paths and rename sources.
+    """
     try:
         result = subprocess.run(
-            ["git", "diff", "--cached", "--name-status"],
-            capture_output=True, text=True, check=True
+            ["git", "diff", "--cached", "--raw", "-z", "-M", "--no-abbrev",
+             "--diff-filter=ACDMRT"],
+            capture_output=True, check=True
         )
-    except subprocess.CalledProcessError:
+    except (OSError, subprocess.CalledProcessError):
         return [], []
 
     changed = []
     deleted = []
 
-    for line in result.stdout.strip().splitlines():
-        parts = line.split("\t", 1)
-        if len(parts) != 2:
-            continue
-        status, filepath = parts[0].strip(), parts[1].strip()
-
-        if not filepath.endswith(".md"):
-            continue
-
-        if status.startswith("D"):
-            deleted.append(filepath)
+    # -z records: ":<old mode> <new mode> <old sha> <new sha> <status>\0<path>\0"
+    # renames / copies carry two paths: "...R097\0<old path>\0<new path>\0"
+    fields = result.stdout.decode("utf-8", errors="surrogateescape").split("\0")
+    i = 0
+    while i < len(fields) and fields[i].startswith(":"):
+        _, new_mode, _, new_sha, status = fields[i][1:].split(" ")
+        if status[0] in "RC":
+            old_path, new_path = fields[i + 1], fields[i + 2]
+            i += 3
         else:
-            # A (added), M (modified), R (renamed), C (copied)
-            changed.append(filepath)
+            old_path = new_path = fields[i + 1]
+            i += 2
+
+        if status[0] == "R" and old_path.endswith(".md"):
+            deleted.append(old_path)
+        if status[0] == "D":
+            if old_path.endswith(".md"):
+                deleted.append(old_path)
+        elif new_path.endswith(".md") and new_mode.startswith("100"):
+            # regular files only — symlinks (120000) and submodules (160000) have no note text
+            changed.append((new_path, new_sha))
 
     return changed, deleted
 
 
-def file_id(path: str) -> int:
-    """Deterministic ID matching ingest.py — MD5 of full path mod 10^12."""
-    full_path = os.path.join(os.getcwd(), path)
-    return int(hashlib.md5(full_path.encode()).hexdigest(), 16) % (10**12)
+def read_blobs(shas, missing: list = None):
+    """
+    Yield (sha, bytes) for every blob, read through a single `git cat-file --batch`.
+
+    The SHAs are written from a helper thread so a large batch can't deadlock
+    on a full stdout pipe. Blobs git can't find are logged and appended to
+    missing, so the caller can count them as errors.
+    """
+    proc = subprocess.Popen(["git", "cat-file", "--batch"],
+                            stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+
+    def write_requests():
+        try:
+            proc.stdin.write("".join(f"{sha}\n" for sha in shas).encode())
+        finally:
+            proc.stdin.close()
+
+    writer = threading.Thread(target=write_requests, daemon=True)
+    writer.start()
+    try:
+        for sha in shas:
+            # "<sha> blob <size>\n<content>\n"  or  "<sha> missing\n"
+            header = proc.stdout.readline().split()
+            if len(header) != 3:
+                print(f"  {PREFIX} ⚠️  Blob {sha} unreadable: {b' '.join(header[1:]).decode() or 'no output'}")
+                if missing is not None:
+                    missing.append(sha)
+                continue
+            data = proc.stdout.read(int(header[2]))
+            proc.stdout.read(1)
+            yield sha, data
+    finally:
+        writer.join()
+        proc.stdout.close()
+        proc.wait()
+
+
+def stored_blob_shas(client, paths) -> dict:
+    """Map path → blob_sha stored on each file's chunk-0 point (one retrieve)."""
+    from ingest_engine import file_id
+    try:
+        points = client.retrieve(
+            collection_name=COLLECTION,
+            ids=[file_id(p) for p in paths],
+            with_payload=["path", "blob_sha"],
+            with_vectors=False,
+        )
+    except Exception:
+        return {}   # lookup is an optimisation only — re-embed everything
+    return {(pt.payload or {}).get("path"): (pt.payload or {}).get("blob_sha") for pt in points}
 
 
 def main():
@@ -75,82 +174,117 @@ def main():
 
     # ── Import heavy deps only when needed ─────────────────────────────────
     try:
-        from qdrant_client import QdrantClient
-        from qdrant_client.models import PointStruct
-        from sentence_transformers import SentenceTransformer
+        from qdrant_connection import connect, QDRANT_HOST, QDRANT_PORT
+        from ingest_engine import IngestEngine, delete_paths
+        from result_cache import bump_generation
+        from outbox import Outbox, replay_outbox
     except ImportError as e:
         print(f"  {PREFIX} ⚠️  Missing dependency: {e}")
         print(f"  {PREFIX} Run: pip install qdrant-client sentence-transformers")
+        print(f"  {PREFIX} (shared modules are loaded from SYMBOLS_DIR={SYMBOLS_DIR})")
         return 1 if BLOCK_ON_FAILURE else 0
 
     # ── Connect to Qdrant ──────────────────────────────────────────────────
     try:
-        client = QdrantClient(host=LXC_IP, port=QDRANT_PORT, timeout=10)
+        client = connect("write", timeout=QDRANT_TIMEOUT)
         client.get_collections()  # quick connectivity test
     except Exception as e:
-        print(f"  {PREFIX} ⚠️  Qdrant unreachable at {LXC_IP}:{QDRANT_PORT} — {e}")
+        client = None
+        print(f"  {PREFIX} ⚠️  Qdrant unreachable at {QDRANT_HOST}:{QDRANT_PORT} — {e}")
         if BLOCK_ON_FAILURE:
             print(f"  {PREFIX} ❌ Aborting commit (BLOCK_ON_FAILURE=True)")
             return 1
-        print(f"  {PREFIX} Skipping sync (commit will proceed)")
-        return 0
+        if not QUEUE_OFFLINE:
+            print(f"  {PREFIX} Skipping sync (commit will proceed)")
+            return 0
+        print(f"  {PREFIX} Queuing changes in the outbox (replayed on the next successful sync)")
+    else:
+        replay_outbox(client)   # writes parked by earlier offline / failed runs go first
+
+    try:
+        outbox = Outbox()
+    except Exception as e:
+        print(f"  {PREFIX} ⚠️  Outbox unavailable ({e})")
+        if client is None:
+            print(f"  {PREFIX} Skipping sync (commit will proceed)")
+            return 0
+        outbox = None
 
     # ── Handle changed/new files ───────────────────────────────────────────
-    synced, errors = 0, 0
+    synced, unchanged, queued, errors = 0, 0, 0, 0
+    root = os.getcwd()
 
     if changed:
         print(f"  {PREFIX} {len(changed)} staged .md file(s) to process")
 
-        # Load model once
-        model = SentenceTransformer(MODEL_NAME)
-
-        for filepath in changed:
-            try:
-                full_path = os.path.join(os.getcwd(), filepath)
-                with open(full_path, "r", encoding="utf-8", errors="ignore") as f:
-                    text = f.read()
-
-                if not text.strip():
-                    continue
-
-                vector = model.encode(text[:MAX_TEXT_LEN]).tolist()
-                pid = file_id(filepath)
-
-                client.upsert(
-                    collection_name=COLLECTION,
-                    points=[PointStruct(
-                        id=pid,
-                        vector=vector,
-                        payload={
-                            "filename": os.path.basename(filepath),
-                            "path": full_path,
-                        }
-                    )]
-                )
-                synced += 1
-                print(f"  ✓ {filepath}")
-
-            except Exception as e:
-                errors += 1
-                print(f"  ✗ {filepath}: {e}")
-
-    # ── Handle deleted files ───────────────────────────────────────────────
+        # Skip blobs Qdrant already holds (same path, same staged content)
+        known = stored_blob_shas(client, [os.path.join(root, f) for f, _ in changed]) if client else {}
+        fresh = []
+        for filepath, sha in changed:
+            if known.get(os.path.join(root, filepath)) == sha:
+                unchanged += 1
+                print(f"  = {filepath} (unchanged)")
+            else:
+                fresh.append((filepath, sha))
+
+        if fresh:
+            # Load model once — through the shared embedding cache
+            from embedding_cache import load_encoder
+            model = load_encoder(MODEL_NAME, dim=VECTOR_DIM)
+
+            # Stream every staged blob through one chunk → batch-encode → bulk-upsert run
+            by_sha = {}
+            for filepath, sha in fresh:
+                by_sha.setdefault(sha, []).append(filepath)
+            missing = []
+            docs = (
+                (os.path.join(root, filepath), data, {"blob_sha": sha})
+                for sha, data in read_blobs(list(by_sha), missing)
+                for filepath in by_sha[sha]
+            )
+            engine = IngestEngine(client, model, COLLECTION, progress_every=0, outbox=outbox)
+            stats  = engine.ingest_documents(docs)
+            synced = stats.files
+            queued = stats.queued
+            failed = set(stats.failed_paths)
+            failed.update(os.path.join(root, f) for sha in missing for f in by_sha[sha])
+            errors += stats.errors + sum(len(by_sha[sha]) for sha in missing)
+
+            for filepath, _ in fresh:
+                print(f"  {'✗' if os.path.join(root, filepath) in failed else '✓'} {filepath}")
+
+    # ── Handle deleted / renamed-away files (one bulk delete) ──────────────
+    removed = 0
     if deleted:
-        print(f"  {PREFIX} {len(deleted)} deleted .md file(s) to remove from Qdrant")
-
-        for filepath in deleted:
-            try:
-                pid = file_id(filepath)
-                client.delete(
-                    collection_name=COLLECTION,
-                    points_selector=[pid],
-                )
+        print(f"  {PREFIX} {len(deleted)} deleted or renamed .md file(s) to remove from Qdrant")
+        paths = [os.path.join(root, f) for f in deleted]
+
+        try:
+            if client is None:
+                raise ConnectionError("Qdrant offline")
+            delete_paths(client, COLLECTION, paths)
+            if outbox is not None:
+                outbox.supersede(COLLECTION, paths)
+            removed = len(deleted)
+            for filepath in deleted:
                 print(f"  ✗ {filepath} (deleted from Qdrant)")
-            except Exception as e:
+        except Exception as e:
+            try:
+                outbox.add_deletes(COLLECTION, paths)
+                queued += len(deleted)
+                print(f"  ⧗ delete of {len(deleted)} file(s) queued in the outbox ({e})")
+            except Exception:
                 errors += 1
-                print(f"  ✗ {filepath} delete failed: {e}")
+                print(f"  ✗ delete of {len(deleted)} file(s) failed: {e}")
+
+    # Invalidate the search server's result cache
+    if client is not None and (synced or removed):
+        bump_generation(client, COLLECTION)
+    if outbox is not None:
+        outbox.close()
 
-    print(f"  {PREFIX} Done: {synced} synced, {len(deleted)} deleted, {errors} errors")
+    print(f"  {PREFIX} Done: {synced} synced, {unchanged} unchanged, "
+          f"{removed} deleted, {queued} queued, {errors} errors")
 
     if errors > 0 and BLOCK_ON_FAILURE:
         return 1
@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""
+Shared Qdrant connection factory for every script in 5_Symbols.
+
+Each entry point used to build its own QdrantClient(host=LXC_IP, port=6333)
+over REST, with timeouts anywhere from none to 60 s and no retries. Now they
+all call connect(purpose), which
+
+    • reads host / ports / transport from env or a config file instead of
+      hard-coded IPs (see load_config)
+    • can talk gRPC (prefer_grpc) — protobuf vectors instead of JSON-encoded
+      floats, worth it for bulk upserts
+    • hands out one shared client per (purpose, settings) per process, so the
+      HTTP keep-alive pool / gRPC channel is reused instead of reconnecting
+    • retries idempotent writes (upsert, delete, payload / vector updates —
+      all keyed by explicit point IDs) on transient failures with jittered
+      exponential backoff
+    • records per-call latency, errors and retries (call_stats())
+
+Purposes set the default timeout: "search" (interactive, fail fast),
+"write" (hook / sync), "bulk" (full ingest, restore, admin).
+
+Config, lowest to highest precedence:
+    1. DEFAULTS below
+    2. JSON file at QDRANT_CONFIG (default ~/.config/qdrant_secondbrain/qdrant.json),
+       same keys as DEFAULTS, e.g. {"host": "10.0.0.5", "prefer_grpc": true,
+       "timeouts": {"bulk": 120}}
+    3. Env: QDRANT_HOST, QDRANT_PORT, QDRANT_GRPC_PORT, QDRANT_PREFER_GRPC,
+       QDRANT_API_KEY, QDRANT_HTTPS, QDRANT_TIMEOUT (all purposes), QDRANT_RETRIES,
+       QDRANT_POOL_SIZE
+
+CLI:
+    python 5_Symbols/qdrant_connection.py            # resolved config + round-trip latency
+    python 5_Symbols/qdrant_connection.py --grpc     # same over gRPC
+
+Usage (as a module):
+    from qdrant_connection import connect, QDRANT_HOST, QDRANT_PORT
+    client = connect("write")
+    client.upsert(...)                     # retried on 502/503/timeouts
+    print(call_stats()["upsert"]["p95_ms"])
+"""
+
+import os
+import json
+import time
+import random
+import argparse
+import threading
+from collections import deque
+
+# ── Configuration ──────────────────────────────────────────────────────────────
+CONFIG_FILE   = os.environ.get(
+    "QDRANT_CONFIG",
+    os.path.join(os.path.expanduser("~"), ".config", "qdrant_secondbrain", "qdrant.json"),
+)
+DEFAULTS = {
+    "host":        "192.168.2.227",
+    "port":        6333,
+    "grpc_port":   6334,
+    "prefer_grpc": False,
+    "api_key":     None,
+    "https":       False,
+    "pool_size":   None,     # HTTP keep-alive connections (None: qdrant-client default)
+    "retries":     3,        # extra attempts for idempotent writes
+    "backoff":     0.25,     # seconds; attempt n sleeps uniform(0, backoff · 2^n)
+    "timeouts":    {"search": 10, "write": 15, "bulk": 60},
+}
+LATENCY_WINDOW = 512   # recent calls kept per method for percentiles
+# ───────────────────────────────────────────────────────────────────────────────
+
+# Writes keyed by explicit point IDs / filters — repeating one is harmless
+RETRY_METHODS = frozenset({
+    "upsert", "delete", "set_payload", "overwrite_payload", "delete_payload",
+    "clear_payload", "update_vectors", "delete_vectors", "batch_update_points",
+})
+
+_ENV = {
+    "host":        ("QDRANT_HOST", str),
+    "port":        ("QDRANT_PORT", int),
+    "grpc_port":   ("QDRANT_GRPC_PORT", int),
+    "prefer_grpc": ("QDRANT_PREFER_GRPC", lambda v: v.lower() in ("1", "true", "yes")),
+    "api_key":     ("QDRANT_API_KEY", str),
+    "https":       ("QDRANT_HTTPS", lambda v: v.lower() in ("1", "true", "yes")),
+    "retries":     ("QDRANT_RETRIES", int),
+    "pool_size":   ("QDRANT_POOL_SIZE", int),
+}
+
+
+def load_config(path: str = CONFIG_FILE) -> dict:
+    """DEFAULTS, overlaid with the JSON config file (if any), overlaid with env vars."""
+    config = {**DEFAULTS, "timeouts": dict(DEFAULTS["timeouts"])}
+    if path and os.path.exists(path):
+        with open(path, "r") as f:
+            data = json.load(f)
+        config["timeouts"].update(data.pop("timeouts", {}))
+        config.update(data)
+    for key, (var, cast) in _ENV.items():
+        if os.environ.get(var):
+            config[key] = cast(os.environ[var])
+    if os.environ.get("QDRANT_TIMEOUT"):
+        config["timeouts"] = {p: int(os.environ["QDRANT_TIMEOUT"]) for p in config["timeouts"]}
+    return config
+
+
+CONFIG      = load_config()
+QDRANT_HOST = CONFIG["host"]
+QDRANT_PORT = CONFIG["port"]
+
+_clients = {}
+_lock    = threading.Lock()
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+#  CALL STATISTICS
+# ═══════════════════════════════════════════════════════════════════════════════
+
+class CallStats:
+    """Per-method call counts, errors, retries and recent latencies (thread-safe)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_method = {}
+
+    def record(self, method: str, ms: float, error: bool = False, retries: int = 0):
+        with self._lock:
+            entry = self._by_method.get(method)
+            if entry is None:
+                entry = self._by_method[method] = {"calls": 0, "errors": 0, "retries": 0,
+                                                   "total_ms": 0.0, "max_ms": 0.0,
+                                                   "recent": deque(maxlen=LATENCY_WINDOW)}
+            entry["calls"]    += 1
+            entry["errors"]   += int(error)
+            entry["retries"]  += retries
+            entry["total_ms"] += ms
+            entry["max_ms"]    = max(entry["max_ms"], ms)
+            entry["recent"].append(ms)
+
+    def snapshot(self) -> dict:
+        """{method: {"calls", "errors", "retries", "mean_ms", "p50_ms", "p95_ms", "max_ms"}}."""
+        out = {}
+        with self._lock:
+            for method, e in sorted(self._by_method.items()):
+                recent = sorted(e["recent"])
+                out[method] = {
+                    "calls":   e["calls"],
+                    "errors":  e["errors"],
+                    "retries": e["retries"],
+                    "mean_ms": round(e["total_ms"] / e["calls"], 2),
+                    "p50_ms":  round(recent[len(recent) // 2], 2),
+                    "p95_ms":  round(recent[min(len(recent) - 1, int(len(recent) * 0.95))], 2),
+                    "max_ms":  round(e["max_ms"], 2),
+                }
+        return out
+
+
+STATS = CallStats()
+
+
+def call_stats() -> dict:
+    """Latency / error / retry summary of every Qdrant call made through connect()."""
+    return STATS.snapshot()
+
+
+def is_transient(exc: Exception) -> bool:
+    """Errors worth retrying: timeouts, refused / reset connections, 429 and 5xx gateways."""
+    from qdrant_client.http.exceptions import UnexpectedResponse, ResponseHandlingException
+    if isinstance(exc, UnexpectedResponse):
+        return exc.status_code in (429, 500, 502, 503, 504)
+    if isinstance(exc, (ResponseHandlingException, ConnectionError, TimeoutError)):
+        return True
+    try:
+        import httpx
+        if isinstance(exc, httpx.TransportError):
+            return True
+    except ImportError:
+        pass
+    try:
+        import grpc
+        if isinstance(exc, grpc.RpcError):
+            return exc.code() in (grpc.StatusCode.UNAVAILABLE, grpc.StatusCode.DEADLINE_EXCEEDED,
+                                  grpc.StatusCode.RESOURCE_EXHAUSTED)
+    except ImportError:
+        pass
+    return False
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+#  MANAGED CLIENTS
+# ═══════════════════════════════════════════════════════════════════════════════
+
+class ManagedClient:
+    """
+    Wraps a QdrantClient: every method call is timed into STATS, and the
+    idempotent writes in RETRY_METHODS are retried on transient errors.
+    Attribute access is passed through, so it drops in for QdrantClient.
+    """
+
+    def __init__(self, client, retries: int, backoff: float):
+        self._client  = client
+        self._retries = retries
+        self._backoff = backoff
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if not callable(attr) or name.startswith("_"):
+            return attr
+        retries = self._retries if name in RETRY_METHODS else 0
+        backoff = self._backoff
+
+        def call(*args, **kwargs):
+            attempt = 0
+            t0 = time.perf_counter()
+            while True:
+                try:
+                    result = attr(*args, **kwargs)
+                except Exception as e:
+                    if attempt < retries and is_transient(e):
+                        time.sleep(random.uniform(0, backoff * (2 ** attempt)))
+                        attempt += 1
+                        continue
+                    STATS.record(name, (time.perf_counter() - t0) * 1000, error=True, retries=attempt)
+                    raise
+                STATS.record(name, (time.perf_counter() - t0) * 1000, retries=attempt)
+                return result
+
+        call.__name__ = name
+        return call
+
+
+class ManagedAsyncClient(ManagedClient):
+    """ManagedClient for AsyncQdrantClient — coroutine methods, asyncio.sleep backoff."""
+
+    def __getattr__(self, name):
+        import asyncio
+
+        attr = getattr(self._client, name)
+        if not callable(attr) or name.startswith("_"):
+            return attr
+        retries = self._retries if name in RETRY_METHODS else 0
+        backoff = self._backoff
+
+        async def call(*args, **kwargs):
+            attempt = 0
+            t0 = time.perf_counter()
+            while True:
+                try:
+                    result = await attr(*args, **kwargs)
+                except Exception as e:
+                    if attempt < retries and is_transient(e):
+                        await asyncio.sleep(random.uniform(0, backoff * (2 ** attempt)))
+                        attempt += 1
+                        continue
+                    STATS.record(name, (time.perf_counter() - t0) * 1000, error=True, retries=attempt)
+                    raise
+                STATS.record(name, (time.perf_counter() - t0) * 1000, retries=attempt)
+                return result
+
+        call.__name__ = name
+        return call
+
+
+def _settings(purpose: str, host, port, timeout, prefer_grpc) -> dict:
+    config = CONFIG
+    return {
+        "host":        host or config["host"],
+        "port":        port or config["port"],
+        "grpc_port":   config["grpc_port"],
+        "prefer_grpc": config["prefer_grpc"] if prefer_grpc is None else prefer_grpc,
+        "https":       config["https"],
+        "api_key":     config["api_key"],
+        "timeout":     timeout if timeout is not None else config["timeouts"].get(purpose, 15),
+        "pool_size":   config["pool_size"],
+    }
+
+
+def connect(purpose: str = "write", host: str = None, port: int = None, timeout: int = None,
+            prefer_grpc: bool = None, shared: bool = True) -> ManagedClient:
+    """
+    A configured QdrantClient (wrapped in ManagedClient).
+
+    Args:
+        purpose:     "search", "write" or "bulk" — picks the default timeout
+        host, port:  Override the configured REST endpoint
+        timeout:     Override the purpose's timeout (seconds)
+        prefer_grpc: Override the configured transport
+        shared:      Reuse one client per settings in this process (keep-alive);
+                     False for a private one (e.g. after fork)
+    """
+    from qdrant_client import QdrantClient
+
+    settings = _settings(purpose, host, port, timeout, prefer_grpc)
+    key = ("sync",) + tuple(sorted(settings.items()))
+    with _lock:
+        if shared and key in _clients:
+            return _clients[key]
+        kwargs = {k: v for k, v in settings.items() if v is not None}
+        client = ManagedClient(QdrantClient(check_compatibility=False, **kwargs),
+                               CONFIG["retries"], CONFIG["backoff"])
+        if shared:
+            _clients[key] = client
+    return client
+
+
+def connect_async(purpose: str = "search", host: str = None, port: int = None, timeout: int = None,
+                  prefer_grpc: bool = None) -> ManagedAsyncClient:
+    """AsyncQdrantClient counterpart of connect() — create it inside the event loop that uses it."""
+    from qdrant_client import AsyncQdrantClient
+
+    settings = _settings(purpose, host, port, timeout, prefer_grpc)
+    kwargs = {k: v for k, v in settings.items() if v is not None}
+    return ManagedAsyncClient(AsyncQdrantClient(check_compatibility=False, **kwargs),
+                              CONFIG["retries"], CONFIG["backoff"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show the resolved Qdrant connection config and probe it")
+    parser.add_argument("--grpc", action="store_true", help="Probe over gRPC")
+    parser.add_argument("--calls", type=int, default=20, help="Round trips to time (default: 20)")
+    args = parser.parse_args()
+
+    shown = {k: ("***" if k == "api_key" and v else v) for k, v in CONFIG.items()}
+    print(f"  Config file: {CONFIG_FILE} ({'found' if os.path.exists(CONFIG_FILE) else 'not found'})")
+    print(f"  Resolved:    {json.dumps(shown)}")
+
+    client = connect("search", prefer_grpc=args.grpc or None)
+    transport = "gRPC" if (args.grpc or CONFIG["prefer_grpc"]) else "REST"
+    try:
+        for _ in range(args.calls):
+            client.get_collections()
+    except Exception as e:
+        print(f"  ✗ {QDRANT_HOST} unreachable over {transport}: {e}")
+        return
+    s = call_stats()["get_collections"]
+    print(f"  ✓ {transport} round trip: p50 {s['p50_ms']} ms, p95 {s['p95_ms']} ms, max {s['max_ms']} ms "
+          f"over {s['calls']} calls")
+
+
+if __name__ == "__main__":
+    main()
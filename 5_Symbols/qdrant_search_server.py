@@ -9,80 +9,431 @@ Runs on http://localhost:8111 — used by:
 
 Endpoints:
   POST /search   {"query": "...", "limit": 10}  →  JSON results
-  GET  /health                                   →  {"status": "ok"}
+  POST /search/batch  {"queries": [{"query": "...", "limit": 5, "filter": {...}}, ...]}
+                                                 →  [{"query": "...", "results": [...]}, ...]
+  GET  /health                                   →  {"status": "ok", "query_cache": {...}, "result_cache": {...}, ...}
   GET  /                                         →  Redirects to search.html
 
+When Qdrant fails its health check, searches are answered from the offline
+local copy of the collection (see local_index.py), refreshed in the background.
+
 Start:
   cd /Users/rifaterdemsahin/projects/qdrant
   source venv/bin/activate
-  python 5_Symbols/qdrant_search_server.py
+  python 5_Symbols/qdrant_search_server.py            # classic threaded HTTPServer
+  python 5_Symbols/qdrant_search_server.py --async    # asyncio, HTTP/1.1 keep-alive, concurrent
 """
 
 import os
 import json
 import hashlib
-from http.server import HTTPServer, SimpleHTTPRequestHandler
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
 from urllib.parse import urlparse
 
+from qdrant_connection import connect, call_stats, QDRANT_HOST, QDRANT_PORT
+from search_tuning import tuned_search_params, params_version
+
 # ── Configuration ──────────────────────────────────────────────────────────────
 HOST            = "0.0.0.0"
 PORT            = 8111
-LXC_IP          = "192.168.2.227"
-QDRANT_PORT     = 6333
+LXC_IP          = QDRANT_HOST   # env QDRANT_HOST / config file, see qdrant_connection.py
 COLLECTION      = "mac_repo_index"
 MODEL_NAME      = "all-MiniLM-L6-v2"
 MAX_TEXT_LEN    = 8000
+QUERY_CACHE_PERSIST = True   # keep query vectors across restarts (see embedding_cache)
+BATCH_WINDOW_MS = 3          # micro-batch window for concurrent query encodes
+MAX_ENCODE_BATCH = 32        # max queries per batched forward pass
+MAX_BATCH_QUERIES = 64       # queries accepted by one /search/batch call
+BATCH_OVERFETCH = 4          # chunk hits fetched per wanted note in /search/batch
+LOCAL_FALLBACK  = True       # search the offline local index when Qdrant is unreachable
 PROJECT_ROOT    = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 # ───────────────────────────────────────────────────────────────────────────────
 
 # Lazy-loaded globals
 _client = None
 _model  = None
+_query_cache = None
+_batcher = None
+_result_cache = None
+_generations = None
+_health = None
+_init_lock = threading.Lock()   # ThreadingHTTPServer: build each global once
 
 
 def get_client():
     global _client
     if _client is None:
-        from qdrant_client import QdrantClient
-        _client = QdrantClient(host=LXC_IP, port=QDRANT_PORT, timeout=10)
+        _client = connect("search", host=LXC_IP, port=QDRANT_PORT)
     return _client
 
 
 def get_model():
     global _model
-    if _model is None:
-        from sentence_transformers import SentenceTransformer
-        print(f"  Loading model {MODEL_NAME}...")
-        _model = SentenceTransformer(MODEL_NAME)
-        print("  Model ready")
+    with _init_lock:
+        if _model is None:
+            import embedding_backend
+            print(f"  Loading model {MODEL_NAME} ({embedding_backend.EMBED_BACKEND})...")
+            _model = embedding_backend.load_model(MODEL_NAME)
+            print("  Model ready")
     return _model
 
 
+def get_query_cache():
+    global _query_cache
+    with _init_lock:
+        if _query_cache is None:
+            from embedding_cache import load_query_cache
+            _query_cache = load_query_cache(MODEL_NAME, persist=QUERY_CACHE_PERSIST)
+    return _query_cache
+
+
+def get_batcher():
+    """Micro-batcher that folds concurrent cache-miss encodes into one forward pass."""
+    global _batcher
+    with _init_lock:
+        if _batcher is None:
+            from micro_batcher import MicroBatcher
+            _batcher = MicroBatcher(
+                lambda texts: get_model().encode(texts, batch_size=len(texts), show_progress_bar=False),
+                window_ms=BATCH_WINDOW_MS,
+                max_batch=MAX_ENCODE_BATCH,
+            )
+    return _batcher
+
+
+def get_result_cache():
+    global _result_cache, _generations
+    with _init_lock:
+        if _result_cache is None:
+            from result_cache import ResultCache, GenerationWatcher
+            _result_cache = ResultCache()
+            _generations  = GenerationWatcher(get_client)
+    return _result_cache
+
+
+def result_token(collection: str):
+    """
+    Generation token for collection — take it before querying so a racing write invalidates.
+
+    Includes the tuned search params file's mtime, so a search_tuning.py
+    --save invalidates results fetched with the old params.
+    """
+    get_result_cache()
+    return _generations.token(collection), params_version()
+
+
+def warm_result_cache():
+    """Create the result cache and read COLLECTION's generation once, so the first hits count."""
+    get_result_cache()
+    _generations.prime([COLLECTION])
+
+
+def get_health():
+    global _health
+    with _init_lock:
+        if _health is None:
+            from local_index import QdrantHealth
+            _health = QdrantHealth(LXC_IP, QDRANT_PORT)
+    return _health
+
+
+def local_search(vector, limit: int, collection: str, where: dict = None) -> list[dict]:
+    """Answer from the offline local index — used while Qdrant is unreachable."""
+    from local_index import load_local_index
+    index = load_local_index(collection)
+    if index is None:
+        raise ConnectionError(f"Qdrant unreachable at {LXC_IP}:{QDRANT_PORT} and no local index for {collection}")
+    return index.search(vector, limit, where)
+
+
+def embed_query(query: str):
+    """Query vector via the LRU cache — repeated queries skip the model, misses are micro-batched."""
+    return get_query_cache().get_or_encode(query[:MAX_TEXT_LEN], get_batcher().encode)
+
+
+def submit_queries(queries: list[str]):
+    """
+    Start encoding several queries at once.
+
+    Returns (vectors, pending): vectors holds cached vectors and None for
+    misses; pending maps each distinct missed text to a Future from the
+    micro-batcher, so all misses share one forward pass.
+    """
+    cache = get_query_cache()
+    texts = [q[:MAX_TEXT_LEN] for q in queries]
+    vectors = [cache.get(t) for t in texts]
+    pending = {}
+    for t, v in zip(texts, vectors):
+        if v is None and t not in pending:
+            pending[t] = get_batcher().submit(t)
+    return texts, vectors, pending
+
+
+def fill_vectors(texts, vectors, encoded: dict):
+    """Merge freshly encoded vectors (text → vector) into the list and the query cache."""
+    cache = get_query_cache()
+    for t, vec in encoded.items():
+        encoded[t] = cache.put(t, vec)
+    return [v if v is not None else encoded[t] for t, v in zip(texts, vectors)]
+
+
+def embed_queries(queries: list[str]):
+    """Vectors for several queries — cache hits are free, misses are encoded together."""
+    texts, vectors, pending = submit_queries(queries)
+    return fill_vectors(texts, vectors, {t: f.result() for t, f in pending.items()})
+
+
 def do_search(query: str, limit: int = 10, collection: str = COLLECTION):
-    """Embed the query and search Qdrant.  Returns a list of result dicts."""
-    model  = get_model()
-    client = get_client()
+    """
+    Embed the query and search Qdrant.  Returns a list of result dicts.
+
+    Notes are stored as several chunk points, so results are grouped by
+    `path` — each note comes back once, represented by its best chunk.
+    Results are served from memory until a writer bumps the collection's
+    generation (see result_cache). While Qdrant is unreachable, results
+    come from the offline local index and are not cached.
+    """
+    vector = embed_query(query)
+    if LOCAL_FALLBACK and not get_health().ok():
+        return local_search(vector, limit, collection)
+
+    cache = get_result_cache()
+    key   = cache.key(vector, limit, collection)
+    token = result_token(collection)
+    results = cache.get(key, token)
+    if results is None:
+        try:
+            groups = get_client().query_points_groups(**group_query(vector.tolist(), limit, collection)).groups
+        except Exception:
+            if not LOCAL_FALLBACK or get_health().check():
+                raise
+            return local_search(vector, limit, collection)
+        results = format_groups(groups)
+        cache.put(key, token, results)
+    return results
 
-    vector = model.encode(query[:MAX_TEXT_LEN]).tolist()
 
-    hits = client.search(
+def group_query(vector, limit: int, collection: str, query_filter=None) -> dict:
+    """Keyword arguments for query_points_groups — shared by the sync and async servers."""
+    return dict(
         collection_name=collection,
-        query_vector=vector,
+        query=vector,
+        query_filter=query_filter,
+        group_by="path",
         limit=limit,
+        group_size=1,
         with_payload=True,
+        search_params=tuned_search_params(collection),   # see search_tuning.py
     )
 
-    results = []
-    for hit in hits:
-        payload = hit.payload or {}
-        results.append({
-            "id":       hit.id,
-            "score":    round(hit.score, 4),
-            "filename": payload.get("filename", ""),
-            "path":     payload.get("path", ""),
-            "text":     payload.get("text", payload.get("content", "")),
-        })
-    return results
+
+def format_hit(hit) -> dict:
+    """One scored chunk as the JSON result dict the UI expects."""
+    payload = hit.payload or {}
+    return {
+        "id":       hit.id,
+        "score":    round(hit.score, 4),
+        "filename": payload.get("filename", ""),
+        "path":     payload.get("path", ""),
+        "heading":  payload.get("heading", ""),
+        "start":    payload.get("start"),
+        "end":      payload.get("end"),
+        "text":     payload.get("text", payload.get("content", "")),
+    }
+
+
+def format_groups(groups) -> list[dict]:
+    """Turn path-grouped chunk hits into the JSON result dicts the UI expects."""
+    return [format_hit(group.hits[0]) for group in groups]
+
+
+# ── Batch search ───────────────────────────────────────────────────────────────
+
+def build_filter(spec):
+    """
+    Turn a JSON filter like {"filename": "docker.md", "path": ["a.md", "b.md"]}
+    into a Qdrant Filter — scalar values must match exactly, lists match any.
+    """
+    if not spec:
+        return None
+    if not isinstance(spec, dict):
+        raise ValueError("filter must be an object of field → value(s)")
+    from qdrant_client.models import Filter, FieldCondition, MatchValue, MatchAny
+    must = []
+    for key, value in spec.items():
+        if isinstance(value, list):
+            must.append(FieldCondition(key=key, match=MatchAny(any=value)))
+        else:
+            must.append(FieldCondition(key=key, match=MatchValue(value=value)))
+    return Filter(must=must)
+
+
+def _batch_limit(value) -> int:
+    """A /search/batch limit clamped to 1..100; ValueError if it isn't a number."""
+    try:
+        return max(1, min(int(value), 100))
+    except (TypeError, ValueError):
+        raise ValueError(f"limit must be an integer, got {value!r}") from None
+
+
+def parse_search(body: dict):
+    """
+    Validate a /search body.
+
+    Returns (query, limit, collection); raises ValueError on bad input.
+    """
+    if not isinstance(body, dict):
+        raise ValueError("body must be a JSON object")
+    query = body.get("query", "")
+    if not isinstance(query, str) or not query.strip():
+        raise ValueError("query is required")
+    limit = min(int(body.get("limit", 10)), 100)
+    return query.strip(), limit, body.get("collection", COLLECTION)
+
+
+def parse_batch(body: dict):
+    """
+    Validate a /search/batch body.
+
+    Each entry in "queries" is either a string or {"query", "limit", "filter"}.
+    Returns (queries, limits, filters, collection) with filters as the raw
+    JSON specs; raises ValueError on bad input.
+    """
+    if not isinstance(body, dict):
+        raise ValueError("body must be a JSON object")
+    entries = body.get("queries")
+    if not isinstance(entries, list) or not entries:
+        raise ValueError("queries must be a non-empty list")
+    if len(entries) > MAX_BATCH_QUERIES:
+        raise ValueError(f"at most {MAX_BATCH_QUERIES} queries per batch")
+
+    default_limit = _batch_limit(body.get("limit", 10))
+    queries, limits, filters = [], [], []
+    for entry in entries:
+        if isinstance(entry, str):
+            entry = {"query": entry}
+        if not isinstance(entry, dict):
+            raise ValueError("every query must be a string or an object")
+        query = str(entry.get("query", "")).strip()
+        if not query:
+            raise ValueError("every query needs non-empty text")
+        queries.append(query)
+        limits.append(_batch_limit(entry.get("limit", default_limit)))
+        spec = entry.get("filter") or None
+        if spec is not None and not isinstance(spec, dict):
+            raise ValueError("filter must be an object of field → value(s)")
+        filters.append(spec)
+    return queries, limits, filters, body.get("collection", COLLECTION)
+
+
+def batch_requests(vectors, limits, filters, collection: str = COLLECTION) -> list:
+    """
+    QueryRequests for query_batch_points.
+
+    The batch API has no group_by, so each query over-fetches chunk hits
+    and batch_results() keeps the best chunk per note; short_results()
+    finds the queries whose over-fetch held too few distinct notes.
+    """
+    from qdrant_client.models import QueryRequest
+    params = tuned_search_params(collection)
+    return [
+        QueryRequest(query=vec.tolist(), filter=build_filter(spec), limit=limit * BATCH_OVERFETCH,
+                     with_payload=True, params=params)
+        for vec, limit, spec in zip(vectors, limits, filters)
+    ]
+
+
+def batch_results(queries, limits, responses) -> list[dict]:
+    """Dedupe each response by path and pair it with its query."""
+    out = []
+    for query, limit, resp in zip(queries, limits, responses):
+        seen, results = set(), []
+        for hit in resp.points:
+            path = (hit.payload or {}).get("path")
+            if path in seen:
+                continue
+            seen.add(path)
+            results.append(format_hit(hit))
+            if len(results) >= limit:
+                break
+        out.append({"query": query, "results": results})
+    return out
+
+
+def short_results(limits, responses, out) -> list[int]:
+    """
+    Indexes of batch queries that came back with fewer notes than asked
+    for although the over-fetch was used up — a few long notes filled it
+    with their chunks, so more notes may exist. The servers re-run these
+    with query_points_groups.
+    """
+    return [i for i, (limit, resp, entry) in enumerate(zip(limits, responses, out))
+            if len(entry["results"]) < limit and len(resp.points) >= limit * BATCH_OVERFETCH]
+
+
+def do_search_batch(body: dict) -> list[dict]:
+    """Encode every query in one batch and search them in one Qdrant round trip."""
+    queries, limits, filters, collection = parse_batch(body)
+    vectors = embed_queries(queries)
+    if LOCAL_FALLBACK and not get_health().ok():
+        return local_batch(queries, vectors, limits, filters, collection)
+    try:
+        responses = get_client().query_batch_points(
+            collection_name=collection,
+            requests=batch_requests(vectors, limits, filters, collection),
+        )
+    except Exception:
+        if not LOCAL_FALLBACK or get_health().check():
+            raise
+        return local_batch(queries, vectors, limits, filters, collection)
+    out = batch_results(queries, limits, responses)
+    for i in short_results(limits, responses, out):
+        resp = get_client().query_points_groups(
+            **group_query(vectors[i].tolist(), limits[i], collection, build_filter(filters[i])))
+        out[i]["results"] = format_groups(resp.groups)
+    return out
+
+
+def local_batch(queries, vectors, limits, filters, collection: str) -> list[dict]:
+    """Offline twin of batch_results() — each query against the local index."""
+    return [
+        {"query": q, "results": local_search(vec, limit, collection, spec)}
+        for q, vec, limit, spec in zip(queries, vectors, limits, filters)
+    ]
+
+
+def local_index_info(collection: str):
+    from local_index import index_info
+    return index_info(collection)
+
+
+def health_report() -> dict:
+    """
+    /health body: stats of the components that are already up.
+
+    Never builds one — a component not yet used reports None — so a
+    health check doesn't load caches, start threads or probe Qdrant.
+    Reads the local index's meta.json, so async callers run it in a thread.
+    """
+    return {
+        "status":       "ok",
+        "qdrant":       f"{LXC_IP}:{QDRANT_PORT}",
+        "query_cache":  _query_cache.stats() if _query_cache is not None else None,
+        "batcher":      _batcher.stats() if _batcher is not None else None,
+        "result_cache": _result_cache.stats() if _result_cache is not None else None,
+        "qdrant_up":    _health.up if _health is not None else None,
+        "qdrant_calls": call_stats(),
+        "local_index":  local_index_info(COLLECTION) if LOCAL_FALLBACK else None,
+    }
+
+
+def start_local_index_refresher():
+    """Keep the offline copy of COLLECTION fresh while Qdrant is reachable."""
+    if LOCAL_FALLBACK:
+        from local_index import start_refresher
+        start_refresher(get_client, COLLECTION, get_health())
 
 
 class SearchHandler(SimpleHTTPRequestHandler):
@@ -108,7 +459,7 @@ class SearchHandler(SimpleHTTPRequestHandler):
         parsed = urlparse(self.path)
 
         if parsed.path == "/health":
-            self._json_response({"status": "ok", "qdrant": f"{LXC_IP}:{QDRANT_PORT}"})
+            self._json_response(health_report())
             return
 
         if parsed.path == "/":
@@ -120,26 +471,30 @@ class SearchHandler(SimpleHTTPRequestHandler):
         # Fall through to static file serving
         super().do_GET()
 
-    # ── POST /search ───────────────────────────────────────────────────────
+    # ── POST /search, /search/batch ───────────────────────────────────────────────────────
     def do_POST(self):
         parsed = urlparse(self.path)
 
-        if parsed.path == "/search":
+        if parsed.path == "/search/batch":
             try:
                 length = int(self.headers.get("Content-Length", 0))
                 body = json.loads(self.rfile.read(length)) if length else {}
+                self._json_response(do_search_batch(body))
+            except ValueError as e:
+                self._json_response({"error": str(e)}, status=400)
+            except Exception as e:
+                self._json_response({"error": str(e)}, status=500)
+            return
 
-                query      = body.get("query", "").strip()
-                limit      = min(int(body.get("limit", 10)), 100)
-                collection = body.get("collection", COLLECTION)
-
-                if not query:
-                    self._json_response({"error": "query is required"}, status=400)
-                    return
-
+        if parsed.path == "/search":
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length)) if length else {}
+                query, limit, collection = parse_search(body)
                 results = do_search(query, limit, collection)
                 self._json_response(results)
-
+            except ValueError as e:
+                self._json_response({"error": str(e)}, status=400)
             except Exception as e:
                 self._json_response({"error": str(e)}, status=500)
             return
@@ -165,6 +520,23 @@ class SearchHandler(SimpleHTTPRequestHandler):
 
 
 def main():
+    import embedding_backend
+
+    parser = argparse.ArgumentParser(description="Local REST search server for Qdrant")
+    parser.add_argument("--async", dest="use_async", action="store_true",
+                        help="Serve with asyncio + AsyncQdrantClient (keep-alive, concurrent clients)")
+    parser.add_argument("--backend", choices=embedding_backend.BACKENDS,
+                        help="Embedding backend (default: QDRANT_EMBED_BACKEND or torch)")
+    args = parser.parse_args()
+
+    if args.backend:
+        embedding_backend.select(args.backend)
+
+    if args.use_async:
+        from async_search_server import main as async_main
+        async_main()
+        return
+
     print(f"╔══════════════════════════════════════════════╗")
     print(f"║  Qdrant Search Server                       ║")
     print(f"║  http://localhost:{PORT}                      ║")
@@ -175,6 +547,7 @@ def main():
     print("  Endpoints:")
     print(f"    GET  /health              → connectivity check")
     print(f"    POST /search              → semantic search")
+    print(f"    POST /search/batch        → many queries, one round trip")
     print(f"    GET  /                    → search.html UI")
     print()
     print("  Press Ctrl+C to stop")
@@ -182,8 +555,11 @@ def main():
 
     # Pre-load model on startup so first search is fast
     get_model()
+    warm_result_cache()
+    start_local_index_refresher()
 
-    server = HTTPServer((HOST, PORT), SearchHandler)
+    # Threaded so concurrent searches can share micro-batched encodes
+    server = ThreadingHTTPServer((HOST, PORT), SearchHandler)
     try:
         server.serve_forever()
     except KeyboardInterrupt:
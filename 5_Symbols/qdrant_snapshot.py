@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""
+Portable binary snapshot export / import of a Qdrant collection.
+
+Bootstrapping a new machine used to mean re-running ingest.py, which
+re-embeds every note. A snapshot carries the vectors themselves, so a
+restore is an I/O job, not a compute job — and it works against any
+Qdrant: the Proxmox server, an embedded `path=` store or `:memory:`.
+
+File format (.qsnap — a plain zip, so `unzip -l` can inspect it):
+    manifest.json   format version, collection, model, dim, distance, dtype,
+                    count and payload index schema
+    vectors.bin     row-major float16 / float32 vectors, stored uncompressed
+    payload.jsonl   one {"id", "payload"} line per vector row, deflated
+
+Export streams the collection in two passes: a vector scroll (no payload)
+writes the vector block and collects ids; the payloads are then fetched for
+those ids page by page, so rows stay aligned even if the collection changes
+mid-export. Import streams both entries back and upserts them with several
+parallel workers.
+
+CLI:
+    python 5_Symbols/qdrant_snapshot.py export mac_repo_index.qsnap
+    python 5_Symbols/qdrant_snapshot.py export mac_repo_index.qsnap --dtype float32
+    python 5_Symbols/qdrant_snapshot.py import mac_repo_index.qsnap --host localhost
+    python 5_Symbols/qdrant_snapshot.py import mac_repo_index.qsnap --bulk-load
+    python 5_Symbols/qdrant_snapshot.py import mac_repo_index.qsnap --path ./qdrant_data
+    python 5_Symbols/qdrant_snapshot.py info mac_repo_index.qsnap
+
+Usage (as a module):
+    from qdrant_snapshot import export_collection, import_snapshot
+    export_collection(client, "mac_repo_index", "brain.qsnap")
+    import_snapshot(QdrantClient(":memory:"), "brain.qsnap")
+"""
+
+import os
+import json
+import time
+import zipfile
+import argparse
+import threading
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from qdrant_connection import connect, QDRANT_HOST, QDRANT_PORT
+
+# ── Configuration ──────────────────────────────────────────────────────────────
+LXC_IP        = QDRANT_HOST   # env QDRANT_HOST / config file, see qdrant_connection.py
+COLLECTION    = "mac_repo_index"
+MODEL_NAME    = "all-MiniLM-L6-v2"
+FORMAT        = "qdrant-secondbrain-snapshot"
+VERSION       = 1
+SCROLL_PAGE   = 1024   # points per scroll / retrieve during export
+UPLOAD_BATCH  = 512    # points per upsert during import
+UPLOAD_WORKERS = 4     # parallel upserts during import (1 for embedded clients)
+# ───────────────────────────────────────────────────────────────────────────────
+
+DTYPES = {"float16": np.float16, "float32": np.float32}
+
+
+def _is_embedded(client) -> bool:
+    """Embedded (:memory: / path=) clients are in-process — parallel upserts only contend."""
+    opts = getattr(client, "init_options", {}) or {}
+    return opts.get("location") == ":memory:" or bool(opts.get("path"))
+
+
+def read_manifest(path: str) -> dict:
+    with zipfile.ZipFile(path) as zf:
+        return json.loads(zf.read("manifest.json"))
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+#  EXPORT
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def export_collection(client, collection: str, out_path: str, dtype: str = "float16",
+                      model: str = MODEL_NAME, page: int = SCROLL_PAGE, progress=print) -> dict:
+    """
+    Stream a collection into a .qsnap file.
+
+    Args:
+        client:     QdrantClient to read from
+        collection: Collection to export
+        out_path:   Destination .qsnap file (written to a temp name, then renamed)
+        dtype:      "float16" (half the size, ~1e-3 precision) or "float32"
+        model:      Embedding model name recorded in the manifest
+        page:       Points per scroll / retrieve request
+        progress:   Callable for progress lines (None = quiet)
+
+    Returns:
+        The manifest dict
+    """
+    np_dtype = DTYPES[dtype]
+    info     = client.get_collection(collection)
+    params   = info.config.params.vectors
+    schema   = {field: getattr(idx.data_type, "value", str(idx.data_type))
+                for field, idx in (info.payload_schema or {}).items()}
+
+    tmp = out_path + ".part"
+    started = time.time()
+    ids = []
+    with zipfile.ZipFile(tmp, "w", allowZip64=True) as zf:
+        # Pass 1 — vectors only
+        entry = zipfile.ZipInfo("vectors.bin", date_time=time.localtime()[:6])
+        entry.compress_type = zipfile.ZIP_STORED
+        with zf.open(entry, "w", force_zip64=True) as vf:
+            offset = None
+            while True:
+                points, offset = client.scroll(
+                    collection_name=collection,
+                    limit=page,
+                    offset=offset,
+                    with_payload=False,
+                    with_vectors=True,
+                )
+                if points:
+                    vf.write(np.asarray([p.vector for p in points], dtype=np_dtype).tobytes())
+                    ids.extend(p.id for p in points)
+                    if progress and len(ids) % (page * 20) < len(points):
+                        progress(f"    vectors: {len(ids)}")
+                if offset is None:
+                    break
+
+        # Pass 2 — payloads for exactly those ids, in the same order
+        entry = zipfile.ZipInfo("payload.jsonl", date_time=time.localtime()[:6])
+        entry.compress_type = zipfile.ZIP_DEFLATED
+        with zf.open(entry, "w", force_zip64=True) as pf:
+            for i in range(0, len(ids), page):
+                chunk = ids[i:i + page]
+                found = {p.id: p.payload for p in client.retrieve(
+                    collection_name=collection, ids=chunk, with_payload=True, with_vectors=False)}
+                pf.write("".join(
+                    json.dumps({"id": pid, "payload": found.get(pid)}, ensure_ascii=False) + "\n"
+                    for pid in chunk
+                ).encode())
+
+        manifest = {
+            "format":         FORMAT,
+            "version":        VERSION,
+            "collection":     collection,
+            "model":          model,
+            "dim":            params.size,
+            "distance":       getattr(params.distance, "value", str(params.distance)),
+            "dtype":          dtype,
+            "count":          len(ids),
+            "payload_schema": schema,
+            "created":        time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+        zf.writestr("manifest.json", json.dumps(manifest, indent=2))
+
+    os.replace(tmp, out_path)
+    if progress:
+        size_mb = os.path.getsize(out_path) / 2**20
+        progress(f"  ✓ Exported {len(ids)} points ({dtype}, {size_mb:.1f} MB) in {time.time() - started:.1f}s")
+    return manifest
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+#  IMPORT
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def _iter_batches(zf: zipfile.ZipFile, manifest: dict, batch: int):
+    """Yield lists of PointStruct read in lockstep from vectors.bin and payload.jsonl."""
+    from qdrant_client.models import PointStruct
+
+    np_dtype = DTYPES[manifest["dtype"]]
+    row_bytes = manifest["dim"] * np.dtype(np_dtype).itemsize
+    with zf.open("vectors.bin") as vf, zf.open("payload.jsonl") as pf:
+        remaining = manifest["count"]
+        while remaining:
+            n = min(batch, remaining)
+            block = np.frombuffer(vf.read(n * row_bytes), dtype=np_dtype).reshape(n, manifest["dim"])
+            points = []
+            for vec in block.astype(np.float32):
+                row = json.loads(pf.readline())
+                if row["payload"] is None:
+                    continue   # deleted between the two export passes
+                points.append(PointStruct(id=row["id"], vector=vec.tolist(), payload=row["payload"]))
+            remaining -= n
+            yield points
+
+
+def import_snapshot(client, path: str, collection: str = None, recreate: bool = False,
+                    workers: int = UPLOAD_WORKERS, batch: int = UPLOAD_BATCH, progress=print,
+                    bulk: bool = None) -> int:
+    """
+    Restore a .qsnap file into any Qdrant.
+
+    Args:
+        client:     QdrantClient to write to (server, path= or :memory:)
+        path:       .qsnap file
+        collection: Target collection (default: the one recorded in the manifest)
+        recreate:   Drop the target collection first if it exists
+        workers:    Parallel upserts (forced to 1 for embedded clients)
+        batch:      Points per upsert
+        progress:   Callable for progress lines (None = quiet)
+        bulk:       Suspend HNSW indexing during the upload and build the
+                    index once afterwards (collection_profiles.bulk_load);
+                    None = only when the import creates the collection
+
+    Returns:
+        Number of points restored
+    """
+    from qdrant_client.models import Distance, VectorParams, PayloadSchemaType
+
+    started = time.time()
+    with zipfile.ZipFile(path) as zf:
+        manifest = json.loads(zf.read("manifest.json"))
+        if manifest.get("format") != FORMAT or manifest.get("version") != VERSION:
+            raise ValueError(f"{path} is not a v{VERSION} {FORMAT} file")
+        collection = collection or manifest["collection"]
+
+        if recreate and client.collection_exists(collection):
+            client.delete_collection(collection)
+        if bulk is None:
+            bulk = not client.collection_exists(collection)
+        if not client.collection_exists(collection):
+            client.create_collection(
+                collection_name=collection,
+                vectors_config=VectorParams(size=manifest["dim"], distance=Distance(manifest["distance"])),
+            )
+        for field, kind in manifest.get("payload_schema", {}).items():
+            client.create_payload_index(collection, field_name=field, field_schema=PayloadSchemaType(kind))
+
+        if _is_embedded(client):
+            workers = 1
+        restored = 0
+        lock = threading.Lock()
+
+        def upload(points):
+            nonlocal restored
+            client.upsert(collection_name=collection, points=points, wait=True)
+            with lock:
+                restored += len(points)
+
+        if bulk:
+            from collection_profiles import bulk_load
+            loading = bulk_load(client, collection, progress=progress)
+        else:
+            loading = nullcontext()
+
+        # Bounded in-flight window: at most 2 batches per worker decoded ahead
+        with loading, ThreadPoolExecutor(max_workers=workers) as pool:
+            pending = []
+            for n, points in enumerate(_iter_batches(zf, manifest, batch), 1):
+                if points:
+                    pending.append(pool.submit(upload, points))
+                if len(pending) >= workers * 2:
+                    pending.pop(0).result()
+                if progress and n % 40 == 0:
+                    progress(f"    restored: ~{n * batch} / {manifest['count']}")
+            for fut in pending:
+                fut.result()
+
+    try:
+        from result_cache import bump_generation
+        bump_generation(client, collection)
+    except ImportError:
+        pass
+
+    if progress:
+        progress(f"  ✓ Restored {restored} points into {collection} in {time.time() - started:.1f}s")
+        if manifest.get("model") != MODEL_NAME:
+            progress(f"  ⚠️  Snapshot was embedded with {manifest.get('model')}, "
+                     f"but searches encode queries with {MODEL_NAME}")
+    return restored
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+#  CLI
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def _connect(args):
+    if args.path:
+        from qdrant_client import QdrantClient
+        return QdrantClient(path=args.path)
+    return connect("bulk", host=args.host, port=args.port)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export / import a Qdrant collection as a portable snapshot")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    for name in ("export", "import"):
+        p = sub.add_parser(name)
+        p.add_argument("file", help=".qsnap snapshot file")
+        p.add_argument("--collection", help=f"Collection (default: {COLLECTION} / the snapshot's own)")
+        p.add_argument("--host", default=LXC_IP, help=f"Qdrant host (default: {LXC_IP})")
+        p.add_argument("--port", type=int, default=QDRANT_PORT, help=f"Qdrant port (default: {QDRANT_PORT})")
+        p.add_argument("--path", help="Use an embedded Qdrant store at this directory instead of a server")
+    sub.choices["export"].add_argument("--dtype", choices=sorted(DTYPES), default="float16",
+                                       help="Vector storage precision (default: float16)")
+    sub.choices["import"].add_argument("--recreate", action="store_true",
+                                       help="Drop the target collection before restoring")
+    sub.choices["import"].add_argument("--bulk-load", action="store_true", default=None,
+                                       help="Suspend HNSW indexing during the upload (default: only for a new collection)")
+    sub.choices["import"].add_argument("--workers", type=int, default=UPLOAD_WORKERS,
+                                       help=f"Parallel upserts (default: {UPLOAD_WORKERS})")
+    info = sub.add_parser("info")
+    info.add_argument("file", help=".qsnap snapshot file")
+    args = parser.parse_args()
+
+    if args.command == "info":
+        print(json.dumps(read_manifest(args.file), indent=2))
+        return
+
+    client = _connect(args)
+    if args.command == "export":
+        collection = args.collection or COLLECTION
+        print(f"  Exporting {collection} → {args.file}")
+        export_collection(client, collection, args.file, dtype=args.dtype)
+    else:
+        print(f"  Importing {args.file}")
+        import_snapshot(client, args.file, collection=args.collection,
+                        recreate=args.recreate, workers=args.workers, bulk=args.bulk_load)
+
+
+if __name__ == "__main__":
+    main()
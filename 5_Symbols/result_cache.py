@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+Search result cache invalidated by a per-collection generation counter.
+
+Ingestion happens a few times a day (cron --daily, the pre-commit hook, a
+full ingest), while the search server sees the same queries over and over.
+Every writer calls bump_generation() after a successful write; the server
+caches results keyed on (query vector hash, limit, collection, filters) and
+only serves an entry while the collection's generation is unchanged.
+
+The generation lives in two places:
+    • a marker file per collection under GENERATION_DIR — writers on the
+      same machine as the server invalidate its cache instantly (one stat()
+      per search, no network round trip)
+    • a marker point per collection in the GENERATION_COLLECTION collection
+      — written by writers on other machines too (the Windows daily
+      ingest). A background poll re-reads it every REMOTE_POLL_SECS, so a
+      remote write reaches the cache within that interval
+
+A cache hit never touches the network: the token is the marker file's
+stat plus the last polled value. The servers prime() their collection at
+startup, so the first hits are not lost to the first poll.
+
+Usage (as a module):
+    from result_cache import bump_generation            # writers
+    bump_generation(client, "mac_repo_index")
+
+    from result_cache import ResultCache, GenerationWatcher   # search server
+    watcher = GenerationWatcher(get_client)
+    watcher.prime(["mac_repo_index"])         # at startup
+    cache   = ResultCache()
+    token   = watcher.token(collection)       # take it *before* querying Qdrant
+    key     = ResultCache.key(vector, limit, collection)
+    results = cache.get(key, token)
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# ── Configuration ──────────────────────────────────────────────────────────────
+GENERATION_DIR        = os.environ.get(
+    "QDRANT_GENERATION_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "qdrant_secondbrain", "generations"),
+)
+GENERATION_COLLECTION = "search_generations"   # one marker point per data collection
+REMOTE_POLL_SECS      = 5                      # how often the server re-reads the marker points
+RESULT_CACHE_SIZE     = int(os.environ.get("QDRANT_RESULT_CACHE_SIZE", "1024"))
+# ───────────────────────────────────────────────────────────────────────────────
+
+
+def _marker_id(collection: str) -> int:
+    return int(hashlib.md5(collection.encode()).hexdigest(), 16) % (10**12)
+
+
+def _marker_file(collection: str) -> str:
+    return os.path.join(GENERATION_DIR, collection)
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+#  WRITER SIDE
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def bump_generation(client, collection: str) -> int:
+    """
+    Record that `collection` changed. Call after every successful write.
+
+    The generation is a nanosecond timestamp rather than a read-increment,
+    so concurrent writers (cron + pre-commit hook) never need to coordinate.
+    Both markers are best-effort: a failure is reported, never raised, since
+    the write itself already succeeded.
+
+    Returns:
+        The new generation number
+    """
+    generation = time.time_ns()
+
+    try:
+        os.makedirs(GENERATION_DIR, exist_ok=True)
+        tmp = _marker_file(collection) + ".tmp"
+        with open(tmp, "w") as f:
+            f.write(str(generation))
+        os.replace(tmp, _marker_file(collection))
+    except OSError as e:
+        print(f"  ⚠️  Could not write generation marker ({e})")
+
+    try:
+        from qdrant_client.models import Distance, PointStruct, VectorParams
+        if not client.collection_exists(GENERATION_COLLECTION):
+            client.create_collection(
+                collection_name=GENERATION_COLLECTION,
+                vectors_config=VectorParams(size=1, distance=Distance.DOT),
+            )
+        client.upsert(
+            collection_name=GENERATION_COLLECTION,
+            points=[PointStruct(
+                id=_marker_id(collection),
+                vector=[1.0],
+                payload={"collection": collection, "generation": generation},
+            )],
+        )
+    except Exception as e:
+        print(f"  ⚠️  Could not bump generation in Qdrant ({e})")
+
+    return generation
+
+
+def read_generations(client, collections, check_exists: bool = True) -> dict[str, int]:
+    """
+    Current generation per collection from the marker points (0 if never bumped).
+
+    check_exists=False skips the collection_exists round trip for callers
+    that already know GENERATION_COLLECTION is there.
+    """
+    collections = list(collections)
+    if check_exists and not client.collection_exists(GENERATION_COLLECTION):
+        return {c: 0 for c in collections}
+    points = client.retrieve(
+        collection_name=GENERATION_COLLECTION,
+        ids=[_marker_id(c) for c in collections],
+        with_payload=True,
+        with_vectors=False,
+    )
+    found = {p.payload.get("collection"): int(p.payload.get("generation", 0)) for p in points}
+    return {c: found.get(c, 0) for c in collections}
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+#  READER SIDE
+# ═══════════════════════════════════════════════════════════════════════════════
+
+class GenerationWatcher:
+    """
+    Cheap "has this collection changed?" token for the search server.
+
+    token() stats the local marker file on every call and combines it with
+    the last generation a background thread read from Qdrant — no network
+    call on the search path. A local write changes it at once, a remote one
+    after the next poll. Once GENERATION_COLLECTION is known to exist, a
+    poll is a single retrieve.
+
+    Args:
+        get_client: Zero-arg callable returning a QdrantClient (used by the poller)
+        poll_secs:  Seconds between reads of the remote marker points
+    """
+
+    def __init__(self, get_client, poll_secs: float = REMOTE_POLL_SECS):
+        self.get_client = get_client
+        self.poll_secs  = poll_secs
+        self._remote: dict[str, int] = {}
+        self._exists    = False   # GENERATION_COLLECTION seen, skip the existence check
+        self._lock      = threading.Lock()
+        self._wake      = threading.Event()
+        self._thread    = None
+
+    def token(self, collection: str) -> tuple:
+        try:
+            st = os.stat(_marker_file(collection))
+            local = (st.st_ino, st.st_mtime_ns)
+        except OSError:
+            local = None
+        with self._lock:
+            if collection not in self._remote:
+                self._remote[collection] = None   # unknown until the first poll
+                self._start()
+            remote = self._remote[collection]
+        return remote, local
+
+    def prime(self, collections):
+        """
+        Read the remote generations of collections now and start polling.
+        Called at server startup; a failure leaves them unknown until the
+        first successful poll.
+        """
+        collections = list(collections)
+        try:
+            current = self._read(collections)
+        except Exception:
+            current = {c: None for c in collections}
+        with self._lock:
+            for c in collections:
+                self._remote.setdefault(c, None)
+                if current[c] is not None:
+                    self._remote[c] = current[c]
+            self._start(wake=any(v is None for v in current.values()))
+
+    def _read(self, collections) -> dict[str, int]:
+        client = self.get_client()
+        if not self._exists:
+            if not client.collection_exists(GENERATION_COLLECTION):
+                return {c: 0 for c in collections}
+            self._exists = True
+        try:
+            return read_generations(client, collections, check_exists=False)
+        except Exception:
+            self._exists = False   # dropped, or Qdrant down — check again next time
+            raise
+
+    def _start(self, wake: bool = True):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._poll, name="generation-poll", daemon=True)
+            self._thread.start()
+        if wake:
+            self._wake.set()   # read a newly seen collection now, not a poll interval later
+
+    def _poll(self):
+        while True:
+            self._wake.wait(self.poll_secs)
+            self._wake.clear()
+            with self._lock:
+                collections = list(self._remote)
+            try:
+                current = self._read(collections)
+            except Exception:
+                continue   # Qdrant unreachable — searches fail anyway; keep last values
+            with self._lock:
+                self._remote.update(current)
+
+    def generations(self) -> dict:
+        with self._lock:
+            return dict(self._remote)
+
+
+class ResultCache:
+    """
+    Bounded LRU of formatted search results, valid for one generation token.
+
+    Args:
+        max_entries: LRU capacity
+    """
+
+    def __init__(self, max_entries: int = RESULT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.hits        = 0
+        self.misses      = 0
+        self.stale       = 0
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._lock       = threading.Lock()
+
+    @staticmethod
+    def key(vector, limit: int, collection: str, filters=None) -> tuple:
+        """Cache key: (vector hash, limit, collection, canonical filters JSON)."""
+        digest = hashlib.blake2b(np.asarray(vector, dtype=np.float32).tobytes(), digest_size=16).digest()
+        return digest, limit, collection, json.dumps(filters, sort_keys=True) if filters else ""
+
+    def get(self, key: tuple, token):
+        """Cached results for key if stored under the same generation token, else None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == token:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+                self.stale += 1
+            self.misses += 1
+            return None
+
+    def put(self, key: tuple, token, results):
+        with self._lock:
+            self._entries[key] = (token, results)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries":  len(self._entries),
+                "capacity": self.max_entries,
+                "hits":     self.hits,
+                "misses":   self.misses,
+                "stale":    self.stale,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            }
@@ -0,0 +1,400 @@
+#!/usr/bin/env python3
+"""
+Recall-vs-latency tuning of the search-time parameters of a collection.
+
+The search servers and the agent library have always searched with
+Qdrant's defaults, and nobody knew what recall that gives or how far
+hnsw_ef could drop. This tool measures it against the live collection:
+
+  1. queries  — note headings and titles sampled from the collection's own
+     payloads, encoded with the real model (or, with --stored-vectors,
+     stored chunk vectors replayed as queries — no model needed)
+  2. truth    — exact top-k notes per query by NumPy brute force over every
+     stored vector, grouped by path the way do_search() groups results
+     (a note scores as its best chunk)
+  3. sweep    — every combination of hnsw_ef and, on quantized collections,
+     ignore / rescore / oversampling, plus exact search and the defaults;
+     each one timed through query_points_groups as the servers call it
+     --rounds times, each round visiting the settings in a fresh random
+     order, so a noisy moment lands on several settings instead of one
+  4. pick     — the fastest (p95 over all rounds) setting whose mean
+     recall@k reaches --target-recall. Exact search is shown as the
+     reference row but never picked: brute force costs grow with the
+     collection, whatever it measured today
+
+--save stores the pick in PARAMS_FILE under the collection's name.
+do_search(), the batch and async endpoints and agent_query_qdrant.search()
+read it through tuned_search_params() (re-read when the file changes); a
+collection without an entry keeps Qdrant's defaults.
+
+CLI:
+    python 5_Symbols/search_tuning.py                          # sweep mac_repo_index, print the table
+    python 5_Symbols/search_tuning.py --target-recall 0.95 --save
+    python 5_Symbols/search_tuning.py --stored-vectors --queries 100 --k 20
+    python 5_Symbols/search_tuning.py --show
+
+Usage (as a module):
+    from search_tuning import tuned_search_params
+    client.query_points_groups(..., search_params=tuned_search_params(COLLECTION))
+"""
+
+import os
+import json
+import time
+import random
+import argparse
+
+import numpy as np
+
+from qdrant_connection import connect, QDRANT_HOST, QDRANT_PORT
+
+# ── Configuration ──────────────────────────────────────────────────────────────
+PARAMS_FILE   = os.environ.get(
+    "QDRANT_SEARCH_PARAMS",
+    os.path.join(os.path.expanduser("~"), ".config", "qdrant_secondbrain", "search_params.json"),
+)
+COLLECTION    = "mac_repo_index"
+MODEL_NAME    = "all-MiniLM-L6-v2"
+QUERIES       = 200
+TOP_K         = 10
+TARGET_RECALL = 0.98
+EF_VALUES     = (16, 32, 64, 128, 256, 512)
+OVERSAMPLING  = (1.0, 1.5, 2.0, 3.0, 4.0)
+SCROLL_BATCH  = 2048
+TRUTH_BATCH   = 32     # queries scored per brute-force block
+TIE_EPS       = 1e-5   # notes within this of the k-th best score count as top-k too
+ROUNDS        = 3      # timing passes per setting, interleaved across settings
+# ───────────────────────────────────────────────────────────────────────────────
+
+_loaded = {"mtime": None, "params": {}}
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+#  TUNED PARAMS — read by the search paths
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def to_search_params(setting: dict):
+    """
+    SearchParams for one setting dict, or None for Qdrant's defaults.
+
+    Args:
+        setting: {"hnsw_ef": int|None, "exact": bool,
+                  "quantization": None | {"ignore", "rescore", "oversampling"}}
+    """
+    from qdrant_client.models import SearchParams, QuantizationSearchParams
+    quant = setting.get("quantization")
+    if not setting.get("hnsw_ef") and not setting.get("exact") and not quant:
+        return None
+    return SearchParams(
+        hnsw_ef=setting.get("hnsw_ef"),
+        exact=bool(setting.get("exact")),
+        quantization=QuantizationSearchParams(**quant) if quant else None,
+    )
+
+
+def load_tuned(path: str = PARAMS_FILE) -> dict:
+    """{collection: saved entry} from the params file ({} if there is none)."""
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def tuned_search_params(collection: str, path: str = PARAMS_FILE):
+    """
+    The saved SearchParams for collection, or None (Qdrant's defaults).
+
+    Costs one stat() per call; the file is re-parsed only when it changes,
+    so a --save takes effect in running servers without a restart.
+    """
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        return None
+    if mtime != _loaded["mtime"]:
+        try:
+            saved = load_tuned(path)
+            _loaded["params"] = {name: to_search_params(entry["params"]) for name, entry in saved.items()}
+        except (ValueError, KeyError, TypeError) as e:
+            print(f"  ⚠️  Ignoring unreadable search params {path}: {e}")
+            _loaded["params"] = {}
+        _loaded["mtime"] = mtime
+    return _loaded["params"].get(collection)
+
+
+def params_version(path: str = PARAMS_FILE):
+    """mtime of the params file (None if there is none) — part of the result cache token."""
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def save_tuned(collection: str, entry: dict, path: str = PARAMS_FILE):
+    """Store one collection's pick, keeping the other collections' entries."""
+    saved = load_tuned(path)
+    saved[collection] = entry
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(saved, f, indent=2)
+    os.replace(tmp, path)
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+#  GROUND TRUTH
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def load_points(client, collection: str):
+    """
+    Every stored vector with its note path and heading, in path order.
+
+    Returns:
+        (vectors float32 [N, dim] L2-normalised, paths list[str], headings list[str])
+    """
+    vectors, paths, headings = [], [], []
+    offset = None
+    while True:
+        points, offset = client.scroll(collection_name=collection, limit=SCROLL_BATCH, offset=offset,
+                                       with_payload=["path", "heading", "filename"], with_vectors=True)
+        for p in points:
+            if p.vector is None:
+                continue
+            payload = p.payload or {}
+            vectors.append(p.vector)
+            paths.append(payload.get("path", str(p.id)))
+            headings.append(payload.get("heading") or os.path.splitext(payload.get("filename", ""))[0])
+        if offset is None:
+            break
+    order = sorted(range(len(paths)), key=paths.__getitem__)
+    matrix = np.asarray([vectors[i] for i in order], dtype=np.float32)
+    matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+    return matrix, [paths[i] for i in order], [headings[i] for i in order]
+
+
+def exact_top_notes(queries: np.ndarray, matrix: np.ndarray, paths: list[str], k: int) -> list[set]:
+    """
+    Exact top-k notes per query (cosine, a note scoring as its best chunk).
+
+    Scores TRUTH_BATCH queries at a time with one matrix product, reduces
+    chunk scores to per-note maxima with np.maximum.reduceat over the
+    path-sorted rows, then finds the k-th best score with np.partition.
+    Each set holds every note scoring within TIE_EPS of that score, so a
+    search that breaks a tie differently is not counted as a miss.
+    """
+    starts = np.flatnonzero([i == 0 or paths[i] != paths[i - 1] for i in range(len(paths))])
+    notes  = [paths[i] for i in starts]
+    k      = min(k, len(notes))
+    queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+    truth = []
+    for i in range(0, len(queries), TRUTH_BATCH):
+        scores = queries[i:i + TRUTH_BATCH] @ matrix.T                 # [q, chunks]
+        best   = np.maximum.reduceat(scores, starts, axis=1)           # [q, notes]
+        kth    = -np.partition(-best, k - 1, axis=1)[:, k - 1:k]       # [q, 1]
+        truth.extend({notes[j] for j in np.flatnonzero(row)} for row in best >= kth - TIE_EPS)
+    return truth
+
+
+def sample_queries(headings: list[str], count: int, seed: int = 0) -> list[str]:
+    """Distinct non-empty headings / titles, `count` of them at random."""
+    pool = sorted({h.strip() for h in headings if h and len(h.strip()) > 3})
+    return random.Random(seed).sample(pool, min(count, len(pool)))
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+#  SWEEP
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def is_quantized(client, collection: str) -> bool:
+    return client.get_collection(collection).config.quantization_config is not None
+
+
+def candidate_settings(quantized: bool, ef_values=EF_VALUES, oversampling=OVERSAMPLING) -> list[dict]:
+    """Defaults, exact search, then hnsw_ef × (quantization options when the collection has any)."""
+    settings = [{}, {"exact": True}]
+    for ef in ef_values:
+        if not quantized:
+            settings.append({"hnsw_ef": ef})
+            continue
+        settings.append({"hnsw_ef": ef, "quantization": {"ignore": True}})
+        settings.append({"hnsw_ef": ef, "quantization": {"rescore": False}})
+        settings += [{"hnsw_ef": ef, "quantization": {"rescore": True, "oversampling": o}} for o in oversampling]
+    return settings
+
+
+def describe(setting: dict) -> str:
+    if not setting:
+        return "defaults"
+    if setting.get("exact"):
+        return "exact"
+    text = f"ef={setting['hnsw_ef']}"
+    quant = setting.get("quantization")
+    if quant:
+        if quant.get("ignore"):
+            text += " no-quant"
+        elif not quant.get("rescore"):
+            text += " quant"
+        else:
+            text += f" quant+rescore x{quant['oversampling']:g}"
+    return text
+
+
+def measure(client, collection: str, setting: dict, vectors: list, truth: list[set], k: int):
+    """One pass of every query with one setting: (recall@k per query, latency ms per query)."""
+    params = to_search_params(setting)
+    recalls, timings = [], []
+    for vector, expected in zip(vectors, truth):
+        t0 = time.perf_counter()
+        groups = client.query_points_groups(collection_name=collection, query=vector, group_by="path",
+                                            limit=k, group_size=1, with_payload=False,
+                                            search_params=params).groups
+        timings.append((time.perf_counter() - t0) * 1000)
+        wanted = min(k, len(expected))   # expected may hold more than k notes on ties
+        recalls.append(min(wanted, len({g.id for g in groups} & expected)) / max(1, wanted))
+    return recalls, timings
+
+
+def summarize(setting: dict, recalls: list[float], timings: list[float]) -> dict:
+    """Table row for one setting from all its passes."""
+    timings = np.array(timings)
+    return {
+        "setting":    describe(setting),
+        "params":     setting,
+        "reference":  bool(setting.get("exact")),
+        "recall":     round(float(np.mean(recalls)), 4),
+        "min_recall": round(float(np.min(recalls)), 4),
+        "p50_ms":     round(float(np.percentile(timings, 50)), 2),
+        "p95_ms":     round(float(np.percentile(timings, 95)), 2),
+    }
+
+
+def recommend(rows: list[dict], target: float) -> dict:
+    """
+    Fastest p95 among rows reaching target recall; the most accurate row if
+    none does. Reference rows (exact search) are never picked.
+    """
+    rows = [r for r in rows if not r["reference"]]
+    good = [r for r in rows if r["recall"] >= target]
+    if good:
+        return min(good, key=lambda r: (r["p95_ms"], r["p50_ms"], -r["recall"]))
+    return max(rows, key=lambda r: (r["recall"], -r["p95_ms"]))
+
+
+def tune(client, collection: str, queries: int = QUERIES, k: int = TOP_K, target: float = TARGET_RECALL,
+         stored_vectors: bool = False, encoder=None, seed: int = 0, settings=None,
+         rounds: int = ROUNDS) -> dict:
+    """
+    Run the whole sweep for one collection.
+
+    Args:
+        queries:        Queries to sample
+        k:              Notes per query the recall is computed over
+        target:         Mean recall@k the recommendation must reach
+        stored_vectors: Replay stored chunk vectors instead of encoding headings
+        encoder:        Object with encode(list) (default: load_encoder(MODEL_NAME))
+        settings:       Setting dicts to try (default: candidate_settings())
+        rounds:         Timing passes per setting, interleaved in shuffled order
+
+    Returns:
+        {"collection", "points", "queries", "k", "target", "rows", "pick"}
+    """
+    t0 = time.perf_counter()
+    matrix, paths, headings = load_points(client, collection)
+    if not len(matrix):
+        raise ValueError(f"Collection {collection} has no vectors to tune against")
+    print(f"  ✓ Loaded {len(matrix)} vectors ({len(set(paths))} notes) in {time.perf_counter() - t0:.1f}s")
+
+    if stored_vectors:
+        picks = random.Random(seed).sample(range(len(matrix)), min(queries, len(matrix)))
+        query_vecs = matrix[picks]
+    else:
+        texts = sample_queries(headings, queries, seed)
+        if encoder is None:
+            from embedding_cache import load_encoder
+            encoder = load_encoder(MODEL_NAME)
+        query_vecs = np.asarray(encoder.encode(texts, batch_size=64, convert_to_numpy=True,
+                                               show_progress_bar=False), dtype=np.float32)
+
+    t0 = time.perf_counter()
+    truth = exact_top_notes(query_vecs, matrix, paths, k)
+    print(f"  ✓ Exact top-{k} for {len(truth)} queries in {time.perf_counter() - t0:.2f}s")
+
+    vectors = query_vecs.tolist()
+    settings = settings or candidate_settings(is_quantized(client, collection))
+    measure(client, collection, {}, vectors[:20], truth[:20], k)   # warm caches / page in segments
+    recalls = [[] for _ in settings]
+    timings = [[] for _ in settings]
+    order = list(range(len(settings)))
+    for n in range(max(1, rounds)):
+        random.Random(seed + n).shuffle(order)
+        for i in order:
+            r, t = measure(client, collection, settings[i], vectors, truth, k)
+            recalls[i] += r
+            timings[i] += t
+        print(f"  ✓ Round {n + 1}/{max(1, rounds)}: {len(settings)} settings × {len(vectors)} queries")
+    rows = [summarize(s, r, t) for s, r, t in zip(settings, recalls, timings)]
+    return {"collection": collection, "points": len(matrix), "queries": len(truth), "k": k,
+            "target": target, "rows": rows, "pick": recommend(rows, target)}
+
+
+def print_table(report: dict):
+    k = report["k"]
+    print(f"\n  {'setting':<28} {f'recall@{k}':>10} {'min':>7} {'p50 ms':>9} {'p95 ms':>9}")
+    for r in report["rows"]:
+        mark = " ◀" if r is report["pick"] else " (reference)" if r["reference"] else ""
+        print(f"  {r['setting']:<28} {r['recall']:>10.4f} {r['min_recall']:>7.2f} "
+              f"{r['p50_ms']:>9.2f} {r['p95_ms']:>9.2f}{mark}")
+    pick = report["pick"]
+    verdict = "reaches" if pick["recall"] >= report["target"] else "is the best available, below"
+    print(f"\n  Recommended: {pick['setting']} — recall@{k} {pick['recall']:.4f} "
+          f"({verdict} target {report['target']}), p95 {pick['p95_ms']} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep search params: recall@k vs. latency")
+    parser.add_argument("--collection", default=COLLECTION, help=f"Collection (default: {COLLECTION})")
+    parser.add_argument("--host", default=QDRANT_HOST, help=f"Qdrant host (default: {QDRANT_HOST})")
+    parser.add_argument("--port", type=int, default=QDRANT_PORT, help=f"Qdrant port (default: {QDRANT_PORT})")
+    parser.add_argument("--queries", type=int, default=QUERIES, help=f"Queries to sample (default: {QUERIES})")
+    parser.add_argument("--k", type=int, default=TOP_K, help=f"Recall@k (default: {TOP_K})")
+    parser.add_argument("--target-recall", type=float, default=TARGET_RECALL,
+                        help=f"Mean recall the pick must reach (default: {TARGET_RECALL})")
+    parser.add_argument("--ef", type=int, nargs="+", default=list(EF_VALUES), help="hnsw_ef values to try")
+    parser.add_argument("--stored-vectors", action="store_true",
+                        help="Use stored chunk vectors as queries (no embedding model)")
+    parser.add_argument("--rounds", type=int, default=ROUNDS,
+                        help=f"Interleaved timing passes per setting (default: {ROUNDS})")
+    parser.add_argument("--seed", type=int, default=0, help="Query sampling seed")
+    parser.add_argument("--save", action="store_true", help=f"Store the pick in {PARAMS_FILE}")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    parser.add_argument("--show", action="store_true", help="Print the saved params and exit")
+    args = parser.parse_args()
+
+    if args.show:
+        print(json.dumps(load_tuned(), indent=2))
+        return
+
+    client = connect("bulk", host=args.host, port=args.port)
+    settings = candidate_settings(is_quantized(client, args.collection), args.ef)
+    report = tune(client, args.collection, args.queries, args.k, args.target_recall,
+                  args.stored_vectors, seed=args.seed, settings=settings, rounds=args.rounds)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_table(report)
+    if args.save:
+        pick = report["pick"]
+        save_tuned(args.collection, {
+            "params":   pick["params"],
+            "setting":  pick["setting"],
+            f"recall@{args.k}": pick["recall"],
+            "p95_ms":   pick["p95_ms"],
+            "queries":  report["queries"],
+            "tuned_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        })
+        print(f"  ✓ Saved to {PARAMS_FILE} — used by the search servers and agent_query_qdrant.search()")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,10 +6,35 @@ Modes:
   --daily    Sync files modified in the last 24 hours (default)
   --weekly   Sync files modified in the last 7 days
   --since N  Sync files modified in the last N hours
+  --watch    Stay running: sync each note a few seconds after it is saved
+  --git      Find changes with git instead of walking the tree (see below)
   --dry-run  Show what would be synced without actually upserting
 
 Also detects deleted files and removes them from Qdrant.
 
+Watch mode (fs_watch.py) sleeps on inotify / FSEvents (or rescans every
+QDRANT_WATCH_POLL_SECS where neither is available). Rapid saves of the same
+file are coalesced: a file is synced once it has been quiet for --debounce
+seconds, in batches of WATCH_BATCH, and the state store is updated after
+every batch — so a later --daily run finds nothing left to do.
+
+Git mode records the last synced commit in the state store. The next run
+asks git what changed since then — `git diff --name-status -M <last>`
+compares that commit with the working tree, so it covers new commits,
+staged and unstaged edits and renames in one call, and `git ls-files
+--others` adds untracked notes. Cost no longer depends on vault size. The
+first run (or one whose recorded commit is gone after a rewrite) falls
+back to a full scan and records HEAD for next time.
+
+Writes that can't reach Qdrant (server down, failed upsert / delete) are
+parked in the local outbox with their vectors (outbox.py) and replayed at
+the start of the next run that connects — so the state store can safely
+record them as synced.
+
+State lives in SQLite (sync_state.py): one row per file, written per batch
+of STATE_BATCH files in one transaction, so an interrupted run keeps what
+it finished. The old sync_state.json is migrated on first use.
+
 Usage:
   cd /Users/rifaterdemsahin/projects/qdrant
   source venv/bin/activate
@@ -17,6 +42,8 @@ Usage:
   python 5_Symbols/sync_changes_qdrant.py --weekly
   python 5_Symbols/sync_changes_qdrant.py --since 48
   python 5_Symbols/sync_changes_qdrant.py --weekly --dry-run
+  python 5_Symbols/sync_changes_qdrant.py --watch
+  python 5_Symbols/sync_changes_qdrant.py --git
 
 Automate with cron / launchd:
   Daily  at 2:00 AM:  0 2 * * *  cd ~/projects/qdrant && venv/bin/python 5_Symbols/sync_changes_qdrant.py --daily
@@ -24,87 +51,415 @@ Automate with cron / launchd:
 """
 
 import os
-import sys
 import time
 import json
-import hashlib
 import argparse
+import subprocess
 from datetime import datetime, timedelta
 from pathlib import Path
 
+from content_hash import hash_file
+from repo_scanner import scan_markdown, PathFilter
+from ingest_engine import IngestEngine, ENCODE_BATCH, delete_paths
+from collection_profiles import prepare_collection
+from result_cache import bump_generation
+from outbox import Outbox, replay_outbox, pending_writes
+from sync_state import SyncState
+from qdrant_connection import connect, QDRANT_HOST, QDRANT_PORT
+from embedding_backend import BACKENDS
+
 # ── Configuration ──────────────────────────────────────────────────────────────
-LXC_IP       = "192.168.2.227"
-QDRANT_PORT  = 6333
+LXC_IP       = QDRANT_HOST   # env QDRANT_HOST / config file, see qdrant_connection.py
 COLLECTION   = "mac_repo_index"
 MODEL_NAME   = "all-MiniLM-L6-v2"
 REPO_PATH    = "/Users/rifaterdemsahin/projects/secondbrain/"
-MAX_TEXT_LEN = 8000
-STATE_DIR    = os.path.dirname(os.path.abspath(__file__))
-STATE_FILE   = os.path.join(STATE_DIR, "sync_state.json")
 LOG_DIR      = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STATE_BATCH   = 500    # files per ingest pass / state transaction
+DEBOUNCE_SECS = 2.0    # watch mode: a file must be quiet this long before it is synced
+WATCH_BATCH   = 16     # watch mode: files per sync batch
 # ───────────────────────────────────────────────────────────────────────────────
 
 
-def file_id(full_path: str) -> int:
-    """Deterministic ID matching ingest.py — MD5 of full path mod 10^12."""
-    return int(hashlib.md5(full_path.encode()).hexdigest(), 16) % (10**12)
+def discover_files(repo_path: str, exclude=None) -> dict[str, tuple[float, int]]:
+    """Scan the repo and return {full_path: (mtime, size)} for all .md files (see repo_scanner)."""
+    return scan_markdown(repo_path, exclude=exclude)
 
 
-def load_state() -> dict:
-    """Load previous sync state (tracked file paths & their mod times)."""
-    if os.path.exists(STATE_FILE):
-        with open(STATE_FILE, "r") as f:
-            return json.load(f)
-    return {"last_sync": 0, "files": {}}
+def find_changes(current_files: dict[str, tuple[float, int]], store: SyncState, cutoff: float):
+    """
+    Compare current files against the state store and time cutoff.
 
+    Only files whose mtime / size differ from the stored row come back
+    from the store. A file whose mtime is past the cutoff (or whose size
+    changed) is only a *candidate*: its bytes are hashed and compared with
+    the stored digest, so a `touch`, checkout or sync tool bumping
+    timestamps costs one read instead of a re-embedding. Entries migrated
+    from older state files without a hash fall back to the mtime rule.
 
-def save_state(state: dict):
-    """Persist sync state to disk."""
-    with open(STATE_FILE, "w") as f:
-        json.dump(state, f, indent=2)
+    Returns:
+        new_files:      Files that didn't exist in previous state
+        modified_files: Files whose content changed since the last sync
+        deleted_files:  Files in previous state but no longer on disk
+        hashes:         {path: digest} for every candidate that was hashed
+        changed:        {path: stored entry or None} for every file whose
+                        mtime / size moved — the rows to rewrite afterwards
+    """
+    changed = store.changed_since_sync(current_files)
 
+    new_files = []
+    modified_files = []
+    hashes = {}
 
-def discover_files(repo_path: str) -> dict[str, float]:
-    """Walk the repo and return {full_path: mtime} for all .md files."""
-    files = {}
-    for root, _, filenames in os.walk(repo_path):
-        for fn in filenames:
-            if not fn.endswith(".md"):
-                continue
-            full_path = os.path.join(root, fn)
+    for path in sorted(changed):
+        prev = changed[path]
+        if prev is None:
+            new_files.append(path)
+            continue
+
+        mtime, size = current_files[path]
+        size_changed = prev["size"] is not None and prev["size"] != size
+        if mtime <= cutoff and not size_changed:
+            continue
+        if mtime == prev["mtime"] and not size_changed:
+            continue  # already synced at this exact mtime
+        if not prev["hash"]:
+            modified_files.append(path)
+            continue
+
+        try:
+            _, digest = hash_file(path)
+        except OSError:
+            continue
+        hashes[path] = digest
+        if digest != prev["hash"]:
+            modified_files.append(path)
+
+    deleted_files = store.missing_on_disk(current_files)
+
+    return new_files, modified_files, deleted_files, hashes, changed
+
+
+def file_state_updates(current_files: dict[str, tuple[float, int]], changed: dict,
+                       hashes: dict[str, str], chunks: dict[str, int],
+                       skip: set = frozenset()) -> dict:
+    """
+    Build the state rows to rewrite for the changed files in current_files.
+
+    Digests come from `hashes` (freshly computed) or are carried over from
+    the stored row; chunk counts from `chunks` (files embedded this run).
+    Paths in `skip` (e.g. failed upserts) keep their stored row, or stay
+    untracked if they had none, so they are retried.
+    """
+    updates = {}
+    for path, prev in changed.items():
+        if path in skip or path not in current_files:
+            continue
+        prev = prev or {}
+        mtime, size = current_files[path]
+        updates[path] = {
+            "mtime":  mtime,
+            "size":   size,
+            "hash":   hashes.get(path) or prev.get("hash"),
+            "chunks": chunks.get(path, prev.get("chunks")),
+            "synced": None if path in chunks else prev.get("synced"),   # None → now
+        }
+    return updates
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+#  GIT MODE
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def _git(repo: str, *args) -> bytes:
+    return subprocess.run(["git", "-C", repo, *args], capture_output=True, check=True).stdout
+
+
+def git_snapshot(repo: str, pfilter: PathFilter):
+    """
+    Current HEAD, the untracked non-ignored notes, and the notes with
+    uncommitted (staged or unstaged) changes against HEAD.
+
+    Paths are joined onto repo as given, like discover_files() does, so they
+    match the state keys even when repo is a subdirectory of the work tree.
+
+    Returns:
+        (head, untracked_paths, dirty_paths), or None if repo isn't inside
+        a git work tree with at least one commit
+    """
+    try:
+        head = _git(repo, "rev-parse", "HEAD").decode().strip()
+        others = _git(repo, "ls-files", "-z", "--others", "--exclude-standard", "--", "*.md")
+        edited = _git(repo, "diff", "--name-only", "-z", "--relative", "HEAD", "--", "*.md")
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    untracked = [os.path.join(repo, rel) for rel in os.fsdecode(others).split("\0") if rel]
+    dirty = [os.path.join(repo, rel) for rel in os.fsdecode(edited).split("\0") if rel]
+    return (head, [p for p in untracked if pfilter.included(p)],
+            [p for p in dirty if pfilter.included(p)])
+
+
+def find_git_changes(repo: str, store: SyncState, pfilter: PathFilter, snapshot):
+    """
+    Change detection from git instead of a tree walk.
+
+    Candidates are files git reports as added / modified / renamed since the
+    recorded commit (working tree included), untracked notes, and notes that
+    were dirty at the last sync — an uncommitted edit synced and then
+    reverted leaves no diff against the recorded commit, but the stored row
+    still holds the edit. Each is checked against its stored row, so text
+    synced last run while it was uncommitted isn't embedded again. Deleted
+    and renamed-away paths, and untracked or dirty notes that vanished, are
+    deletes. Only the candidates' rows are read from the store.
+
+    Returns:
+        (new_files, modified_files, deleted_files, hashes, changed,
+        current_files) like find_changes() — current_files covering just
+        the changed files — or None when there is no usable recorded commit
+    """
+    last = store.get("git_head")
+    if not last or snapshot is None:
+        return None
+    _, untracked, _ = snapshot
+    try:
+        out = _git(repo, "diff", "--name-status", "-z", "-M", "--relative", last, "--", "*.md")
+    except (OSError, subprocess.CalledProcessError):
+        return None   # commit no longer exists (rebase / history rewrite)
+
+    candidates, deleted = set(untracked), set()
+    fields = os.fsdecode(out).split("\0")
+    i = 0
+    while i < len(fields) - 1:
+        status = fields[i]
+        if status[:1] in ("R", "C"):
+            old, new = os.path.join(repo, fields[i + 1]), os.path.join(repo, fields[i + 2])
+            i += 3
+            if status[0] == "R":
+                deleted.add(old)
+            candidates.add(new)
+        else:
+            path = os.path.join(repo, fields[i + 1])
+            i += 2
+            (deleted if status == "D" else candidates).add(path)
+
+    for path in store.get("git_untracked", []) + store.get("git_dirty", []):
+        if path not in candidates:
+            (candidates if os.path.exists(path) else deleted).add(path)
+    prev_files = store.entries(candidates | deleted)
+    deleted = sorted(p for p in deleted if p in prev_files)
+
+    current_files, changed = {}, {}
+    new_files, modified_files, hashes = [], [], {}
+    for path in sorted(candidates):
+        if not pfilter.included(path):
+            continue
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        prev = prev_files.get(path)
+        if prev and prev["mtime"] == st.st_mtime and prev["size"] == st.st_size:
+            continue
+        current_files[path] = (st.st_mtime, st.st_size)
+        changed[path] = prev
+        if prev and prev["hash"]:
             try:
-                files[full_path] = os.path.getmtime(full_path)
+                hashes[path] = hash_file(path)[1]
             except OSError:
                 continue
-    return files
+            if hashes[path] == prev["hash"]:
+                continue
+        (modified_files if prev else new_files).append(path)
 
+    return new_files, modified_files, deleted, hashes, changed, current_files
 
-def find_changes(current_files: dict[str, float], state: dict, cutoff: float):
+
+def git_state(snapshot, failed) -> dict:
+    """
+    Run-level values to store after a git-mode run: the untracked and dirty
+    notes, and the synced commit — unless something failed, so the next run
+    sees it again.
     """
-    Compare current files against saved state and time cutoff.
+    if snapshot is None:
+        return {}
+    head, untracked, dirty = snapshot
+    values = {"git_untracked": untracked, "git_dirty": dirty}
+    if not failed:
+        values["git_head"] = head
+    return values
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+#  WATCH MODE
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def expand_paths(paths, store: SyncState, pfilter: PathFilter) -> set[str]:
+    """Turn watcher reports into file paths: directories expand to the notes under them."""
+    out = set()
+    for path in paths:
+        if path.endswith(".md") and not os.path.isdir(path):
+            out.add(path)
+            continue
+        out.update(store.paths_under(path))   # vanished directory
+        if os.path.isdir(path):
+            out.update(p for p in scan_markdown(path) if pfilter.included(p))
+    return out
+
+
+def classify_paths(paths, state_files: dict, pfilter: PathFilter):
+    """
+    Check settled paths against their stored rows (state_files: {path: entry}).
 
     Returns:
-        new_files:      Files that didn't exist in previous state
-        modified_files: Files modified since cutoff
-        deleted_files:  Files in previous state but no longer on disk
+        upserts: Paths whose content changed (or that are new)
+        deletes: Tracked paths that no longer exist
+        touched: {path: state entry} for files whose bytes are unchanged
+                 (only mtime / size moved) — recorded without re-embedding
     """
-    prev_files = state.get("files", {})
+    upserts, deletes, touched = [], [], {}
+    for path in sorted(paths):
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            if path in state_files:
+                deletes.append(path)
+            continue
+        except OSError:
+            continue
+        if not pfilter.included(path):
+            continue
+        prev = state_files.get(path)
+        if prev and prev["mtime"] == st.st_mtime and prev["size"] == st.st_size:
+            continue
+        try:
+            _, digest = hash_file(path)
+        except OSError:
+            continue
+        if prev and prev["hash"] == digest:
+            touched[path] = {**prev, "mtime": st.st_mtime, "size": st.st_size}
+        else:
+            upserts.append(path)
+    return upserts, deletes, touched
+
+
+def watch_changes(args):
+    """Run forever: watch the repo and sync each file once its saves settle."""
+    from embedding_cache import load_encoder
+    from fs_watch import open_watcher, Debouncer
+
+    print(f"  Watching {args.repo} → {args.collection} @ {LXC_IP}:{QDRANT_PORT}")
+    pfilter = PathFilter(args.repo, args.exclude)
+    watcher = open_watcher(args.repo, exclude=args.exclude, backend=args.watch_backend)
+    print(f"  Backend: {watcher.name} | debounce {args.debounce:.1f}s | batch {WATCH_BATCH}")
+
+    client = connect("write", host=LXC_IP, port=QDRANT_PORT)
+    outbox = Outbox()
+    store  = SyncState()
+    model  = None
+    engine = None
+    if not args.dry_run:
+        try:
+            replay_outbox(client)
+            prepare_collection(client, args.collection, args.profile)
+        except Exception as e:
+            print(f"  ⚠️  Qdrant unreachable ({e}) — changes will queue in the outbox")
+        model  = load_encoder(MODEL_NAME, backend=args.backend)
+        engine = IngestEngine(client, model, args.collection, encode_batch=args.encode_batch,
+                              progress_every=0, outbox=outbox)
 
-    new_files = []
-    modified_files = []
-    deleted_files = []
+    # Catch up on whatever changed while nobody was watching
+    dirty = Debouncer(args.debounce)
+    dirty.touch(discover_files(args.repo, exclude=args.exclude).keys() | set(store.paths()), float("-inf"))
+    print(f"  Catch-up check of {len(dirty)} files, then watching (Ctrl+C to stop)\n")
 
-    for path, mtime in current_files.items():
-        if path not in prev_files:
-            new_files.append(path)
-        elif mtime > cutoff:
-            modified_files.append(path)
+    try:
+        while True:
+            paths, rescan = watcher.poll(max(0.05, dirty.wait(time.monotonic())))
+            now = time.monotonic()
+            if rescan:
+                print("  ⚠️  Watcher lost events — reconciling the whole repo")
+                paths = set(paths) | discover_files(args.repo, exclude=args.exclude).keys() | set(store.paths())
+            dirty.touch(paths, now)
+
+            settled = dirty.settled(now)
+            if settled:
+                sync_watched(args, settled, pfilter, client, engine, outbox, store)
+    except KeyboardInterrupt:
+        print("\n  Watch stopped.")
+    finally:
+        watcher.close()
+        outbox.close()
+        store.close()
+        if model is not None and hasattr(model, "flush"):
+            model.flush()
+
+
+def sync_watched(args, paths, pfilter, client, engine, outbox, store):
+    """Sync settled paths in WATCH_BATCH chunks, committing their state rows after each one."""
+    paths = expand_paths(paths, store, pfilter)
+    upserts, deletes, touched = classify_paths(paths, store.entries(paths), pfilter)
+    if not upserts and not deletes:
+        if touched and not args.dry_run:
+            store.apply(touched)
+        return
+
+    stamp = datetime.now().strftime("%H:%M:%S")
+    listing = [f"~ {os.path.relpath(p, args.repo)}" for p in upserts] + \
+              [f"- {os.path.relpath(p, args.repo)}" for p in deletes]
+    for line in listing[:20]:
+        print(f"  {stamp} {line}")
+    if len(listing) > 20:
+        print(f"  {stamp} ... and {len(listing) - 20} more")
+    if args.dry_run:
+        return
 
-    for path in prev_files:
-        if path not in current_files:
-            deleted_files.append(path)
+    upserted, deleted_count, queued, errors = 0, 0, 0, 0
 
-    return new_files, modified_files, deleted_files
+    if deletes:
+        try:
+            delete_paths(client, args.collection, deletes)
+            outbox.supersede(args.collection, deletes)
+            deleted_count = len(deletes)
+        except Exception as e:
+            try:
+                outbox.add_deletes(args.collection, deletes)
+                queued += len(deletes)
+            except Exception:
+                errors += 1
+                deletes = []   # keep their rows so they are retried
+                print(f"    ✗ Delete failed: {e}")
+    store.apply(touched, removed=deletes)
+
+    for i in range(0, len(upserts), WATCH_BATCH):
+        batch = upserts[i:i + WATCH_BATCH]
+        stats = engine.ingest_paths(batch)
+        upserted += stats.files
+        queued   += stats.queued
+        errors   += stats.errors
+        failed = set(stats.failed_paths)
+        updates = {}
+        for path in batch:
+            if path in failed:
+                continue
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            updates[path] = {"mtime": st.st_mtime, "size": st.st_size,
+                             "hash": stats.hashes.get(path), "chunks": stats.chunk_counts.get(path)}
+        store.apply(updates, last_sync=time.time(), last_sync_dt=datetime.now().isoformat())
+        if stats.files:
+            bump_generation(client, args.collection)   # searchable now, not after the whole pass
+
+    if deleted_count and not upserted:
+        bump_generation(client, args.collection)
+    if (upserted or deleted_count) and pending_writes():
+        replay_outbox(client)   # Qdrant is reachable again — flush what queued while it was down
+
+    mark = "✓" if not (errors or queued) else ("⧗" if not errors else "✗")
+    print(f"  {stamp} {mark} {upserted} synced, {deleted_count} deleted, {queued} queued, {errors} errors")
+    with open(os.path.join(LOG_DIR, "sync_changes.log"), "a") as lf:
+        lf.write(f"{datetime.now().isoformat()} | watch | "
+                 f"upserted={upserted} deleted={deleted_count} queued={queued} errors={errors}\n")
 
 
 def main():
@@ -116,14 +471,31 @@ def main():
     mode.add_argument("--daily", action="store_true", default=True, help="Sync last 24h changes (default)")
     mode.add_argument("--weekly", action="store_true", help="Sync last 7 days of changes")
     mode.add_argument("--since", type=float, metavar="HOURS", help="Sync changes from last N hours")
+    mode.add_argument("--watch", action="store_true", help="Keep running and sync files as they are saved")
+    mode.add_argument("--git", action="store_true", help="Sync what git reports changed since the last synced commit")
     parser.add_argument("--dry-run", action="store_true", help="Show changes without syncing")
+    parser.add_argument("--debounce", type=float, default=DEBOUNCE_SECS,
+                        help=f"Watch mode: seconds a file must be quiet before syncing (default: {DEBOUNCE_SECS})")
+    parser.add_argument("--watch-backend", choices=["auto", "inotify", "watchdog", "poll"], default="auto",
+                        help="Watch mode: change notification backend (default: auto)")
     parser.add_argument("--full-state-rebuild", action="store_true", help="Rebuild the state file from current disk")
     parser.add_argument("--repo", default=REPO_PATH, help=f"Path to second brain repo (default: {REPO_PATH})")
     parser.add_argument("--collection", default=COLLECTION, help=f"Qdrant collection (default: {COLLECTION})")
     parser.add_argument("--json", action="store_true", help="Output results as JSON")
-
+    parser.add_argument("--exclude", action="append", default=[], metavar="GLOB",
+                        help="Extra path glob to skip (repeatable; .git, node_modules, .obsidian, … and .gitignore are always honoured)")
+    parser.add_argument("--encode-batch", type=int, default=ENCODE_BATCH, help=f"Texts per forward pass (default: {ENCODE_BATCH})")
+
+    parser.add_argument("--profile", metavar="NAME|FILE",
+                        help="Create / update the collection with this storage profile (see collection_profiles.py)")
+    parser.add_argument("--backend", choices=BACKENDS,
+                        help="Embedding backend (default: QDRANT_EMBED_BACKEND or torch)")
     args = parser.parse_args()
 
+    if args.watch:
+        watch_changes(args)
+        return
+
     # ── Determine time window ──────────────────────────────────────────────
     now = time.time()
     if args.since:
@@ -140,7 +512,10 @@ def main():
     print(f"╔══════════════════════════════════════════════════════╗")
     print(f"║  Qdrant Second Brain — Change Sync                  ║")
     print(f"╠══════════════════════════════════════════════════════╣")
-    print(f"║  Window:     {hours:.0f}h ({cutoff_dt:%Y-%m-%d %H:%M} → {now_dt:%H:%M})       ║")
+    if args.git:
+        print(f"║  Changes:    git diff since the last synced commit   ║")
+    else:
+        print(f"║  Window:     {hours:.0f}h ({cutoff_dt:%Y-%m-%d %H:%M} → {now_dt:%H:%M})       ║")
     print(f"║  Repo:       {os.path.basename(args.repo.rstrip('/')):<38s}  ║")
     print(f"║  Collection: {args.collection:<38s}  ║")
     print(f"║  Qdrant:     {LXC_IP}:{QDRANT_PORT:<30}  ║")
@@ -148,34 +523,71 @@ def main():
         print(f"║  Mode:       DRY RUN (no changes will be made)      ║")
     print(f"╚══════════════════════════════════════════════════════╝\n")
 
-    # ── Discover current files ─────────────────────────────────────────────
-    print("  Scanning repository...")
-    current_files = discover_files(args.repo)
-    print(f"  Found {len(current_files)} .md files on disk\n")
+    store = SyncState()
+    if store.migrated:
+        print(f"  Migrated {store.migrated} entries from sync_state.json → {store.path}\n")
+
+    # ── Git mode: ask git instead of walking the tree ──────────────────────
+    snapshot = git_changes = None
+    if args.git:
+        snapshot = git_snapshot(args.repo, PathFilter(args.repo, args.exclude))
+        if snapshot is None:
+            print(f"  ⚠️  {args.repo} is not a git work tree with commits — scanning instead\n")
+        elif not args.full_state_rebuild:
+            git_changes = find_git_changes(args.repo, store, PathFilter(args.repo, args.exclude), snapshot)
+            if git_changes is None:
+                print("  No synced commit recorded (or it left the history) — full scan now, git diff from the next run\n")
+            else:
+                print(f"  Diffing against synced commit {store.get('git_head')[:12]} "
+                      f"(HEAD {snapshot[0][:12]}, {len(snapshot[1])} untracked, {len(snapshot[2])} dirty)\n")
 
-    # ── Load state & find changes ──────────────────────────────────────────
-    state = load_state()
+    # ── Discover current files ─────────────────────────────────────────────
+    if git_changes:
+        new_files, modified_files, deleted_files, hashes, changed, current_files = git_changes
+    else:
+        print("  Scanning repository...")
+        current_files = discover_files(args.repo, exclude=args.exclude)
+        print(f"  Found {len(current_files)} .md files on disk\n")
 
+    # ── Find changes ───────────────────────────────────────────────────────
     if args.full_state_rebuild:
-        print("  Rebuilding state file from disk...")
-        state["files"] = {p: m for p, m in current_files.items()}
-        state["last_sync"] = now
-        save_state(state)
-        print(f"  State file saved with {len(current_files)} entries\n")
+        print("  Rebuilding state from disk (hashing every file)...")
+        hashes = {}
+        for p in current_files:
+            try:
+                hashes[p] = hash_file(p)[1]
+            except OSError:
+                continue
+        rows = {p: {"mtime": m, "size": sz, "hash": hashes.get(p)} for p, (m, sz) in current_files.items()}
+        store.apply(rows, removed=store.missing_on_disk(current_files), last_sync=now,
+                    **git_state(snapshot, failed=False))
+        print(f"  State saved with {len(current_files)} entries\n")
+        store.close()
         return
 
-    new_files, modified_files, deleted_files = find_changes(current_files, state, cutoff)
+    if not git_changes:
+        new_files, modified_files, deleted_files, hashes, changed = find_changes(current_files, store, cutoff)
 
     print(f"  Changes detected:")
     print(f"    New files:      {len(new_files)}")
     print(f"    Modified files: {len(modified_files)}")
     print(f"    Deleted files:  {len(deleted_files)}")
+    touched_only = len(hashes) - sum(1 for p in modified_files if p in hashes)
+    print(f"    Touched only:   {touched_only} (timestamp changed, content identical)")
     print()
 
     all_to_upsert = new_files + modified_files
 
     if not all_to_upsert and not deleted_files:
         print("  ✓ Nothing to sync — all up to date!")
+        if not args.dry_run and pending_writes():
+            # Still deliver writes parked by earlier offline / failed runs
+            replay_outbox(connect("write", host=LXC_IP, port=QDRANT_PORT))
+        if (changed or snapshot) and not args.dry_run:
+            # Record the new mtimes so touched files aren't re-hashed next run
+            store.apply(file_state_updates(current_files, changed, hashes, {}),
+                        **git_state(snapshot, failed=False))
+        store.close()
         result = {"new": 0, "modified": 0, "deleted": 0, "errors": 0, "hours": hours}
         if args.json:
             print(json.dumps(result))
@@ -205,116 +617,119 @@ def main():
                 print(f"    ... and {len(deleted_files) - 20} more")
 
         print(f"\n  Dry run complete — {len(all_to_upsert)} to upsert, {len(deleted_files)} to delete")
+        store.close()
         return
 
     # ── Connect to Qdrant ──────────────────────────────────────────────────
-    from qdrant_client import QdrantClient
-    from qdrant_client.models import PointStruct, Distance, VectorParams
-    from sentence_transformers import SentenceTransformer
+    from embedding_cache import load_encoder
 
+    outbox = Outbox()
     try:
-        client = QdrantClient(host=LXC_IP, port=QDRANT_PORT, timeout=15)
+        client = connect("write", host=LXC_IP, port=QDRANT_PORT)
         client.get_collections()
     except Exception as e:
-        print(f"  ❌ Cannot connect to Qdrant: {e}")
-        sys.exit(1)
-
-    # Ensure collection exists
-    if not client.collection_exists(args.collection):
-        client.create_collection(
-            collection_name=args.collection,
-            vectors_config=VectorParams(size=384, distance=Distance.COSINE),
-        )
-        print(f"  Created collection: {args.collection}")
+        client = None
+        print(f"  ⚠️  Cannot connect to Qdrant: {e}")
+        print(f"  Changes will be embedded and queued in the outbox ({outbox.path})")
+    else:
+        replay_outbox(client)   # earlier offline / failed writes go first
 
-    print(f"  Loading embedding model ({MODEL_NAME})...")
-    model = SentenceTransformer(MODEL_NAME)
+        # Ensure collection (and its path / chunk_index payload indexes) exists
+        if prepare_collection(client, args.collection, args.profile):
+            print(f"  Created collection: {args.collection}")
+
+    model = load_encoder(MODEL_NAME, backend=args.backend)   # consults the on-disk cache; loads the model on first miss
+    print(f"  Embedding model: {MODEL_NAME}")
 
     # ── Upsert new & modified files ────────────────────────────────────────
+    # Pipelined: reader threads → batched encode → async uploader (see ingest_engine).
+    # Each STATE_BATCH pass commits its state rows, so a crash only redoes the pass in flight.
     upserted = 0
+    queued = 0
     errors = 0
+    failed = set()
 
     if all_to_upsert:
         print(f"\n  Syncing {len(all_to_upsert)} files...")
 
-        # Batch for efficiency
-        batch_points = []
-        batch_size = 50
-
-        for full_path in all_to_upsert:
-            try:
-                with open(full_path, "r", encoding="utf-8", errors="ignore") as f:
-                    text = f.read()
-
-                if not text.strip():
-                    continue
-
-                vector = model.encode(text[:MAX_TEXT_LEN]).tolist()
-                pid = file_id(full_path)
-
-                batch_points.append(PointStruct(
-                    id=pid,
-                    vector=vector,
-                    payload={
-                        "filename": os.path.basename(full_path),
-                        "path": full_path,
-                    },
-                ))
-
-                # Flush batch
-                if len(batch_points) >= batch_size:
-                    client.upsert(collection_name=args.collection, points=batch_points)
-                    upserted += len(batch_points)
-                    print(f"    Synced {upserted} / {len(all_to_upsert)} files...")
-                    batch_points = []
-
-            except Exception as e:
-                errors += 1
-                print(f"    ✗ {os.path.basename(full_path)}: {e}")
-
-        # Flush remaining
-        if batch_points:
-            client.upsert(collection_name=args.collection, points=batch_points)
-            upserted += len(batch_points)
+        engine = IngestEngine(
+            client, model, args.collection,
+            encode_batch=args.encode_batch,
+            progress_every=50,
+            outbox=outbox,
+            progress=lambda s: print(f"    Synced {upserted + s.files} / {len(all_to_upsert)} files... "
+                                     f"({s.files_per_sec:.1f} files/s)"),
+        )
+        for i in range(0, len(all_to_upsert), STATE_BATCH):
+            batch = all_to_upsert[i:i + STATE_BATCH]
+            stats = engine.ingest_paths(batch)
+            upserted += stats.files
+            queued += stats.queued
+            errors += stats.errors
+            failed.update(stats.failed_paths)
+            hashes.update(stats.hashes)
+            store.apply(file_state_updates({p: current_files[p] for p in batch}, changed, hashes,
+                                           stats.chunk_counts, skip=failed))
+            for path in stats.failed_paths:
+                print(f"    ✗ {os.path.basename(path)}")
+            print(f"    {stats.summary()}")
 
     # ── Delete removed files ───────────────────────────────────────────────
     deleted_count = 0
     if deleted_files:
         print(f"\n  Removing {len(deleted_files)} deleted files from Qdrant...")
-        ids_to_delete = [file_id(p) for p in deleted_files]
-
         try:
-            client.delete(collection_name=args.collection, points_selector=ids_to_delete)
-            deleted_count = len(ids_to_delete)
+            if client is None:
+                raise ConnectionError("Qdrant offline")
+            # One filtered delete removes every chunk of every deleted file
+            delete_paths(client, args.collection, deleted_files)
+            outbox.supersede(args.collection, deleted_files)
+            deleted_count = len(deleted_files)
         except Exception as e:
-            errors += 1
-            print(f"    ✗ Bulk delete failed: {e}")
+            try:
+                outbox.add_deletes(args.collection, deleted_files)
+                queued += len(deleted_files)
+                print(f"    ⧗ Bulk delete queued in the outbox ({e})")
+            except Exception:
+                errors += 1
+                failed.update(deleted_files)
+                print(f"    ✗ Bulk delete failed: {e}")
+
+    # Invalidate the search server's result cache
+    if client is not None and (upserted or deleted_count):
+        bump_generation(client, args.collection)
+    outbox.close()
 
     # ── Update state ───────────────────────────────────────────────────────
-    state["files"] = {p: m for p, m in current_files.items()}
-    state["last_sync"] = now
-    state["last_sync_dt"] = now_dt.isoformat()
-    save_state(state)
+    # Deletes, touched-only files and the run-level values in one last transaction
+    synced = set(all_to_upsert)
+    rest = {p: sig for p, sig in current_files.items() if p in changed and p not in synced}
+    store.apply(file_state_updates(rest, changed, hashes, {}, skip=failed),
+                removed=[p for p in deleted_files if p not in failed],
+                last_sync=now, last_sync_dt=now_dt.isoformat(), **git_state(snapshot, failed))
+    store.close()
 
     # ── Summary ────────────────────────────────────────────────────────────
     print(f"\n  ════════════════════════════════════════")
     print(f"  ✓ Sync complete!")
     print(f"    Upserted:  {upserted}")
     print(f"    Deleted:   {deleted_count}")
+    print(f"    Queued:    {queued}")
     print(f"    Errors:    {errors}")
-    print(f"    State saved to: {STATE_FILE}")
+    print(f"    State saved to: {store.path}")
     print(f"  ════════════════════════════════════════\n")
 
     # ── Write log ──────────────────────────────────────────────────────────
     log_file = os.path.join(LOG_DIR, "sync_changes.log")
     with open(log_file, "a") as lf:
         lf.write(f"{now_dt.isoformat()} | window={hours:.0f}h | "
-                 f"upserted={upserted} deleted={deleted_count} errors={errors}\n")
+                 f"upserted={upserted} deleted={deleted_count} queued={queued} errors={errors}\n")
 
     if args.json:
         print(json.dumps({
             "upserted": upserted,
             "deleted": deleted_count,
+            "queued": queued,
             "errors": errors,
             "hours": hours,
             "new_files": len(new_files),
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+SQLite-backed sync state for sync_changes_qdrant.py.
+
+Replaces the monolithic sync_state.json, which was parsed in full on every
+run and rewritten in full (28k paths, indent=2) at the end of it — and left
+corrupt if the process died halfway through the write. Here every file is
+one row, writes touch only the rows that changed and each batch commits in
+one transaction (WAL mode), so a crash loses at most the batch in flight.
+
+Per file: mtime, size, content hash, chunk count (the file's points are
+chunk_id(path, 0 .. chunks-1), see point_ids()) and when it was last
+synced. Run-level values (last_sync, git_head, …) live in a small key /
+value table.
+
+Change detection never pulls the whole table into Python: the current
+disk listing is staged into a temp table and two indexed joins return the
+rows whose mtime / size differ ("changed since the last sync") and the
+tracked paths that are gone ("missing on disk").
+
+The first open migrates an existing sync_state.json (bare-mtime entries
+from older versions included); the JSON file itself is left untouched.
+
+CLI:
+    python 5_Symbols/sync_state.py                      # summary
+    python 5_Symbols/sync_state.py --synced-since 24    # files synced in the last 24h
+    python 5_Symbols/sync_state.py --missing            # tracked files no longer on disk
+
+Usage (as a module):
+    from sync_state import SyncState
+    store   = SyncState()
+    changed = store.changed_since_sync(current_files)   # {path: stored entry or None}
+    store.apply({path: {"mtime": m, "size": s, "hash": h}}, removed=[...], last_sync=time.time())
+"""
+
+import os
+import json
+import time
+import sqlite3
+import argparse
+import threading
+
+# ── Configuration ──────────────────────────────────────────────────────────────
+STATE_DB      = os.environ.get(
+    "QDRANT_SYNC_STATE",
+    os.path.join(os.path.expanduser("~"), ".cache", "qdrant_secondbrain", "sync_state.sqlite"),
+)
+LEGACY_JSON   = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sync_state.json")
+QUERY_BATCH   = 900    # paths per IN (...) query — below SQLite's variable limit
+# ───────────────────────────────────────────────────────────────────────────────
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path    TEXT    PRIMARY KEY,
+    mtime   REAL    NOT NULL,
+    size    INTEGER,
+    hash    TEXT,
+    chunks  INTEGER,              -- points chunk_id(path, 0 .. chunks-1)
+    synced  REAL                  -- when this row was last written
+);
+CREATE INDEX IF NOT EXISTS files_synced ON files (synced);
+CREATE TABLE IF NOT EXISTS meta (
+    key     TEXT    PRIMARY KEY,
+    value   TEXT    NOT NULL      -- JSON
+);
+"""
+
+_FIELDS = ("mtime", "size", "hash", "chunks", "synced")
+
+
+def _row(row) -> dict:
+    return dict(zip(_FIELDS, row))
+
+
+class SyncState:
+    """
+    Per-file sync state in SQLite.
+
+    Args:
+        path:   SQLite file (default: STATE_DB)
+        legacy: sync_state.json to migrate from when the database is new
+                (None to skip)
+    """
+
+    def __init__(self, path: str = STATE_DB, legacy: str = LEGACY_JSON):
+        self.path    = path
+        self._lock   = threading.Lock()
+        self._staged = None
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        if legacy and self.get("schema") is None:
+            self.migrated = self.migrate_json(legacy) if os.path.exists(legacy) else 0
+            self.set(schema=1)
+        else:
+            self.migrated = 0
+
+    def close(self):
+        self._db.close()
+
+    # ── Run-level values ───────────────────────────────────────────────────
+    def get(self, key: str, default=None):
+        with self._lock:
+            row = self._db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set(self, **values):
+        """Store run-level values (JSON-serialisable) in one transaction."""
+        with self._lock, self._db:
+            self._set(values)
+
+    def _set(self, values: dict):
+        self._db.executemany(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+            [(k, json.dumps(v)) for k, v in values.items()])
+
+    # ── Reads ──────────────────────────────────────────────────────────────
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+
+    def paths(self) -> list[str]:
+        with self._lock:
+            return [p for (p,) in self._db.execute("SELECT path FROM files")]
+
+    def entries(self, paths) -> dict[str, dict]:
+        """{path: entry} for those of paths that are tracked."""
+        paths = list(paths)
+        out = {}
+        with self._lock:
+            for i in range(0, len(paths), QUERY_BATCH):
+                chunk = paths[i:i + QUERY_BATCH]
+                rows = self._db.execute(
+                    f"SELECT path, {', '.join(_FIELDS)} FROM files "
+                    f"WHERE path IN ({', '.join('?' * len(chunk))})", chunk)
+                out.update((r[0], _row(r[1:])) for r in rows)
+        return out
+
+    def paths_under(self, directory: str) -> list[str]:
+        """Tracked paths below directory — a primary-key range scan."""
+        prefix = directory.rstrip(os.sep) + os.sep
+        upper  = prefix[:-1] + chr(ord(os.sep) + 1)
+        with self._lock:
+            return [p for (p,) in self._db.execute(
+                "SELECT path FROM files WHERE path >= ? AND path < ?", (prefix, upper))]
+
+    def synced_since(self, ts: float) -> list[str]:
+        """Paths written at or after ts (uses the synced index)."""
+        with self._lock:
+            return [p for (p,) in self._db.execute(
+                "SELECT path FROM files WHERE synced >= ? ORDER BY synced", (ts,))]
+
+    def _stage(self, current_files: dict):
+        """Load {path: (mtime, size)} into the temp `disk` table, once per listing."""
+        if self._staged is current_files:
+            return
+        self._db.execute("CREATE TEMP TABLE IF NOT EXISTS disk "
+                         "(path TEXT PRIMARY KEY, mtime REAL, size INTEGER)")
+        with self._db:
+            self._db.execute("DELETE FROM disk")
+            self._db.executemany("INSERT OR REPLACE INTO disk VALUES (?, ?, ?)",
+                                 ((p, m, s) for p, (m, s) in current_files.items()))
+        self._staged = current_files
+
+    def changed_since_sync(self, current_files: dict) -> dict[str, dict]:
+        """
+        Paths of a disk listing whose mtime or size differ from what was synced.
+
+        Args:
+            current_files: {path: (mtime, size)}, e.g. from repo_scanner
+
+        Returns:
+            {path: stored entry} for changed files, {path: None} for new ones —
+            unchanged files never leave SQLite
+        """
+        with self._lock:
+            self._stage(current_files)
+            rows = self._db.execute(
+                f"SELECT d.path, f.path, {', '.join('f.' + c for c in _FIELDS)} "
+                "FROM disk d LEFT JOIN files f ON f.path = d.path "
+                "WHERE f.path IS NULL OR f.mtime != d.mtime OR f.size IS NOT d.size").fetchall()
+        return {r[0]: (_row(r[2:]) if r[1] is not None else None) for r in rows}
+
+    def missing_on_disk(self, current_files: dict) -> list[str]:
+        """Tracked paths absent from a disk listing (candidates for deletion)."""
+        with self._lock:
+            self._stage(current_files)
+            return [p for (p,) in self._db.execute(
+                "SELECT path FROM files WHERE path NOT IN (SELECT path FROM disk) ORDER BY path")]
+
+    def point_ids(self, path: str) -> list[int]:
+        """Qdrant point IDs the last sync of path wrote (empty if untracked or unknown)."""
+        from ingest_engine import chunk_id
+        entry = self.entries([path]).get(path)
+        return [chunk_id(path, i) for i in range(entry["chunks"] or 0)] if entry else []
+
+    # ── Writes ─────────────────────────────────────────────────────────────
+    def apply(self, updates: dict[str, dict] = None, removed=(), **values):
+        """
+        Write one batch in a single transaction.
+
+        Args:
+            updates: {path: entry}; missing keys default to None, "synced"
+                     defaults to now
+            removed: Paths to forget
+            values:  Run-level values to store alongside (last_sync=…)
+        """
+        now = time.time()
+        rows = [
+            (path, e["mtime"], e.get("size"), e.get("hash"), e.get("chunks"), e.get("synced") or now)
+            for path, e in (updates or {}).items()
+        ]
+        with self._lock, self._db:
+            self._db.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?)", rows)
+            self._db.executemany("DELETE FROM files WHERE path = ?", [(p,) for p in removed])
+            self._set(values)
+        self._staged = None   # disk listing no longer matches what was compared
+
+    def migrate_json(self, path: str) -> int:
+        """Import a sync_state.json; returns the number of file entries."""
+        with open(path, "r") as f:
+            state = json.load(f)
+        updates = {}
+        for p, value in state.get("files", {}).items():
+            if not isinstance(value, dict):
+                value = {"mtime": value}   # older state files stored a bare mtime float
+            updates[p] = {**value, "synced": state.get("last_sync") or None}
+        self.apply(updates, **{k: v for k, v in state.items() if k != "files"})
+        return len(updates)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect the change-sync state store")
+    parser.add_argument("--path", default=STATE_DB, help=f"State database (default: {STATE_DB})")
+    parser.add_argument("--synced-since", type=float, metavar="HOURS", help="List files synced in the last N hours")
+    parser.add_argument("--missing", action="store_true", help="List tracked files that no longer exist on disk")
+    args = parser.parse_args()
+
+    store = SyncState(args.path)
+    if store.migrated:
+        print(f"  ✓ Migrated {store.migrated} entries from {LEGACY_JSON}")
+
+    if args.synced_since is not None:
+        for p in store.synced_since(time.time() - args.synced_since * 3600):
+            print(p)
+    elif args.missing:
+        paths = store.paths()
+        for p in paths:
+            if not os.path.exists(p):
+                print(p)
+    else:
+        last = store.get("last_sync") or 0
+        print(f"  {args.path}")
+        print(f"    Files tracked: {len(store)}")
+        print(f"    Last sync:     {store.get('last_sync_dt') or (time.ctime(last) if last else 'never')}")
+        if store.get("git_head"):
+            print(f"    Git commit:    {store.get('git_head')}")
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
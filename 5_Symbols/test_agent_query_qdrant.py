@@ -0,0 +1,37 @@
+"""Tests for agent_query_qdrant helpers against QdrantClient(":memory:")."""
+
+import pytest
+from qdrant_client import QdrantClient
+from qdrant_client.models import PointStruct
+
+import agent_query_qdrant
+from benchmark import HashEncoder
+from ingest_engine import IngestEngine, ensure_collection, file_id
+
+COLLECTION = "agent_test"
+
+pytestmark = pytest.mark.filterwarnings("ignore:Payload indexes:UserWarning")
+
+
+@pytest.fixture
+def client(monkeypatch):
+    c = QdrantClient(":memory:")
+    ensure_collection(c, COLLECTION)
+    monkeypatch.setattr(agent_query_qdrant, "_client", c)
+    return c
+
+
+def test_search_by_filename_lists_each_note_once(client):
+    long_text = "".join(f"## Part {i}\n\n" + " ".join(f"w{i}_{j}" for j in range(150)) + "\n\n"
+                        for i in range(4))
+    engine = IngestEngine(client, HashEncoder(), COLLECTION, progress_every=0)
+    stats = engine.ingest_documents([("/vault/docker-setup.md", long_text.encode(), None),
+                                     ("/vault/other.md", b"# Other\n\ntext\n", None)])
+    assert stats.chunk_counts["/vault/docker-setup.md"] > 1
+    # A note ingested before chunking: one point, no chunk_index
+    client.upsert(COLLECTION, points=[PointStruct(
+        id=file_id("/vault/docker-old.md"), vector=HashEncoder().encode("old").tolist(),
+        payload={"filename": "docker-old.md", "path": "/vault/docker-old.md"})])
+
+    found = agent_query_qdrant.search_by_filename("docker", collection=COLLECTION)
+    assert sorted(r["path"] for r in found) == ["/vault/docker-old.md", "/vault/docker-setup.md"]
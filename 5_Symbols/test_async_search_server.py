@@ -0,0 +1,25 @@
+"""Tests for async_search_server: request validation in handle()."""
+
+import json
+import asyncio
+
+import pytest
+
+from async_search_server import Request, handle
+
+
+def post(path: str, body: bytes):
+    response = asyncio.run(handle(Request("POST", path, "HTTP/1.1", {}, body)))
+    head, _, payload = response.partition(b"\r\n\r\n")
+    return int(head.split()[1]), json.loads(payload)
+
+
+@pytest.mark.parametrize("body", [b"[]", b'"docker"', b"42", b"{not json", b"{}", b'{"query": 5}',
+                                  b'{"query": "x", "limit": "many"}'])
+def test_bad_search_bodies_are_client_errors(body):
+    status, payload = post("/search", body)
+    assert status == 400 and "error" in payload
+
+
+def test_bad_batch_body_is_a_client_error():
+    assert post("/search/batch", b"[]")[0] == 400
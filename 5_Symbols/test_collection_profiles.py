@@ -0,0 +1,110 @@
+"""Tests for collection_profiles: profile resolution, the update plan and bulk loads."""
+
+import json
+from types import SimpleNamespace
+
+import pytest
+from qdrant_client import QdrantClient
+from qdrant_client.models import CollectionStatus, Disabled, ScalarQuantization
+
+import collection_profiles
+from collection_profiles import load_profile, plan_changes, search_setting, bulk_load, DEFAULTS, INDEXING_THRESHOLD
+
+
+def test_profiles_resolve_from_names_files_and_dicts(tmp_path):
+    assert load_profile("default") == DEFAULTS
+    assert load_profile("compact")["quantization"] == "scalar"
+    path = tmp_path / "mine.json"
+    path.write_text(json.dumps({"m": 32}))
+    assert load_profile(str(path)) == {**DEFAULTS, "m": 32}
+    assert load_profile({"hnsw_ef": 64})["hnsw_ef"] == 64
+
+
+@pytest.mark.parametrize("profile, message", [
+    ("no-such-profile", "Unknown collection profile"),
+    ({"colour": "blue"}, "Unknown profile key"),
+    ({"quantization": "pq"}, "quantization must be"),
+])
+def test_bad_profiles_are_rejected(profile, message):
+    with pytest.raises(ValueError, match=message):
+        load_profile(profile)
+
+
+def test_matching_collection_needs_no_update():
+    assert plan_changes(load_profile("compact"), load_profile("compact")) == ({}, [], [])
+
+
+def test_plan_turns_on_quantization_and_moves_vectors_to_disk():
+    kwargs, changes, rebuild = plan_changes(load_profile("default"), load_profile("compact"))
+    assert set(kwargs) == {"vectors_config", "quantization_config"}
+    assert kwargs["vectors_config"][""].on_disk is True
+    assert isinstance(kwargs["quantization_config"], ScalarQuantization)
+    assert changes == ["on_disk False → True", "quantization none → scalar"] and rebuild == []
+
+
+def test_plan_disables_quantization_and_flags_datatype_for_rebuild():
+    kwargs, changes, rebuild = plan_changes(load_profile("tiny"), load_profile("default"))
+    assert kwargs["quantization_config"] == Disabled.DISABLED
+    assert kwargs["hnsw_config"].m == 16
+    assert rebuild == ["datatype float16 → float32"]
+
+
+def test_search_setting_carries_only_search_time_keys():
+    assert search_setting(load_profile("default")) == {}
+    assert search_setting(load_profile({"quantization": "binary", "oversampling": 3.0, "hnsw_ef": 96})) == {
+        "hnsw_ef": 96, "quantization": {"rescore": True, "oversampling": 3.0}}
+
+
+# ── Bulk load ──────────────────────────────────────────────────────────────────
+
+class ServerStub:
+    """Just enough of a server-mode client for bulk_load: an indexing threshold and a status."""
+
+    def __init__(self, threshold, green_after: int = 0):
+        self.threshold   = threshold
+        self.green_after = green_after
+        self.updates     = []
+
+    def get_collection(self, collection):
+        status = CollectionStatus.GREEN if self.green_after <= 0 else CollectionStatus.YELLOW
+        self.green_after -= 1
+        return SimpleNamespace(status=status,
+                               config=SimpleNamespace(optimizer_config=SimpleNamespace(indexing_threshold=self.threshold)))
+
+    def update_collection(self, collection_name, optimizers_config):
+        self.threshold = optimizers_config.indexing_threshold
+        self.updates.append(self.threshold)
+
+
+@pytest.fixture
+def no_sleep(monkeypatch):
+    monkeypatch.setattr(collection_profiles.time, "sleep", lambda s: None)
+
+
+def test_bulk_load_suspends_indexing_and_restores_it(no_sleep):
+    client = ServerStub(threshold=10000, green_after=2)
+    with bulk_load(client, "notes", progress=None) as timings:
+        assert client.threshold == 0
+    assert client.updates == [0, 10000]
+    assert timings["ready"] is True and {"upload_s", "index_s"} <= timings.keys()
+
+
+def test_bulk_load_restores_indexing_after_an_error(no_sleep):
+    client = ServerStub(threshold=10000)
+    with pytest.raises(RuntimeError):
+        with bulk_load(client, "notes", progress=None):
+            raise RuntimeError("upload failed")
+    assert client.threshold == 10000
+
+
+def test_interrupted_bulk_load_falls_back_to_the_default_threshold(no_sleep):
+    client = ServerStub(threshold=0)                 # a killed bulk load left it at 0
+    with bulk_load(client, "notes", progress=None):
+        pass
+    assert client.threshold == INDEXING_THRESHOLD
+
+
+def test_bulk_load_is_a_no_op_for_embedded_clients():
+    with bulk_load(QdrantClient(":memory:"), "notes", progress=None) as timings:
+        pass
+    assert timings == {}
@@ -0,0 +1,98 @@
+"""Tests for embedding_cache: the persistent chunk-vector cache and the query-vector LRU."""
+
+import numpy as np
+import pytest
+
+from benchmark import HashEncoder
+from embedding_cache import CachedEncoder, EmbeddingCache, QueryVectorCache
+
+MODEL = "test-model"
+DIM   = 16
+
+
+class CountingModel(HashEncoder):
+    """HashEncoder that records every text it is asked to encode."""
+
+    def __init__(self):
+        super().__init__(DIM)
+        self.seen = []
+
+    def encode(self, texts, batch_size: int = 32, **kwargs):
+        self.seen.extend(texts)
+        return super().encode(texts)
+
+
+@pytest.fixture
+def make_encoder(tmp_path):
+    def make(max_mb: int = 16):
+        model = CountingModel()
+        cache = EmbeddingCache(MODEL, dim=DIM, cache_dir=str(tmp_path), max_mb=max_mb)
+        return CachedEncoder(MODEL, loader=lambda: model, cache=cache, dim=DIM), model
+    return make
+
+
+def test_model_runs_only_on_misses_and_once_per_text(make_encoder):
+    encoder, model = make_encoder()
+    first = encoder.encode(["alpha", "beta", "alpha"])
+    assert model.seen == ["alpha", "beta"]
+    again = encoder.encode(["beta", "alpha\r\n", "gamma  "])    # same text after normalisation
+    assert model.seen == ["alpha", "beta", "gamma  "]
+    np.testing.assert_array_equal(again[:2], first[[1, 0]])
+    assert encoder.encode([]).shape == (0, DIM)
+
+
+def test_flushed_vectors_are_shared_with_the_next_process(make_encoder):
+    encoder, _ = make_encoder()
+    vectors = encoder.encode(["one note", "another note"])
+    encoder.flush()
+
+    later, model = make_encoder()                                # fresh index read from disk
+    np.testing.assert_array_equal(later.encode(["one note", "another note"]), vectors)
+    assert model.seen == []
+    assert later.cache.stats()["hits"] == 2
+
+
+def test_flush_evicts_least_recently_used_entries(make_encoder):
+    encoder, _ = make_encoder(max_mb=1)
+    encoder.cache.max_entries = 10
+    encoder.encode([f"old {i}" for i in range(8)])
+    encoder.flush()
+    encoder.encode([f"new {i}" for i in range(8)])
+    encoder.flush()
+
+    cache = encoder.cache
+    assert len(cache._index) == 9                                # KEEP_RATIO of 10
+    assert len(cache.get_many(list(cache._index))) == 9
+    later, model = make_encoder()
+    later.encode([f"new {i}" for i in range(8)])
+    assert model.seen == []                                      # the recent entries survived compaction
+
+
+# ── Query-vector cache ─────────────────────────────────────────────────────────
+
+def test_query_cache_normalises_queries_and_evicts_lru():
+    cache = QueryVectorCache(MODEL, max_entries=2)
+    calls = []
+
+    def encode(q):
+        calls.append(q)
+        return np.full(DIM, len(calls), dtype=np.float32)
+
+    cache.get_or_encode("Docker  setup", encode)
+    cache.get_or_encode("docker setup ", encode)                # same query after normalisation
+    assert calls == ["Docker  setup"]
+    cache.put("b", np.zeros(DIM))
+    cache.get("docker setup")
+    cache.put("c", np.zeros(DIM))                               # evicts "b", the least recently used
+    assert cache.get("b") is None and cache.get("docker setup") is not None
+    assert cache.stats()["hits"] == 3
+
+
+def test_query_cache_persists_per_model(tmp_path):
+    path = str(tmp_path / "queries.npz")
+    cache = QueryVectorCache(MODEL, persist_path=path)
+    cache.put("proxmox lxc", np.arange(DIM))
+    cache.flush()
+
+    np.testing.assert_array_equal(QueryVectorCache(MODEL, persist_path=path).get("Proxmox LXC"), np.arange(DIM))
+    assert QueryVectorCache("other-model", persist_path=path).get("proxmox lxc") is None
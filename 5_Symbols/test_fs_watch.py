@@ -0,0 +1,79 @@
+"""Tests for fs_watch: the inotify and polling backends and the debouncer."""
+
+import os
+import sys
+import time
+
+import pytest
+
+from fs_watch import Debouncer, InotifyWatcher, PollingWatcher
+
+
+def collect(watcher, want, timeout: float = 2.0) -> set:
+    """Poll until every path in want has been reported (or timeout); return all reports."""
+    seen = set()
+    deadline = time.monotonic() + timeout
+    while not want <= seen and time.monotonic() < deadline:
+        paths, _ = watcher.poll(0.05)
+        seen |= paths
+    return seen
+
+
+@pytest.fixture
+def inotify(tmp_path):
+    if not sys.platform.startswith("linux"):
+        pytest.skip("inotify is Linux-only")
+    watcher = InotifyWatcher(str(tmp_path))
+    yield watcher
+    watcher.close()
+
+
+def test_inotify_reports_saved_notes_only(inotify, tmp_path):
+    note = tmp_path / "a.md"
+    note.write_text("# A\n")
+    (tmp_path / "a.txt").write_text("ignored\n")
+    assert collect(inotify, {str(note)}) == {str(note)}
+
+
+def test_inotify_reports_and_watches_new_directories(inotify, tmp_path):
+    folder = tmp_path / "Projects"
+    folder.mkdir()
+    assert str(folder) in collect(inotify, {str(folder)})
+
+    note = folder / "b.md"
+    note.write_text("# B\n")                       # only seen if the new directory is watched
+    assert str(note) in collect(inotify, {str(note)})
+
+
+def test_inotify_reports_moved_in_trees_and_removed_directories(inotify, tmp_path, tmp_path_factory):
+    outside = tmp_path_factory.mktemp("outside")
+    (outside / "c.md").write_text("# C\n")
+    moved = tmp_path / "moved"
+    os.rename(outside, moved)
+    assert {str(moved), str(moved / "c.md")} <= collect(inotify, {str(moved), str(moved / "c.md")})
+
+    os.remove(moved / "c.md")
+    os.rmdir(moved)
+    assert str(moved) in collect(inotify, {str(moved)})
+
+
+def test_polling_reports_modified_and_deleted_notes(tmp_path):
+    note = tmp_path / "a.md"
+    note.write_text("# A\n")
+    watcher = PollingWatcher(str(tmp_path), interval=0)
+    note.write_text("# A, longer now\n")
+    assert watcher.poll(0)[0] == {str(note)}
+    note.unlink()
+    assert watcher.poll(0)[0] == {str(note)}
+    assert watcher.poll(0)[0] == set()
+
+
+def test_debouncer_releases_a_path_once_it_is_quiet():
+    pending = Debouncer(quiet=2.0)
+    pending.touch(["a.md", "b.md"], now=10.0)
+    pending.touch(["a.md"], now=11.0)              # a second save restarts a.md's timer
+    assert pending.wait(11.5) == pytest.approx(0.5)
+    assert pending.settled(11.9) == []
+    assert pending.settled(12.0) == ["b.md"]
+    assert pending.settled(13.0) == ["a.md"]
+    assert len(pending) == 0 and pending.wait(13.0, idle=60.0) == 60.0
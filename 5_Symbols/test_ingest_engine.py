@@ -0,0 +1,142 @@
+"""Tests for ingest_engine: the AIMD upsert batcher and the pipeline, on QdrantClient(":memory:")."""
+
+import pytest
+from qdrant_client import QdrantClient
+
+from benchmark import HashEncoder
+from ingest_engine import AdaptiveBatcher, IngestEngine, ensure_collection, chunk_id
+
+COLLECTION = "engine_test"
+
+pytestmark = pytest.mark.filterwarnings("ignore:Payload indexes:UserWarning")
+
+
+# ── AdaptiveBatcher ────────────────────────────────────────────────────────────
+
+def test_batcher_grows_additively_when_fast():
+    b = AdaptiveBatcher(initial=256, minimum=32, maximum=2048, target_latency=0.5)
+    b.observe(0.1)
+    assert b.size == 256 + 64
+    b.observe(0.1)
+    assert b.size == 320 + 80
+
+
+def test_batcher_halves_when_slow():
+    b = AdaptiveBatcher(initial=256, minimum=32, maximum=2048, target_latency=0.5)
+    b.observe(0.6)
+    assert b.size == 128
+
+
+def test_batcher_holds_inside_the_band():
+    b = AdaptiveBatcher(initial=256, target_latency=0.5)
+    b.observe(0.3)
+    assert b.size == 256
+
+
+def test_batcher_stays_within_bounds():
+    b = AdaptiveBatcher(initial=64, minimum=32, maximum=100, target_latency=0.5)
+    for _ in range(10):
+        b.observe(0.01)
+    assert b.size == 100
+    for _ in range(10):
+        b.observe(5.0)
+    assert b.size == 32
+
+
+def test_small_batches_grow_by_at_least_the_minimum():
+    b = AdaptiveBatcher(initial=32, minimum=32, maximum=2048, target_latency=0.5)
+    b.observe(0.0)
+    assert b.size == 64
+
+
+# ── Pipeline ───────────────────────────────────────────────────────────────────
+
+class CountingClient:
+    """Passes calls to a real client and records the size of every upsert."""
+
+    def __init__(self, client):
+        self.client  = client
+        self.batches = []
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+    def upsert(self, **kwargs):
+        self.batches.append(len(kwargs["points"]))
+        return self.client.upsert(**kwargs)
+
+
+@pytest.fixture
+def client():
+    c = QdrantClient(":memory:")
+    ensure_collection(c, COLLECTION)
+    return c
+
+
+def docs(n: int, words: int = 20):
+    for i in range(n):
+        body = " ".join(f"word{i}_{j}" for j in range(words))
+        yield f"/vault/n{i:03d}.md", f"# Note {i}\n\n{body}\n".encode(), None
+
+
+def test_ingest_documents_upserts_every_chunk(client):
+    engine = IngestEngine(client, HashEncoder(), COLLECTION, progress_every=0, readers=2)
+    stats = engine.ingest_documents(docs(40))
+    assert (stats.files, stats.errors) == (40, 0)
+    assert client.count(COLLECTION).count == stats.chunks == 40
+    assert set(stats.latencies) == {"read", "encode", "upsert"}
+
+
+def test_upload_batches_grow_from_the_initial_size(client):
+    counting = CountingClient(client)
+    engine = IngestEngine(counting, HashEncoder(), COLLECTION, progress_every=0, upsert_batch=8)
+    engine.ingest_documents(docs(30))
+    assert client.count(COLLECTION).count == 30
+    assert counting.batches[0] == 8
+    assert max(counting.batches) > 8     # fast local upserts → additive increase
+
+
+def test_upload_batches_respect_the_byte_cap(client, monkeypatch):
+    import ingest_engine
+    monkeypatch.setattr(ingest_engine, "_point_bytes", lambda point: 3 * 2**20)   # 8 MB cap → 2 per request
+    counting = CountingClient(client)
+    engine = IngestEngine(counting, HashEncoder(), COLLECTION, progress_every=0, upsert_batch=64)
+    engine.ingest_documents(docs(9))
+    assert counting.batches == [2, 2, 2, 2, 1]
+
+
+def test_shorter_file_prunes_its_stale_chunks(client):
+    engine = IngestEngine(client, HashEncoder(), COLLECTION, progress_every=0)
+    path = "/vault/long.md"
+    long_text = "".join(f"## Part {i}\n\n" + " ".join(f"w{i}_{j}" for j in range(150)) + "\n\n"
+                        for i in range(4))
+    first = engine.ingest_documents([(path, long_text.encode(), None)])
+    assert first.chunk_counts[path] > 1
+    engine.ingest_documents([(path, b"# Short\n\nnow it is a short note\n", None)])
+    points, _ = client.scroll(COLLECTION, limit=100)
+    assert [p.id for p in points] == [chunk_id(path, 0)]
+
+
+def test_failing_source_is_re_raised_after_the_pipeline_drains(client):
+    def source():
+        yield from docs(5)
+        raise RuntimeError("listing failed")
+
+    engine = IngestEngine(client, HashEncoder(), COLLECTION, progress_every=0)
+    with pytest.raises(RuntimeError, match="listing failed"):
+        engine.ingest_documents(source())
+    assert client.count(COLLECTION).count == 5   # what was read before the failure is kept
+
+
+def test_failing_path_source_does_not_hang_the_readers(client, tmp_path):
+    note = tmp_path / "a.md"
+    note.write_text("# A\n\nsome text\n")
+
+    def paths():
+        yield str(note)
+        raise OSError("scan failed")
+
+    engine = IngestEngine(client, HashEncoder(), COLLECTION, progress_every=0, readers=3)
+    with pytest.raises(OSError, match="scan failed"):
+        engine.ingest_paths(paths())
+    assert client.count(COLLECTION).count == 1
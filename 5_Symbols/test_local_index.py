@@ -0,0 +1,146 @@
+"""Tests for local_index: building, atomic swaps, exact search and the background health probe."""
+
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+from qdrant_client import QdrantClient
+from qdrant_client.models import PointStruct
+
+from benchmark import HashEncoder
+from ingest_engine import ensure_collection, chunk_id
+from local_index import QdrantHealth, build_local_index, current_path, index_info, load_local_index
+
+COLLECTION = "local_test"
+ENCODER    = HashEncoder()
+
+pytestmark = pytest.mark.filterwarnings("ignore:Payload indexes:UserWarning")
+
+
+def wait_for(predicate, timeout: float = 2.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return predicate()
+
+
+def point(path: str, index: int = 0, text: str = None) -> PointStruct:
+    text = text or f"{path} chunk {index}"
+    return PointStruct(id=chunk_id(path, index), vector=ENCODER.encode(text).tolist(),
+                       payload={"path": path, "filename": path, "chunk_index": index, "text": text})
+
+
+@pytest.fixture
+def client():
+    c = QdrantClient(":memory:")
+    ensure_collection(c, COLLECTION, dim=ENCODER.dim)
+    c.upsert(COLLECTION, points=[point(f"n{i}.md", j) for i in range(20) for j in range(3)], wait=True)
+    return c
+
+
+class Probing:
+    """Passes calls to a real client; every scroll page first loads the live local index."""
+
+    def __init__(self, client, index_dir):
+        self.client    = client
+        self.index_dir = index_dir
+        self.seen      = []
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+    def scroll(self, **kwargs):
+        index = load_local_index(COLLECTION, self.index_dir)
+        self.seen.append(None if index is None else len(index))
+        return self.client.scroll(**kwargs)
+
+
+# ── Build and search ───────────────────────────────────────────────────────────
+
+def test_search_returns_each_note_once_best_chunk_first(client, tmp_path):
+    meta = build_local_index(client, COLLECTION, str(tmp_path))
+    assert (meta["count"], meta["dim"]) == (60, ENCODER.dim)
+    index = load_local_index(COLLECTION, str(tmp_path))
+    results = index.search(ENCODER.encode("n7.md chunk 2"), limit=5)
+    assert results[0]["path"] == "n7.md" and results[0]["text"] == "n7.md chunk 2"
+    assert len({r["path"] for r in results}) == len(results) == 5
+    assert [r["path"] for r in index.search(ENCODER.encode("n7.md chunk 2"), 5, {"path": ["n3.md"]})] == ["n3.md"]
+
+
+def test_rebuild_switches_versions_atomically(client, tmp_path):
+    index_dir = str(tmp_path)
+    build_local_index(client, COLLECTION, index_dir, page=16)
+    first = load_local_index(COLLECTION, index_dir)
+    client.upsert(COLLECTION, points=[point("new.md")], wait=True)
+
+    probing = Probing(client, index_dir)
+    build_local_index(probing, COLLECTION, index_dir, page=16)
+    assert probing.seen == [60] * len(probing.seen)          # the old copy stays live during the build
+    second = load_local_index(COLLECTION, index_dir)
+    assert second is not first and len(second) == 61 == index_info(COLLECTION, index_dir)["count"]
+    assert first.search(ENCODER.encode("n1.md chunk 0"), 1)[0]["path"] == "n1.md"   # open reader still works
+
+    build_local_index(client, COLLECTION, index_dir)
+    versions = sorted(p.name for p in (tmp_path / COLLECTION).iterdir() if p.is_dir())
+    assert len(versions) == 2                                  # current + previous
+    assert current_path(COLLECTION, index_dir).endswith(versions[-1])
+
+
+def test_missing_index_loads_as_none(tmp_path):
+    assert load_local_index(COLLECTION, str(tmp_path)) is None
+    assert index_info(COLLECTION, str(tmp_path)) is None
+
+
+# ── Health probe ───────────────────────────────────────────────────────────────
+
+@pytest.fixture
+def readyz():
+    """A local /readyz that answers 200 after a short delay while `state["up"]`."""
+    state = {"up": True, "probes": 0}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            state["probes"] += 1
+            time.sleep(0.2)
+            self.send_response(200 if state["up"] else 503)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server.server_address[1], state
+    server.shutdown()
+    server.server_close()
+
+
+def test_ok_never_waits_on_a_probe(readyz):
+    port, state = readyz
+    health = QdrantHealth("127.0.0.1", port, ttl=0.05, timeout=1.0)
+    state["up"] = False
+    started = time.perf_counter()
+    for _ in range(50):
+        health.ok()
+    assert time.perf_counter() - started < 0.1          # each probe takes 0.2 s
+    assert wait_for(lambda: health.ok() is False)
+
+
+def test_background_probe_tracks_recovery(readyz):
+    port, state = readyz
+    health = QdrantHealth("127.0.0.1", port, ttl=0.05, timeout=1.0)
+    state["up"] = False
+    health.ok()
+    assert wait_for(lambda: not health.up)
+    state["up"] = True
+    assert wait_for(lambda: health.ok())
+    assert state["probes"] >= 2
+
+
+def test_check_probes_synchronously():
+    health = QdrantHealth("127.0.0.1", 1, timeout=0.2)      # nothing listens on port 1
+    assert health.check() is False
+    assert health.up is False
@@ -0,0 +1,71 @@
+"""Tests for md_chunker: byte offsets, heading trails, fences and the chunk cap."""
+
+from md_chunker import chunk_markdown
+
+NOTE = """# Café notes
+
+Intro paragraph about the café — naïve prices in €, twice as long as needed
+so it is not folded into the next section by the minimum-size rule.
+
+## Grinder
+
+```bash
+# not a heading, inside a fence
+grind --fine
+```
+
+The grinder paragraph mentions Ünïcödé so byte and str offsets diverge.
+
+### Burrs
+
+Conical burrs — smaller, quieter, slower. Flat burrs are the opposite.
+"""
+
+
+def test_offsets_are_utf8_byte_offsets_of_the_chunk_text():
+    raw = NOTE.encode("utf-8")
+    chunks = chunk_markdown(NOTE, title="cafe.md", max_tokens=40)
+    assert len(chunks) > 1
+    for c in chunks:
+        assert raw[c["start"]:c["end"]].decode("utf-8").strip() == c["text"]
+
+
+def test_offsets_are_ordered_and_do_not_overlap():
+    chunks = chunk_markdown(NOTE, max_tokens=40)
+    for prev, cur in zip(chunks, chunks[1:]):
+        assert prev["start"] < prev["end"] <= cur["start"] < cur["end"]
+    assert chunks[-1]["end"] <= len(NOTE.encode("utf-8"))
+
+
+def test_heading_trail_and_fenced_comment():
+    chunks = chunk_markdown(NOTE, title="cafe.md", max_tokens=40)
+    headings = [c["heading"] for c in chunks]
+    assert "Café notes › Grinder › Burrs" in headings
+    assert not any("not a heading" in h for h in headings)
+    burrs = next(c for c in chunks if c["heading"].endswith("Burrs"))
+    assert burrs["embed_text"].startswith("cafe.md › Café notes › Grinder › Burrs\n\n")
+
+
+def test_long_paragraph_is_split_within_budget_and_capped():
+    text = "# Log\n\n" + " ".join(f"entry{i} happened." for i in range(3000))
+    chunks = chunk_markdown(text, max_tokens=64, max_chunks=5)
+    assert len(chunks) == 5
+    raw = text.encode("utf-8")
+    for c in chunks:
+        assert raw[c["start"]:c["end"]].decode("utf-8").strip() == c["text"]
+
+
+def test_blank_note_has_no_chunks():
+    assert chunk_markdown("  \n\n") == []
+
+
+def test_huge_unpunctuated_paragraph_is_chunked_in_linear_time():
+    import time
+    from md_chunker import estimate_tokens
+
+    text = "word " * 160_000                       # ~800 KB, no sentence boundary
+    t0 = time.perf_counter()
+    chunks = chunk_markdown(text, max_tokens=64, max_chunks=64)
+    assert time.perf_counter() - t0 < 3.0           # was ~26 s when every cut rescanned the rest
+    assert len(chunks) == 64
+    assert all(estimate_tokens(c["text"]) <= 64 for c in chunks)
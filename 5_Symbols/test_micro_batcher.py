@@ -0,0 +1,64 @@
+"""Tests for micro_batcher: batching, error fan-out and cancelled requests."""
+
+import threading
+
+import pytest
+
+from micro_batcher import MicroBatcher
+
+
+class Gate:
+    """encode_batch that blocks until released and records every batch it is given."""
+
+    def __init__(self):
+        self.batches = []
+        self.entered = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self, texts):
+        self.batches.append(list(texts))
+        self.entered.set()
+        self.release.wait(2)
+        return [len(t) for t in texts]
+
+
+def test_concurrent_submits_share_a_forward_pass():
+    gate = Gate()
+    batcher = MicroBatcher(gate, window_ms=50, max_batch=8)
+    futures = [batcher.submit("x" * i) for i in range(1, 6)]
+    gate.release.set()
+    assert [f.result(2) for f in futures] == [1, 2, 3, 4, 5]
+    assert gate.batches == [["x", "xx", "xxx", "xxxx", "xxxxx"]]
+    assert batcher.stats()["queries"] == 5
+
+
+def test_encode_error_reaches_every_waiter_and_the_worker_survives():
+    calls = []
+
+    def encode(texts):
+        calls.append(texts)
+        if len(calls) == 1:
+            raise RuntimeError("model crashed")
+        return [0] * len(texts)
+
+    batcher = MicroBatcher(encode, window_ms=20)
+    futures = [batcher.submit("a"), batcher.submit("b")]
+    for f in futures:
+        with pytest.raises(RuntimeError, match="model crashed"):
+            f.result(2)
+    assert batcher.encode("c") == 0
+
+
+def test_cancelled_requests_are_skipped_and_do_not_kill_the_worker():
+    gate = Gate()
+    batcher = MicroBatcher(gate, window_ms=1, max_batch=1)
+    first = batcher.submit("first")
+    assert gate.entered.wait(2)                 # worker is busy with "first"
+    queued = [batcher.submit("gone"), batcher.submit("kept")]
+    assert queued[0].cancel()
+    gate.release.set()
+
+    assert first.result(2) == 5
+    assert queued[1].result(2) == 4
+    assert ["gone"] not in gate.batches
+    assert batcher.encode("after") == 5         # worker thread still alive
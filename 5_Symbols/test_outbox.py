@@ -0,0 +1,160 @@
+"""Tests for outbox: queue compaction and replay order against QdrantClient(":memory:")."""
+
+import pytest
+from qdrant_client import QdrantClient
+from qdrant_client.models import PointStruct
+
+from benchmark import HashEncoder
+from ingest_engine import IngestEngine, ensure_collection, chunk_id
+from outbox import Outbox
+
+COLLECTION = "outbox_test"
+ENCODER    = HashEncoder()
+
+# Local mode has no payload indexes; ensure_collection() asks for them anyway
+pytestmark = pytest.mark.filterwarnings("ignore:Payload indexes:UserWarning")
+
+
+def point(path: str, index: int = 0, text: str = None) -> PointStruct:
+    text = text or f"{path} chunk {index}"
+    return PointStruct(id=chunk_id(path, index), vector=ENCODER.encode(text).tolist(),
+                       payload={"path": path, "chunk_index": index, "text": text})
+
+
+class Recorder:
+    """Wraps a client and logs the write calls made through it."""
+
+    def __init__(self, client):
+        self.client = client
+        self.calls  = []
+
+    def __getattr__(self, name):
+        attr = getattr(self.client, name)
+        if name not in ("upsert", "delete"):
+            return attr
+
+        def call(**kwargs):
+            if name == "upsert":
+                self.calls.append(("upsert", sorted(p.payload["path"] for p in kwargs["points"])))
+            else:
+                self.calls.append(("delete", None))
+            return attr(**kwargs)
+        return call
+
+
+class Down:
+    """A client whose writes always fail, like an unreachable Qdrant."""
+
+    def upsert(self, **kwargs):
+        raise ConnectionError("qdrant down")
+
+    delete = upsert
+
+
+@pytest.fixture
+def box(tmp_path):
+    b = Outbox(str(tmp_path / "outbox.sqlite"))
+    yield b
+    b.close()
+
+
+@pytest.fixture
+def client():
+    c = QdrantClient(":memory:")
+    ensure_collection(c, COLLECTION, dim=ENCODER.dim)
+    return c
+
+
+def stored(client) -> dict:
+    points, _ = client.scroll(COLLECTION, limit=100, with_payload=True)
+    return {p.id: p.payload["text"] for p in points}
+
+
+def test_newer_upsert_of_a_point_replaces_the_queued_one(box):
+    box.add_points(COLLECTION, [point("a.md", text="first")])
+    box.add_points(COLLECTION, [point("a.md", text="second"), point("a.md", 1)])
+    assert len(box) == 2
+    assert box.pending()[COLLECTION]["upserts"] == 2
+    assert box.pending()[COLLECTION]["files"] == 1
+
+
+def test_delete_drops_queued_upserts_of_the_path(box):
+    box.add_points(COLLECTION, [point("a.md"), point("a.md", 1), point("b.md")])
+    box.add_deletes(COLLECTION, ["a.md"])
+    pending = box.pending()[COLLECTION]
+    assert (pending["upserts"], pending["deletes"]) == (1, 1)
+
+
+def test_supersede_forgets_everything_queued_for_the_paths(box):
+    box.add_points(COLLECTION, [point("a.md"), point("b.md")])
+    box.add_deletes(COLLECTION, ["c.md"])
+    box.supersede(COLLECTION, ["a.md", "c.md"])
+    pending = box.pending()[COLLECTION]
+    assert (pending["upserts"], pending["deletes"]) == (1, 0)
+
+
+def test_replay_deletes_before_upserts_and_keeps_the_write_order(box, client):
+    client.upsert(COLLECTION, points=[point("moved.md", text="stale"), point("gone.md")], wait=True)
+
+    box.add_deletes(COLLECTION, ["moved.md"])                  # delete, then re-create
+    box.add_points(COLLECTION, [point("moved.md", text="fresh")])
+    box.add_points(COLLECTION, [point("gone.md", text="never sent")])
+    box.add_deletes(COLLECTION, ["gone.md"])                   # upsert then delete → delete only
+
+    rec = Recorder(client)
+    assert box.replay(rec) == {COLLECTION: (1, 2)}
+    assert [c[0] for c in rec.calls] == ["delete", "upsert"]
+    assert rec.calls[1][1] == ["moved.md"]
+    assert stored(client) == {chunk_id("moved.md", 0): "fresh"}
+    assert len(box) == 0
+
+
+def test_failed_ingest_is_queued_and_replayed_later(box, client):
+    docs = [(f"/vault/note{i}.md", f"# Note {i}\n\nbody of note {i}\n".encode(), None) for i in range(5)]
+    engine = IngestEngine(Down(), ENCODER, COLLECTION, outbox=box, progress_every=0)
+    stats = engine.ingest_documents(docs)
+    assert (stats.files, stats.queued, stats.errors) == (0, 5, 0)
+    assert box.pending()[COLLECTION]["files"] == 5
+
+    box.replay(client)
+    assert len(box) == 0
+    assert sorted(stored(client)) == sorted(chunk_id(path, 0) for path, _, _ in docs)
+
+
+class FailsFirst:
+    """Passes calls to a real client; the first upsert raises, like a dropped connection."""
+
+    def __init__(self, client):
+        self.client = client
+        self.failed = False
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+    def upsert(self, **kwargs):
+        if not self.failed:
+            self.failed = True
+            raise ConnectionError("connection reset")
+        return self.client.upsert(**kwargs)
+
+
+def test_later_batches_of_a_file_keep_its_queued_chunks(box, client):
+    path = "/vault/long.md"
+    text = "".join(f"## Part {i}\n\n" + " ".join(f"w{i}_{j}" for j in range(150)) + "\n\n" for i in range(6))
+    engine = IngestEngine(FailsFirst(client), ENCODER, COLLECTION, outbox=box,
+                          progress_every=0, upsert_batch=2)
+    stats = engine.ingest_documents([(path, text.encode(), None)])
+    chunks = stats.chunk_counts[path]
+    assert chunks >= 4
+    assert box.pending()[COLLECTION]["upserts"] == 2          # chunks 0-1 stay queued
+
+    box.replay(client)
+    assert sorted(stored(client)) == sorted(chunk_id(path, i) for i in range(chunks))
+
+
+def test_a_direct_write_supersedes_writes_queued_by_an_earlier_run(box, client):
+    box.add_points(COLLECTION, [point("/vault/a.md", text="old")])
+    engine = IngestEngine(client, ENCODER, COLLECTION, outbox=box, progress_every=0)
+    engine.ingest_documents([("/vault/a.md", b"# A\n\nnew text of the note\n", None)])
+    assert len(box) == 0
+    assert "new text" in stored(client)[chunk_id("/vault/a.md", 0)]
@@ -0,0 +1,44 @@
+"""Tests for pre_commit_qdrant_sync: staged-change parsing, blob reads and SYMBOLS_DIR."""
+
+import subprocess
+
+import pytest
+
+import pre_commit_qdrant_sync as hook
+
+
+def git(*args, **kwargs) -> str:
+    return subprocess.run(["git", *args], capture_output=True, text=True, check=True, **kwargs).stdout.strip()
+
+
+@pytest.fixture
+def repo(tmp_path, monkeypatch):
+    git("init", "-q", str(tmp_path))
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def test_staged_changes_and_blob_shas(repo):
+    (repo / "a.md").write_text("# A\n")
+    (repo / "b.txt").write_text("not a note\n")
+    git("add", "a.md", "b.txt")
+    changed, deleted = hook.get_staged_files()
+    assert changed == [("a.md", git("rev-parse", ":a.md"))] and deleted == []
+
+
+def test_missing_blobs_are_reported(repo, capsys):
+    (repo / "a.md").write_text("# A\n")
+    sha = git("hash-object", "-w", "a.md")
+    missing = []
+    assert list(hook.read_blobs([sha, "0" * 40, sha], missing)) == [(sha, b"# A\n"), (sha, b"# A\n")]
+    assert missing == ["0" * 40]
+    assert "0" * 40 in capsys.readouterr().out
+
+
+def test_symbols_dir_follows_the_repository(repo, monkeypatch):
+    monkeypatch.delenv("QDRANT_SYMBOLS_DIR", raising=False)
+    (repo / "notes").mkdir()
+    monkeypatch.chdir(repo / "notes")
+    assert hook._symbols_dir() == str(repo.resolve() / "5_Symbols")
+    monkeypatch.setenv("QDRANT_SYMBOLS_DIR", "/opt/shared")
+    assert hook._symbols_dir() == "/opt/shared"
@@ -0,0 +1,77 @@
+"""Tests for qdrant_connection: retries of idempotent writes, call stats and config layering."""
+
+import json
+import asyncio
+
+import pytest
+
+import qdrant_connection
+from qdrant_connection import ManagedClient, ManagedAsyncClient, load_config, call_stats
+
+
+class Flaky:
+    """Fails the first `failures` calls of every method with `error`, then returns the call count."""
+
+    def __init__(self, failures: int, error=ConnectionError("connection reset")):
+        self.failures = failures
+        self.error    = error
+        self.calls    = 0
+
+    def _call(self, *args, **kwargs):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise self.error
+        return self.calls
+
+    upsert = query_points = _call
+
+
+def stat(method: str, key: str) -> int:
+    return call_stats().get(method, {}).get(key, 0)
+
+
+def test_idempotent_write_is_retried_on_transient_errors():
+    before = stat("upsert", "retries")
+    flaky = Flaky(failures=2)
+    assert ManagedClient(flaky, retries=3, backoff=0).upsert(collection_name="c", points=[]) == 3
+    assert stat("upsert", "retries") == before + 2
+
+
+def test_retries_give_up_and_the_error_is_counted():
+    errors = stat("upsert", "errors")
+    flaky = Flaky(failures=5)
+    with pytest.raises(ConnectionError):
+        ManagedClient(flaky, retries=2, backoff=0).upsert()
+    assert flaky.calls == 3
+    assert stat("upsert", "errors") == errors + 1
+
+
+@pytest.mark.parametrize("method, error", [
+    ("query_points", ConnectionError("reset")),     # not in RETRY_METHODS
+    ("upsert", ValueError("bad request")),          # not transient
+])
+def test_no_retry_for_reads_or_permanent_errors(method, error):
+    flaky = Flaky(failures=1, error=error)
+    with pytest.raises(type(error)):
+        getattr(ManagedClient(flaky, retries=3, backoff=0), method)()
+    assert flaky.calls == 1
+
+
+def test_async_client_retries_too():
+    class AsyncFlaky(Flaky):
+        async def upsert(self, *args, **kwargs):
+            return self._call()
+
+    flaky = AsyncFlaky(failures=1)
+    assert asyncio.run(ManagedAsyncClient(flaky, retries=1, backoff=0).upsert()) == 2
+
+
+def test_env_overrides_the_config_file(tmp_path, monkeypatch):
+    path = tmp_path / "qdrant.json"
+    path.write_text(json.dumps({"host": "10.0.0.5", "retries": 5, "timeouts": {"search": 3}}))
+    monkeypatch.delenv("QDRANT_TIMEOUT", raising=False)
+    monkeypatch.delenv("QDRANT_RETRIES", raising=False)
+    monkeypatch.setenv("QDRANT_HOST", "qdrant.lan")
+    config = load_config(str(path))
+    assert (config["host"], config["retries"]) == ("qdrant.lan", 5)
+    assert config["timeouts"] == {**qdrant_connection.DEFAULTS["timeouts"], "search": 3}
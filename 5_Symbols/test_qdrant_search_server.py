@@ -0,0 +1,83 @@
+"""Tests for qdrant_search_server: /search/batch parsing and results, and the /health report."""
+
+import pytest
+from qdrant_client import QdrantClient
+from qdrant_client.models import PointStruct
+
+import qdrant_search_server as server
+from benchmark import HashEncoder
+from embedding_cache import QueryVectorCache
+from ingest_engine import ensure_collection, chunk_id
+
+COLLECTION = "server_test"
+ENCODER    = HashEncoder()
+
+pytestmark = pytest.mark.filterwarnings("ignore:Payload indexes:UserWarning")
+
+
+def point(path: str, index: int, text: str) -> PointStruct:
+    return PointStruct(id=chunk_id(path, index), vector=ENCODER.encode(text).tolist(),
+                       payload={"path": path, "filename": path, "chunk_index": index, "text": text})
+
+
+@pytest.fixture
+def offline_server(monkeypatch):
+    """The module's globals pointed at an in-memory Qdrant and HashEncoder."""
+    client = QdrantClient(":memory:")
+    ensure_collection(client, COLLECTION, dim=ENCODER.dim)
+    monkeypatch.setattr(server, "_client", client)
+    monkeypatch.setattr(server, "_model", ENCODER)
+    monkeypatch.setattr(server, "_query_cache", QueryVectorCache("test"))
+    monkeypatch.setattr(server, "_batcher", None)
+    monkeypatch.setattr(server, "LOCAL_FALLBACK", False)
+    return client
+
+
+# ── /search/batch ──────────────────────────────────────────────────────────────
+
+@pytest.mark.parametrize("body, message", [
+    ([], "JSON object"),
+    ({}, "non-empty list"),
+    ({"queries": ["a"] * (server.MAX_BATCH_QUERIES + 1)}, "at most"),
+    ({"queries": [42]}, "string or an object"),
+    ({"queries": [{"query": "  "}]}, "non-empty text"),
+    ({"queries": [{"query": "a", "limit": "ten"}]}, "integer"),
+    ({"queries": [{"query": "a", "filter": ["x"]}]}, "filter"),
+])
+def test_parse_batch_rejects_bad_bodies(body, message):
+    with pytest.raises(ValueError, match=message):
+        server.parse_batch(body)
+
+
+def test_parse_batch_applies_defaults_and_clamps_limits():
+    body = {"queries": ["docker", {"query": " lxc ", "limit": 500, "filter": {"path": "a.md"}}], "limit": 0}
+    assert server.parse_batch(body) == (["docker", "lxc"], [1, 100], [None, {"path": "a.md"}], server.COLLECTION)
+
+
+def test_batch_returns_one_result_per_note_and_refills_short_queries(offline_server):
+    long_note = [point("long.md", i, f"docker compose volume part {i}") for i in range(12)]
+    offline_server.upsert(COLLECTION, points=long_note + [
+        point("short.md", 0, "docker compose quick start"),
+        point("other.md", 0, "proxmox lxc networking"),
+    ], wait=True)
+
+    out = server.do_search_batch({"collection": COLLECTION, "queries": [
+        {"query": "docker compose volume", "limit": 2},              # long.md fills the over-fetch
+        {"query": "proxmox lxc", "limit": 3, "filter": {"path": "other.md"}},
+    ]})
+    assert [r["path"] for r in out[0]["results"]] == ["long.md", "short.md"]
+    assert [r["path"] for r in out[1]["results"]] == ["other.md"]
+
+
+# ── /health ────────────────────────────────────────────────────────────────────
+
+def test_health_report_builds_nothing(monkeypatch, tmp_path):
+    import local_index
+    monkeypatch.setattr(local_index, "INDEX_DIR", str(tmp_path))
+    for name in ("_query_cache", "_batcher", "_result_cache", "_health"):
+        monkeypatch.setattr(server, name, None)
+
+    report = server.health_report()
+    assert report["status"] == "ok"
+    assert report["query_cache"] is report["batcher"] is report["result_cache"] is report["qdrant_up"] is None
+    assert (server._query_cache, server._batcher, server._result_cache, server._health) == (None,) * 4
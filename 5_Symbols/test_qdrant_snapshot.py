@@ -0,0 +1,83 @@
+"""Tests for qdrant_snapshot: export / import round trips between in-memory clients."""
+
+import json
+import zipfile
+
+import numpy as np
+import pytest
+from qdrant_client import QdrantClient
+from qdrant_client.models import PointStruct
+
+from benchmark import HashEncoder
+from ingest_engine import ensure_collection, chunk_id
+from qdrant_snapshot import export_collection, import_snapshot, read_manifest
+
+COLLECTION = "snapshot_test"
+ENCODER    = HashEncoder()
+
+pytestmark = pytest.mark.filterwarnings("ignore:Payload indexes:UserWarning")
+
+
+@pytest.fixture
+def source():
+    client = QdrantClient(":memory:")
+    ensure_collection(client, COLLECTION, dim=ENCODER.dim)
+    client.upsert(COLLECTION, points=[
+        PointStruct(id=chunk_id(f"n{i}.md", 0), vector=ENCODER.encode(f"note {i} über").tolist(),
+                    payload={"path": f"n{i}.md", "chunk_index": 0, "text": f"note {i} über"})
+        for i in range(50)
+    ], wait=True)
+    return client
+
+
+def points_of(client, collection: str = COLLECTION) -> dict:
+    points, _ = client.scroll(collection, limit=1000, with_payload=True, with_vectors=True)
+    return {p.id: (p.payload, np.asarray(p.vector)) for p in points}
+
+
+@pytest.mark.parametrize("dtype, tolerance", [("float32", 1e-7), ("float16", 2e-3)])
+def test_round_trip_restores_ids_payloads_and_vectors(source, tmp_path, dtype, tolerance):
+    path = str(tmp_path / "brain.qsnap")
+    manifest = export_collection(source, COLLECTION, path, dtype=dtype, page=16, progress=None)
+    assert (manifest["count"], manifest["dim"], manifest["dtype"]) == (50, ENCODER.dim, dtype)
+    assert read_manifest(path) == manifest
+
+    target = QdrantClient(":memory:")
+    assert import_snapshot(target, path, collection="restored", batch=7, progress=None) == 50
+    before, after = points_of(source), points_of(target, "restored")
+    assert before.keys() == after.keys()
+    for pid, (payload, vector) in before.items():
+        assert after[pid][0] == payload
+        np.testing.assert_allclose(after[pid][1], vector, atol=tolerance)
+
+
+class DeletesDuringExport:
+    """Passes calls to a real client; one point disappears between the vector and payload passes."""
+
+    def __init__(self, client, victim):
+        self.client = client
+        self.victim = victim
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+    def retrieve(self, **kwargs):
+        self.client.delete(COLLECTION, points_selector=[self.victim], wait=True)
+        return self.client.retrieve(**kwargs)
+
+
+def test_point_deleted_mid_export_is_skipped_on_import(source, tmp_path):
+    path = str(tmp_path / "brain.qsnap")
+    victim = chunk_id("n3.md", 0)
+    export_collection(DeletesDuringExport(source, victim), COLLECTION, path, progress=None)
+    target = QdrantClient(":memory:")
+    assert import_snapshot(target, path, progress=None) == 49
+    assert victim not in points_of(target)
+
+
+def test_import_rejects_other_files(tmp_path):
+    path = str(tmp_path / "other.zip")
+    with zipfile.ZipFile(path, "w") as zf:
+        zf.writestr("manifest.json", json.dumps({"format": "something-else"}))
+    with pytest.raises(ValueError, match="not a v1"):
+        import_snapshot(QdrantClient(":memory:"), path, progress=None)
@@ -0,0 +1,71 @@
+"""Tests for repo_scanner: .gitignore negation / anchoring, shared by iter_scan and PathFilter."""
+
+import os
+
+import pytest
+
+from repo_scanner import scan_markdown, PathFilter
+
+GITIGNORE = """\
+# comment
+private-*.md
+!private-ok.md
+/top.md
+docs/*.md
+drafts/
+!drafts/keep.md
+**/tmp
+"""
+
+FILES = {
+    # path                          expected in the scan
+    "top.md":                       False,   # /top.md is anchored to the root
+    "sub/top.md":                   True,
+    "docs/a.md":                    False,   # docs/*.md has a slash → anchored
+    "sub/docs/a.md":                True,
+    "private-x.md":                 False,
+    "private-ok.md":                True,    # negated
+    "sub/private-y.md":             False,   # unanchored: matches at any depth
+    "sub/private-z.md":             True,    # re-included by sub/.gitignore
+    "drafts/keep.md":               False,   # parent directory excluded: git can't re-include
+    "a/b/tmp/c.md":                 False,
+    "a/b/notes.md":                 True,
+    ".obsidian/workspace.md":       False,   # EXCLUDE_GLOBS
+    "plain.txt":                    False,   # not a note
+}
+
+
+@pytest.fixture
+def repo(tmp_path):
+    for rel in FILES:
+        path = tmp_path / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(f"# {rel}\n")
+    (tmp_path / ".gitignore").write_text(GITIGNORE)
+    (tmp_path / "sub" / ".gitignore").write_text("!private-z.md\n")
+    return str(tmp_path)
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_scan_honours_gitignore(repo, workers):
+    found = {os.path.relpath(p, repo).replace(os.sep, "/") for p in scan_markdown(repo, workers=workers)}
+    assert found == {rel for rel, kept in FILES.items() if kept}
+
+
+@pytest.mark.parametrize("rel,kept", sorted(FILES.items()))
+def test_path_filter_agrees_with_scan(repo, rel, kept):
+    assert PathFilter(repo).included(os.path.join(repo, rel)) is kept
+
+
+def test_gitignore_can_be_disabled(repo):
+    found = {os.path.relpath(p, repo).replace(os.sep, "/") for p in scan_markdown(repo, gitignore=False)}
+    assert "top.md" in found and "drafts/keep.md" in found
+    assert ".obsidian/workspace.md" not in found
+
+
+def test_extra_exclude_globs(repo):
+    pfilter = PathFilter(repo, exclude=["a/*"])
+    assert not pfilter.included(os.path.join(repo, "a/b/notes.md"))
+    assert pfilter.included(os.path.join(repo, "sub/top.md"))
+    assert pfilter.included(os.path.join(repo, "a"), is_dir=True)
+    assert not pfilter.included(os.path.join(repo, "a/b"), is_dir=True)
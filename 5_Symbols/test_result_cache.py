@@ -0,0 +1,113 @@
+"""Tests for result_cache: LRU behaviour and generation-based invalidation."""
+
+import time
+
+import numpy as np
+import pytest
+from qdrant_client import QdrantClient
+
+import result_cache
+from result_cache import ResultCache, GenerationWatcher, bump_generation, read_generations
+
+
+class CountingClient:
+    """Passes calls to a real client and counts them by method name."""
+
+    def __init__(self, client):
+        self.client = client
+        self.calls  = {}
+
+    def __getattr__(self, name):
+        attr = getattr(self.client, name)
+
+        def call(*args, **kwargs):
+            self.calls[name] = self.calls.get(name, 0) + 1
+            return attr(*args, **kwargs)
+        return call
+
+
+@pytest.fixture(autouse=True)
+def marker_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(result_cache, "GENERATION_DIR", str(tmp_path / "generations"))
+
+
+@pytest.fixture
+def client():
+    return CountingClient(QdrantClient(":memory:"))
+
+
+def wait_for(predicate, timeout: float = 2.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return predicate()
+
+
+def test_cache_serves_only_under_the_same_token():
+    cache = ResultCache()
+    key = ResultCache.key(np.ones(4), 10, "notes")
+    cache.put(key, ("g1", None), ["r"])
+    assert cache.get(key, ("g1", None)) == ["r"]
+    assert cache.get(key, ("g2", None)) is None          # stale entry is dropped
+    assert cache.get(key, ("g1", None)) is None
+    assert (cache.hits, cache.stale, cache.misses) == (1, 1, 2)
+
+
+def test_cache_key_covers_limit_collection_and_filters():
+    v = np.ones(4)
+    keys = {ResultCache.key(v, 10, "a"), ResultCache.key(v, 5, "a"), ResultCache.key(v, 10, "b"),
+            ResultCache.key(v, 10, "a", {"path": "x.md"})}
+    assert len(keys) == 4
+    assert ResultCache.key(v, 10, "a", {"x": 1, "y": 2}) == ResultCache.key(v, 10, "a", {"y": 2, "x": 1})
+
+
+def test_cache_evicts_least_recently_used():
+    cache = ResultCache(max_entries=2)
+    cache.put("a", 0, 1)
+    cache.put("b", 0, 2)
+    cache.get("a", 0)
+    cache.put("c", 0, 3)
+    assert cache.get("b", 0) is None
+    assert cache.get("a", 0) == 1 and cache.get("c", 0) == 3
+
+
+def test_local_bump_changes_the_token_at_once(client):
+    watcher = GenerationWatcher(lambda: client, poll_secs=60)
+    watcher.prime(["notes"])
+    before = watcher.token("notes")
+    bump_generation(client, "notes")
+    assert watcher.token("notes") != before
+
+
+def test_remote_bump_reaches_the_token_through_the_poll(client):
+    watcher = GenerationWatcher(lambda: client, poll_secs=0.05)
+    watcher.prime(["notes"])
+    assert watcher.token("notes")[0] == 0
+    generation = bump_generation(client, "notes")
+    result_cache.os.remove(result_cache._marker_file("notes"))   # as if written on another machine
+    assert wait_for(lambda: watcher.token("notes")[0] == generation)
+    assert read_generations(client, ["notes", "other"]) == {"notes": generation, "other": 0}
+
+
+def test_tokens_make_no_network_calls(client):
+    bump_generation(client, "notes")
+    watcher = GenerationWatcher(lambda: client, poll_secs=60)
+    watcher.prime(["notes"])                     # so the first hits after startup count
+    first = watcher.token("notes")
+    assert first[0] is not None
+
+    calls = dict(client.calls)
+    for _ in range(100):
+        assert watcher.token("notes") == first
+    assert client.calls == calls
+
+
+def test_polls_check_the_marker_collection_exists_only_once(client):
+    bump_generation(client, "notes")
+    before = dict(client.calls)
+    watcher = GenerationWatcher(lambda: client, poll_secs=0.02)
+    watcher.prime(["notes"])
+    assert wait_for(lambda: client.calls["retrieve"] >= before.get("retrieve", 0) + 5)
+    assert client.calls["collection_exists"] == before["collection_exists"] + 1
@@ -0,0 +1,48 @@
+"""Tests for search_tuning: exact per-note ground truth and the recommendation."""
+
+import numpy as np
+
+from search_tuning import exact_top_notes, recommend, TRUTH_BATCH
+
+
+def brute_force(queries, matrix, paths, k):
+    """Reference: per-note best cosine score, then the notes tied with or above the k-th."""
+    out = []
+    for q in queries:
+        q = q / np.linalg.norm(q)
+        best = {}
+        for row, path in zip(matrix, paths):
+            best[path] = max(best.get(path, -np.inf), float(row @ q))
+        kth = sorted(best.values(), reverse=True)[min(k, len(best)) - 1]
+        out.append({p for p, s in best.items() if s >= kth - 1e-5})
+    return out
+
+
+def test_exact_top_notes_matches_brute_force_across_batches():
+    rng = np.random.default_rng(7)
+    paths = sorted(f"note{i:02d}.md" for i in range(30) for _ in range(rng.integers(1, 5)))
+    matrix = rng.normal(size=(len(paths), 24)).astype(np.float32)
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+    queries = rng.normal(size=(TRUTH_BATCH * 2 + 5, 24)).astype(np.float32) * 3   # not normalised
+    assert exact_top_notes(queries, matrix, paths, k=5) == brute_force(queries, matrix, paths, 5)
+
+
+def test_tied_notes_all_count_and_k_is_capped_by_the_note_count():
+    matrix = np.array([[1.0, 0.0], [1.0, 0.0], [0.0, 1.0]], dtype=np.float32)
+    paths  = ["a.md", "b.md", "c.md"]
+    assert exact_top_notes(np.array([[1.0, 0.0]]), matrix, paths, k=1) == [{"a.md", "b.md"}]
+    assert exact_top_notes(np.array([[1.0, 0.0]]), matrix, paths, k=10) == [{"a.md", "b.md", "c.md"}]
+
+
+def row(recall, p95, reference=False, p50=None):
+    return {"recall": recall, "p95_ms": p95, "p50_ms": p50 if p50 is not None else p95 / 2, "reference": reference}
+
+
+def test_recommend_picks_the_fastest_setting_that_reaches_the_target():
+    rows = [row(1.0, 1.0, reference=True), row(0.99, 5.0), row(0.985, 3.0), row(0.90, 1.0)]
+    assert recommend(rows, target=0.98) is rows[2]
+
+
+def test_recommend_falls_back_to_the_most_accurate_non_reference_row():
+    rows = [row(1.0, 1.0, reference=True), row(0.95, 5.0), row(0.95, 4.0), row(0.90, 1.0)]
+    assert recommend(rows, target=0.98) is rows[2]
@@ -0,0 +1,93 @@
+"""Tests for sync_changes_qdrant: git-mode change detection."""
+
+import os
+import subprocess
+
+import pytest
+
+from content_hash import hash_file
+from repo_scanner import PathFilter
+from sync_changes_qdrant import find_git_changes, git_snapshot, git_state
+from sync_state import SyncState
+
+
+def git(repo, *args):
+    subprocess.run(["git", "-C", str(repo), "-c", "user.name=t", "-c", "user.email=t@example.com", *args],
+                   capture_output=True, check=True)
+
+
+@pytest.fixture
+def repo(tmp_path):
+    root = tmp_path / "vault"
+    root.mkdir()
+    git(root, "init", "-q")
+    for name in ("a", "b", "c"):
+        (root / f"{name}.md").write_text(f"# {name}\n\nnote {name}\n")
+    git(root, "add", ".")
+    git(root, "commit", "-qm", "notes")
+    return root
+
+
+@pytest.fixture
+def store(tmp_path):
+    s = SyncState(str(tmp_path / "state.sqlite"), legacy=None)
+    yield s
+    s.close()
+
+
+def record(store, paths, snapshot, removed=()):
+    """Store rows for paths as a successful sync run would."""
+    updates = {}
+    for path in paths:
+        st = os.stat(path)
+        updates[path] = {"mtime": st.st_mtime, "size": st.st_size, "hash": hash_file(path)[1], "chunks": 1}
+    store.apply(updates, removed=removed, **git_state(snapshot, failed=False))
+
+
+def run(repo, store):
+    """One git-mode run: returns (new, modified, deleted) as file names and records the result."""
+    pfilter  = PathFilter(str(repo))
+    snapshot = git_snapshot(str(repo), pfilter)
+    new, modified, deleted, _, _, current = find_git_changes(str(repo), store, pfilter, snapshot)
+    record(store, current, snapshot, removed=deleted)
+    names = lambda paths: sorted(os.path.basename(p) for p in paths)
+    return names(new), names(modified), names(deleted)
+
+
+@pytest.fixture
+def synced(repo, store):
+    """The repo after a first full sync recorded every note and HEAD."""
+    record(store, [str(p) for p in repo.glob("*.md")], git_snapshot(str(repo), PathFilter(str(repo))))
+    return repo
+
+
+def test_no_recorded_commit_means_full_scan(repo, store):
+    snapshot = git_snapshot(str(repo), PathFilter(str(repo)))
+    assert find_git_changes(str(repo), store, PathFilter(str(repo)), snapshot) is None
+    assert git_snapshot(str(repo.parent), PathFilter(str(repo.parent))) is None     # not a work tree
+
+
+def test_edits_renames_deletes_and_untracked_notes(synced, store):
+    (synced / "a.md").write_text("# a\n\nedited, not committed\n")
+    git(synced, "mv", "b.md", "d.md")
+    git(synced, "commit", "-qm", "rename")
+    os.remove(synced / "c.md")
+    (synced / "e.md").write_text("# e\n\nuntracked\n")
+    (synced / "e.txt").write_text("not a note\n")
+
+    assert run(synced, store) == (["d.md", "e.md"], ["a.md"], ["b.md", "c.md"])
+    assert run(synced, store) == ([], [], [])
+
+
+def test_reverted_uncommitted_edit_is_synced_again(synced, store):
+    (synced / "a.md").write_text("# a\n\nedited, not committed\n")
+    assert run(synced, store) == ([], ["a.md"], [])
+    git(synced, "checkout", "--", "a.md")           # no diff against the recorded commit now
+    assert run(synced, store) == ([], ["a.md"], [])
+
+
+def test_failed_run_keeps_the_previous_commit():
+    snapshot = ("abc123", ["/v/u.md"], ["/v/d.md"])
+    assert git_state(snapshot, failed=True) == {"git_untracked": ["/v/u.md"], "git_dirty": ["/v/d.md"]}
+    assert git_state(snapshot, failed=False)["git_head"] == "abc123"
+    assert git_state(None, failed=False) == {}
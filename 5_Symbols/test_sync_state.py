@@ -0,0 +1,83 @@
+"""Tests for sync_state: sync_state.json migration and SQL change detection."""
+
+import json
+
+import pytest
+
+from sync_state import SyncState
+
+
+@pytest.fixture
+def store(tmp_path):
+    s = SyncState(str(tmp_path / "state.sqlite"), legacy=None)
+    yield s
+    s.close()
+
+
+def test_migrates_legacy_json_once(tmp_path):
+    legacy = tmp_path / "sync_state.json"
+    legacy.write_text(json.dumps({
+        "last_sync": 1700000000.0,
+        "last_sync_dt": "2023-11-14T22:13:20",
+        "files": {
+            "/vault/old.md": 1699999999.5,   # older format: bare mtime
+            "/vault/new.md": {"mtime": 1699999000.0, "size": 12, "hash": "abc", "chunks": 3},
+        },
+    }))
+    db = str(tmp_path / "state.sqlite")
+    store = SyncState(db, legacy=str(legacy))
+    assert store.migrated == 2
+    assert store.get("last_sync") == 1700000000.0
+    assert store.get("last_sync_dt") == "2023-11-14T22:13:20"
+    entries = store.entries(["/vault/old.md", "/vault/new.md", "/vault/none.md"])
+    assert entries["/vault/old.md"] == {"mtime": 1699999999.5, "size": None, "hash": None,
+                                        "chunks": None, "synced": 1700000000.0}
+    assert entries["/vault/new.md"]["hash"] == "abc"
+    assert entries["/vault/new.md"]["chunks"] == 3
+    assert "/vault/none.md" not in entries
+    store.close()
+
+    # The JSON file is left alone and not imported a second time
+    assert legacy.exists()
+    again = SyncState(db, legacy=str(legacy))
+    assert again.migrated == 0 and len(again) == 2
+    again.close()
+
+
+def test_changed_since_sync(store):
+    store.apply({
+        "/v/same.md":    {"mtime": 1.0, "size": 10, "hash": "h1"},
+        "/v/touched.md": {"mtime": 1.0, "size": 10, "hash": "h2"},
+        "/v/grown.md":   {"mtime": 1.0, "size": 10, "hash": "h3"},
+        "/v/legacy.md":  {"mtime": 1.0},                 # migrated without a size
+        "/v/gone.md":    {"mtime": 1.0, "size": 10, "hash": "h4"},
+    })
+    disk = {
+        "/v/same.md":    (1.0, 10),
+        "/v/touched.md": (2.0, 10),
+        "/v/grown.md":   (1.0, 11),
+        "/v/legacy.md":  (1.0, 7),
+        "/v/added.md":   (3.0, 5),
+    }
+    changed = store.changed_since_sync(disk)
+    assert set(changed) == {"/v/touched.md", "/v/grown.md", "/v/legacy.md", "/v/added.md"}
+    assert changed["/v/added.md"] is None
+    assert changed["/v/touched.md"]["hash"] == "h2"
+    assert store.missing_on_disk(disk) == ["/v/gone.md"]
+
+
+def test_apply_refreshes_the_staged_listing(store):
+    disk = {"/v/a.md": (1.0, 3)}
+    assert set(store.changed_since_sync(disk)) == {"/v/a.md"}
+    store.apply({"/v/a.md": {"mtime": 1.0, "size": 3, "hash": "h"}}, last_sync=5.0)
+    assert store.changed_since_sync(disk) == {}
+    assert store.get("last_sync") == 5.0
+
+    store.apply(removed=["/v/a.md"])
+    assert set(store.changed_since_sync(disk)) == {"/v/a.md"}
+
+
+def test_paths_under_is_a_prefix_scan(store):
+    store.apply({p: {"mtime": 1.0} for p in ("/v/a/x.md", "/v/a/y/z.md", "/v/ab.md", "/v/b.md")})
+    assert sorted(store.paths_under("/v/a")) == ["/v/a/x.md", "/v/a/y/z.md"]
+    assert sorted(store.paths_under("/v/a/")) == ["/v/a/x.md", "/v/a/y/z.md"]
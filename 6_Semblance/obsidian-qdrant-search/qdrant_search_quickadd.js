@@ -14,45 +14,53 @@ module.exports = async (params) => {
   const { quickAddApi, app } = params;
   const SERVER = "http://localhost:8111";
 
-  // 1. Prompt for query
-  const query = await quickAddApi.inputPrompt("🔍 Semantic search your second brain");
+  // 1. Prompt for query — separate several queries with ";"
+  const query = await quickAddApi.inputPrompt("🔍 Semantic search your second brain (a; b; c for several)");
   if (!query) return;
+  const queries = query.split(";").map((q) => q.trim()).filter(Boolean);
+  if (!queries.length) return;
 
-  // 2. Call the search server
-  let results;
+  // 2. Call the search server — several queries go in one /search/batch round trip
+  let sections;
   try {
-    const res = await fetch(`${SERVER}/search`, {
+    const batch = queries.length > 1;
+    const res = await fetch(`${SERVER}${batch ? "/search/batch" : "/search"}`, {
       method: "POST",
       headers: { "Content-Type": "application/json" },
-      body: JSON.stringify({ query, limit: 10 }),
+      body: JSON.stringify(batch ? { queries, limit: 10 } : { query: queries[0], limit: 10 }),
     });
 
     if (!res.ok) throw new Error(`Server returned ${res.status}`);
-    results = await res.json();
+    const data = await res.json();
+    sections = batch ? data : [{ query: queries[0], results: data }];
   } catch (err) {
     new Notice(`⚠️ Qdrant search failed: ${err.message}\nIs the server running?`);
     return;
   }
 
-  if (!results.length) {
+  const total = sections.reduce((n, s) => n + s.results.length, 0);
+  if (!total) {
     new Notice("No results found");
     return;
   }
 
   // 3. Build markdown results
   const now = new Date().toLocaleString();
-  let md = `# 🔍 Search: ${query}\n\n`;
-  md += `> ${results.length} results from Qdrant · ${now}\n\n`;
+  let md = `# 🔍 Search: ${queries.join(" · ")}\n\n`;
+  md += `> ${total} results from Qdrant · ${now}\n\n`;
 
-  for (const r of results) {
-    const name = (r.filename || "Untitled").replace(/\.md$/, "");
-    const score = (r.score * 100).toFixed(1);
-    const snippet = (r.text || "").substring(0, 200).replace(/\n/g, " ");
-    const link = `[[${name}]]`;
+  for (const section of sections) {
+    if (sections.length > 1) md += `## ${section.query}\n\n`;
+    for (const r of section.results) {
+      const name = (r.filename || "Untitled").replace(/\.md$/, "");
+      const score = (r.score * 100).toFixed(1);
+      const snippet = (r.text || "").substring(0, 200).replace(/\n/g, " ");
+      const link = `[[${name}]]`;
 
-    md += `### ${link}  — ${score}%\n`;
-    if (snippet) md += `${snippet}...\n`;
-    md += `\n---\n\n`;
+      md += `### ${link}  — ${score}%\n`;
+      if (snippet) md += `${snippet}...\n`;
+      md += `\n---\n\n`;
+    }
   }
 
   // 4. Write to a scratch note